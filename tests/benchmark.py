@@ -0,0 +1,290 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ytmusicapi.ytmusic import YTMusic  # noqa: E402
+from ytmusicapi.parsers import SINGLE_COLUMN_TAB, SECTION_LIST, SECTION_LIST_ITEM, ITEM_SECTION  # noqa: E402
+from ytmusicapi.parsers.utils import nav  # noqa: E402
+from ytmusicapi.parsers.browsing import get_parser  # noqa: E402
+from ytmusicapi.parsers.albums import parse_album_header  # noqa: E402
+from ytmusicapi.parsers.library import parse_albums, parse_artists, parse_library_songs  # noqa: E402
+from ytmusicapi.parsers.playlists import parse_playlist_items  # noqa: E402
+from ytmusicapi.parsers.uploads import parse_uploaded_items  # noqa: E402
+from ytmusicapi.parsers.watch import parse_watch_playlist  # noqa: E402
+from ytmusicapi.downloader import PlayerCache, ThumbnailCache  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+STANDIN = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'standin.py')
+GOLDEN = os.path.join(FIXTURES, 'golden')
+BASELINE = os.path.join(FIXTURES, 'benchmark_baseline.json')
+
+# allowed slowdown relative to the baseline before a benchmark fails, i.e. 0.5 = 50 %. Unless it
+# is set, the timings are only reported, as they vary too much between machines and runs
+THRESHOLD = os.environ.get('BENCHMARK_THRESHOLD')
+THRESHOLD = float(THRESHOLD) if THRESHOLD else None
+# set to rewrite the baseline timings instead of checking them
+UPDATE = bool(os.environ.get('BENCHMARK_UPDATE'))
+# set to rewrite the golden snapshots. They hold the output of the parsers from before they were
+# optimized, so they are only rewritten when the output is meant to change
+UPDATE_GOLDEN = bool(os.environ.get('BENCHMARK_UPDATE_GOLDEN'))
+# minimum measuring time per repetition in seconds
+MIN_TIME = float(os.environ.get('BENCHMARK_MIN_TIME', 0.2))
+
+SHELF = SINGLE_COLUMN_TAB + SECTION_LIST_ITEM
+ITEM_SHELF = SINGLE_COLUMN_TAB + SECTION_LIST + [0] + ITEM_SECTION
+SEARCH_SHELF = [
+    'contents', 'tabbedSearchResultsRenderer', 'tabs', 0, 'tabRenderer', 'content',
+    'sectionListRenderer', 'contents', 0, 'musicShelfRenderer', 'contents'
+]
+WATCH_PANEL = [
+    'contents', 'singleColumnMusicWatchNextResultsRenderer', 'tabbedRenderer',
+    'watchNextTabbedResultsRenderer', 'tabs', 0, 'tabRenderer', 'content', 'musicQueueRenderer',
+    'content', 'playlistPanelRenderer', 'contents'
+]
+
+# name: (fixture, path to the parsed contents, parser)
+PARSERS = {
+    'playlists.parse_playlist_items':
+    ('playlist', SHELF + ['musicPlaylistShelfRenderer', 'contents'], parse_playlist_items),
+    'browsing.Parser.parse_search_results':
+    ('search', SEARCH_SHELF, get_parser('en').parse_search_results),
+    'browsing.Parser.parse_artist_contents': ('artist', SINGLE_COLUMN_TAB + SECTION_LIST,
+                                              get_parser('en').parse_artist_contents),
+    'albums.parse_album_header': ('album', [], parse_album_header),
+    'library.parse_library_songs': ('library_songs', [], parse_library_songs),
+    'library.parse_albums':
+    ('library_albums', ITEM_SHELF + ['gridRenderer', 'items'], parse_albums),
+    'library.parse_artists': ('library_artists', ITEM_SHELF + ['musicShelfRenderer', 'contents'],
+                              parse_artists),
+    'uploads.parse_uploaded_items':
+    ('upload_songs', ITEM_SHELF
+     + ['musicShelfRenderer', 'contents', slice(1, None)], parse_uploaded_items),
+    'watch.parse_watch_playlist': ('watch', WATCH_PANEL, parse_watch_playlist),
+}
+
+# name: (fixture, call of the mixin method), includes decoding the response
+MIXINS = {
+    'YTMusic.get_playlist': ('playlist', lambda yt: yt.get_playlist('PLbenchmark0001')),
+    'YTMusic.search': ('search', lambda yt: yt.search('benchmark')),
+    'YTMusic.get_artist': ('artist', lambda yt: yt.get_artist('UCartist0001')),
+    'YTMusic.get_album': ('album', lambda yt: yt.get_album('MPREb_album0001')),
+    'YTMusic.get_library_songs': ('library_songs', lambda yt: yt.get_library_songs()),
+    'YTMusic.get_library_albums': ('library_albums', lambda yt: yt.get_library_albums()),
+    'YTMusic.get_library_artists': ('library_artists', lambda yt: yt.get_library_artists()),
+    'YTMusic.get_library_upload_songs': ('upload_songs', lambda yt: yt.get_library_upload_songs()),
+    'YTMusic.get_watch_playlist': ('watch', lambda yt: yt.get_watch_playlist('v0000005000')),
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name + '.json'), 'rb') as f:
+        return f.read()
+
+
+def fixture_client(raw_response):
+    """YTMusic instance which answers every API request with the given raw response"""
+    auth = json.dumps({
+        'cookie': '__Secure-3PAPISID=benchmark',
+        'x-goog-visitor-id': 'benchmark',
+        'origin': 'https://music.youtube.com'
+    })
+    yt = YTMusic(auth, requests_session=False)
+    yt._send_raw_request = lambda *args, **kwargs: raw_response
+    return yt
+
+
+def calibrate():
+    """Fixed pure Python workload, used to make timings comparable across machines"""
+    tree = json.loads(load_fixture('playlist'))
+
+    def walk(value):
+        if isinstance(value, dict):
+            return sum(walk(v) for v in value.values()) + 1
+        if isinstance(value, list):
+            return sum(walk(v) for v in value) + 1
+        return 1
+
+    return measure(lambda: walk(tree))
+
+
+def measure(func, repeat=3):
+    """Best time per call in seconds over ``repeat`` repetitions of at least MIN_TIME"""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_TIME:
+            break
+        number *= 2
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+class TestParserBenchmarks(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.calibration = calibrate()
+        cls.results = {}
+        cls.baseline = {}
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as f:
+                cls.baseline = json.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        if UPDATE:
+            with open(BASELINE, 'w') as f:
+                json.dump(cls.results, f, indent=2, sort_keys=True)
+                f.write('\n')
+        print('\n{:<45}{:>12}{:>12}{:>10}'.format('benchmark', 'ms/call', 'relative', 'baseline'),
+              file=sys.stderr)
+        for name, relative in sorted(cls.results.items()):
+            baseline = '{:.3f}'.format(cls.baseline[name]) if name in cls.baseline else '-'
+            print('{:<45}{:>12.3f}{:>12.3f}{:>10}'.format(name, relative * cls.calibration * 1000,
+                                                          relative, baseline),
+                  file=sys.stderr)
+
+    def check_golden(self, name, result):
+        path = os.path.join(GOLDEN, name + '.json')
+        result = json.loads(json.dumps(result))
+        if UPDATE_GOLDEN:
+            os.makedirs(GOLDEN, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, indent=1, ensure_ascii=False, sort_keys=True)
+                f.write('\n')
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(result, json.load(f), "Output differs from golden snapshot")
+
+    def check_throughput(self, name, func):
+        relative = measure(func) / self.calibration
+        self.results[name] = relative
+        if UPDATE or THRESHOLD is None:
+            return
+        if name not in self.baseline:
+            self.skipTest("No baseline for " + name)
+        slowdown = relative / self.baseline[name] - 1
+        self.assertLessEqual(slowdown, THRESHOLD,
+                             "{} is {:.0%} slower than the baseline".format(name, slowdown))
+
+    def test_parsers(self):
+        for name, (fixture, path, parser) in PARSERS.items():
+            with self.subTest(name):
+                contents = nav(json.loads(load_fixture(fixture)), path)
+                self.check_golden(name, parser(contents))
+                self.check_throughput(name, lambda: parser(contents))
+
+    def test_mixins(self):
+        for name, (fixture, call) in MIXINS.items():
+            with self.subTest(name):
+                yt = fixture_client(load_fixture(fixture))
+                self.check_golden(name, call(yt))
+                self.check_throughput(name, lambda: call(yt))
+
+
+def written_bytes():
+    """Bytes written by this process so far, including to sockets and the terminal"""
+    with open('/proc/self/io') as f:
+        return int(dict(line.split(': ') for line in f.read().splitlines())['wchar'])
+
+
+@unittest.skipUnless(os.path.exists('/proc/self/io'), 'Needs /proc/self/io to count bytes written')
+class TestDownloadBenchmarks(unittest.TestCase):
+    """Downloads from the stand-in server, which runs in another process so its writes do not count"""
+    @classmethod
+    def setUpClass(cls):
+        cls.server = subprocess.Popen([sys.executable, STANDIN, '--port', '0'],
+                                      stderr=subprocess.PIPE,
+                                      universal_newlines=True)
+        url = cls.server.stderr.readline().split()[-1]
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.yt = YTMusic(base_url=url,
+                         player_cache=PlayerCache(None),
+                         thumbnail_cache=ThumbnailCache(os.path.join(cls.cache_dir.name,
+                                                                     'thumbs')))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.terminate()
+        cls.server.wait()
+        cls.server.stderr.close()
+        cls.cache_dir.cleanup()
+
+    def download_bytes_written(self, video_ids, **options):
+        """Bytes written per byte of the downloaded files"""
+        with tempfile.TemporaryDirectory() as dest_dir:
+            before = written_bytes()
+            for video_id in video_ids:
+                self.yt.download_song(video_id, dest_dir, manifest=False, **options)
+            written = written_bytes() - before
+            size = sum(
+                os.path.getsize(os.path.join(dest_dir, name)) for name in os.listdir(dest_dir))
+        return written / size
+
+    def test_single_pass_tagging(self):
+        video_ids = ['v%010d' % i for i in range(1, 6)]
+        # fetch the player and the cover once, so both runs do the same requests
+        self.download_bytes_written(video_ids[:1])
+        after = self.download_bytes_written(video_ids, single_pass=False)
+        single = self.download_bytes_written(video_ids, single_pass=True)
+        print('\n{:<45}{:>12}'.format('bytes written per byte downloaded', ''), file=sys.stderr)
+        print('{:<45}{:>12.3f}'.format('download_song, tagged afterwards', after), file=sys.stderr)
+        print('{:<45}{:>12.3f}'.format('download_song, tagged in a single pass', single),
+              file=sys.stderr)
+        self.assertLess(single, 1.1)
+        self.assertLess(single, after)
+
+    def download_throughput(self, video_ids, **options):
+        """Megabytes per second of the transfers"""
+        with tempfile.TemporaryDirectory() as dest_dir:
+            started = time.perf_counter()
+            for video_id in video_ids:
+                self.yt.download_song(video_id, dest_dir, manifest=False, **options)
+            seconds = time.perf_counter() - started
+            size = sum(
+                os.path.getsize(os.path.join(dest_dir, name)) for name in os.listdir(dest_dir))
+        return size / seconds / 1e6
+
+    def test_transfer_throughput(self):
+        video_ids = ['v%010d' % i for i in range(1, 9)]
+        self.download_bytes_written(video_ids[:1])
+        runs = [
+            ('download_song, 64 KiB chunks', {
+                'chunk_size': 64 * 1024
+            }),
+            ('download_song, 1 MiB chunks', {
+                'chunk_size': 1024 * 1024
+            }),
+            ('download_song, adaptive chunks', {}),
+            ('download_song, adaptive chunks, fsync at end', {
+                'fsync': 'end'
+            }),
+            ('download_song, 4 segments, adaptive chunks', {
+                'segments': 4
+            }),
+        ]
+        # the best of three runs, as the stand-in shares the machine
+        results = {
+            name: max(self.download_throughput(video_ids, **options) for _ in range(3))
+            for name, options in runs
+        }
+        print('\n{:<45}{:>12}'.format('throughput from the stand-in', 'MB/s'), file=sys.stderr)
+        for name, throughput in results.items():
+            print('{:<45}{:>12.1f}'.format(name, throughput), file=sys.stderr)
+        if THRESHOLD is not None:
+            self.assertGreater(results['download_song, adaptive chunks'],
+                               results['download_song, 64 KiB chunks'] * (1 - THRESHOLD))
+
+
+if __name__ == '__main__':
+    unittest.main()
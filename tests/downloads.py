@@ -0,0 +1,660 @@
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import requests
+from mutagen.mp4 import MP4
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from ytmusicapi.ytmusic import YTMusic  # noqa: E402
+from ytmusicapi.downloader import (AudioProxy, DownloadManager, DownloadManifest,  # noqa: E402
+                                   DownloadStore, PlayerCache, SegmentCache, StreamCache,
+                                   ThumbnailCache)
+from ytmusicapi.downloader.formats import FormatSelector, expected_bytes  # noqa: E402
+from ytmusicapi.downloader.planner import DiscographyPlan, duration_seconds  # noqa: E402
+from ytmusicapi.downloader.player import Player  # noqa: E402
+from ytmusicapi.downloader.prefetch import Prefetcher  # noqa: E402
+from ytmusicapi.downloader.tagging import find_header  # noqa: E402
+from ytmusicapi.downloader.thumbnails import image_info  # noqa: E402
+from ytmusicapi.downloader.__main__ import main as downloader_main  # noqa: E402
+from ytmusicapi.downloader.manifest import MANIFEST_NAME  # noqa: E402
+from ytmusicapi.downloader.progress import ProgressAggregator  # noqa: E402
+from ytmusicapi.downloader.transfer import AdaptiveChunkSize, iter_chunks  # noqa: E402
+from standin import StandInServer, descramble_n, initial_n, media  # noqa: E402
+
+
+class TestDownloads(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StandInServer().start()
+        cls.cache_dir = tempfile.TemporaryDirectory()
+        cls.player_cache = PlayerCache(os.path.join(cls.cache_dir.name, 'player.json'))
+        cls.thumbnail_cache = ThumbnailCache(os.path.join(cls.cache_dir.name, 'thumbnails'))
+        cls.yt = YTMusic(base_url=cls.server.url, player_cache=cls.player_cache,
+                         thumbnail_cache=cls.thumbnail_cache)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        cls.cache_dir.cleanup()
+
+    def setUp(self):
+        self.server.options.__init__()
+        self.dest_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dest_dir.cleanup)
+
+    def files(self):
+        return sorted(name for name in os.listdir(self.dest_dir.name) if name != MANIFEST_NAME)
+
+    def stream(self, video_id):
+        _, formats = self.yt.get_streaming_data_decrypted(video_id)
+        return requests.get([f for f in formats if f['itag'] == 140][0]['url']).content
+
+    def test_player_cache(self):
+        self.player_cache.clear()
+        self.server.stats.reset()
+        for video_id in ['v0000000001', 'v0000000002']:
+            self.yt.get_streaming_data_decrypted(video_id)
+        stats = self.server.stats.snapshot()
+        self.assertEqual(stats['base.js']['requests'], 1)
+        self.assertEqual(stats['home']['requests'], 1)
+        self.assertNotIn('watch', stats)
+
+        # a new cache loads the player from disk and only checks its version
+        self.server.stats.reset()
+        yt = YTMusic(base_url=self.server.url, player_cache=PlayerCache(self.player_cache.path),
+                     thumbnail_cache=self.thumbnail_cache)
+        _, formats = yt.get_streaming_data_decrypted('v0000000003')
+        self.assertEqual(requests.get(formats[0]['url'], stream=True).status_code, 200)
+        self.assertNotIn('base.js', self.server.stats.snapshot())
+
+        # concurrent callers download base.js once, without holding the cache lock meanwhile
+        cache = PlayerCache(None)
+        fetching, release = threading.Event(), threading.Event()
+
+        def request_func(url):
+            fetching.set()
+            release.wait(5)
+            return self.yt._send_get_request(url)
+
+        threads = [threading.Thread(target=cache.get, args=(self.yt.get_basejs_url, request_func))
+                   for _ in range(3)]
+        self.server.stats.reset()
+        for thread in threads:
+            thread.start()
+        self.assertTrue(fetching.wait(5))
+        self.assertTrue(cache._lock.acquire(timeout=1))
+        cache._lock.release()
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.stats.snapshot()['base.js']['requests'], 1)
+
+    def test_get_song_decrypted(self):
+        self.yt.player_cache.get(self.yt.get_basejs_url, self.yt._send_get_request)
+        self.server.stats.reset()
+        song, formats = self.yt.get_song_decrypted('v0000000005')
+        self.assertEqual(song['videoDetails']['title'], 'Track 5')
+        self.assertEqual(list(self.server.stats.snapshot()), ['player'])
+        self.assertEqual(requests.get(formats[0]['url'], stream=True).status_code, 200)
+
+        # the signatures only work with the signatureTimestamp of the current player
+        song = self.yt.get_song('v0000000005', 18000)
+        url = self.yt._decrypt_formats(song['streamingData'], self.yt.player_cache.get(
+            self.yt.get_basejs_url, self.yt._send_get_request), 'v0000000005')[0]['url']
+        self.assertEqual(requests.get(url, stream=True).status_code, 403)
+
+    def test_throttling_n(self):
+        _, formats = self.yt.get_song_decrypted('v0000000006')
+        for fmt in formats:
+            self.assertIn('&n=' + descramble_n(initial_n('v0000000006')), fmt['url'])
+
+        # streams with a scrambled n would take at least 10 seconds
+        self.server.options.throttle = 64 * 1024
+        start = time.perf_counter()
+        self.yt.download_song('v0000000006', self.dest_dir.name)
+        self.assertLess(time.perf_counter() - start, 5)
+
+        # a player whose n function fails leaves n as it is, with a warning
+        player = self.player_cache.get(self.yt.get_basejs_url, self.yt._send_get_request)
+        broken = Player.from_dict(
+            dict(player.to_dict(), throttling_plan=[[0]], throttling_array=['not a function']))
+        song = self.yt.get_song('v0000000006', player.signature_timestamp)
+        with self.assertWarns(UserWarning):
+            formats = self.yt._decrypt_formats(song['streamingData'], broken, 'v0000000006')
+        for fmt in formats:
+            self.assertIn('&n=' + initial_n('v0000000006'), fmt['url'])
+
+    def test_stream_cache(self):
+        self.server.options.expires_in = 2
+        cache = StreamCache(margin=0.5, refresh_ahead=1.5, interval=0.1)
+        self.addCleanup(cache.stop)
+        self.server.stats.reset()
+        for _ in range(2):
+            cache.get('v0000000007', self.yt.get_song_decrypted)
+        self.assertEqual(self.server.stats.snapshot()['player']['requests'], 1)
+
+        # only the entries in use are refreshed before they expire
+        cache.get('v0000000008', self.yt.get_song_decrypted)
+        url = cache.get_url('v0000000007', 140)
+        unused_url = cache.get_url('v0000000008', 140)
+        with cache.use('v0000000007'):
+            time.sleep(1)
+        self.assertGreaterEqual(self.server.stats.snapshot()['player']['requests'], 3)
+        self.assertNotEqual(cache.get_url('v0000000007', 140), url)
+        self.assertEqual(cache.get_url('v0000000008', 140), unused_url)
+
+    def test_download_song_expiring(self):
+        # the transfer takes longer than the URLs are valid and is resumed with refreshed ones
+        self.server.options.expires_in = 2
+        self.server.options.bandwidth = 512 * 1024
+        self.server.options.drop_rate = 0.3
+        yt = YTMusic(base_url=self.server.url, player_cache=self.player_cache,
+                     thumbnail_cache=self.thumbnail_cache, stream_cache=StreamCache(margin=0.5, refresh_ahead=1.5, interval=0.1))
+        yt.download_song('v0000000009', self.dest_dir.name, segments=2, retries=50)
+        self.assertEqual(len(self.files()), 1)
+        self.assertGreater(self.server.stats.snapshot()['player']['requests'], 1)
+
+    def test_thumbnail_cache(self):
+        album = self.yt.get_album('MPREb_thumbnails')
+        self.thumbnail_cache.clear()
+        self.server.stats.reset()
+        for track in album['tracks'][:3]:
+            self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=track,
+                                  album_info=album)
+        # the tracks share the largest cover of the album
+        self.assertEqual(self.server.stats.snapshot()['thumbnails']['requests'], 1)
+        for name in self.files():
+            cover = MP4(os.path.join(self.dest_dir.name, name))['covr']
+            self.assertEqual(len(cover), 1)
+            self.assertEqual(image_info(bytes(cover[0])), ('JPEG', 544, 544))
+
+        # the size is read from the header
+        data = self.yt.get_thumbnail(album['thumbnails'][-1])
+        self.assertEqual(image_info(data[:1024]), ('JPEG', 544, 544))
+
+    def test_thumbnail_cache_eviction(self):
+        images = {str(i): bytes([i]) * 1000 for i in range(4)}
+        directory = os.path.join(self.dest_dir.name, 'thumbnails')
+        for path in (None, directory):
+            cache = ThumbnailCache(path, max_bytes=2500)
+            fetched = []
+
+            def fetch(url):
+                fetched.append(url)
+                return images[url]
+
+            # the least recently used images make room for the new ones
+            for url in ['0', '1', '0', '2', '3', '0']:
+                self.assertEqual(cache.get(url, fetch), images[url])
+            self.assertEqual(fetched, ['0', '1', '2', '3', '0'])
+            self.assertEqual(cache.size, 2000)
+
+        # every URL was appended to the index once, and the evicted ones are dropped on load
+        with open(cache.index_path) as f:
+            self.assertEqual(len(f.readlines()), 4)
+        cache = ThumbnailCache(directory, max_bytes=2500)
+        self.assertEqual(cache.get('3', None), images['3'])
+        self.assertEqual(sorted(cache._urls), ['0', '3'])
+        self.assertEqual(cache.size, 2000)
+
+    def test_retag(self):
+        album = self.yt.get_album('MPREb_retag')
+        items = []
+        for index, track in enumerate(album['tracks'][:4]):
+            self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=track,
+                                  album_info=album, single_pass=index > 0)
+            name = [name for name in self.files() if track['videoId'] in name][0]
+            items.append({'path': os.path.join(self.dest_dir.name, name), 'song': track,
+                          'album': album})
+        sizes = [os.path.getsize(item['path']) for item in items]
+        results = self.yt.retag(items, workers=3)
+        self.assertEqual([result['status'] for result in results], ['unchanged'] * 4)
+
+        # the changed tags fit in the padding of files tagged during or after the download
+        album['title'] = 'Retagged'
+        results = self.yt.retag(items, workers=3)
+        self.assertEqual([result['status'] for result in results], ['updated'] * 4)
+        self.assertEqual([os.path.getsize(item['path']) for item in items], sizes)
+        self.assertEqual(MP4(items[0]['path'])['\xa9alb'], ['Retagged'])
+
+    def test_download_song(self):
+        self.server.stats.reset()
+        self.yt.download_song('v0000000001', self.dest_dir.name)
+        self.assertEqual(self.files(), ['Artist 1 - Track 1 [v0000000001].mp4'])
+        self.assertNotIn('get_video_info', self.server.stats.snapshot())
+
+    def test_download_song_resume(self):
+        path = os.path.join(self.dest_dir.name, 'Artist 1 - Track 2 [v0000000002].mp4')
+        stream = self.stream('v0000000002')
+        with open(path + '.part', 'wb') as f:
+            f.write(stream[:100000])
+        self.server.stats.reset()
+        self.server.options.drop_rate = 0.5
+        self.yt.download_song('v0000000002', self.dest_dir.name, chunk_size=65536, retries=20)
+        self.assertEqual(self.files(), [os.path.basename(path)])
+        self.assertGreater(os.path.getsize(path), len(stream))  # tags were added
+        # a dropped connection loses at most the chunk being read
+        stats = self.server.stats.snapshot()['videoplayback']
+        self.assertLessEqual(stats['bytes'], len(stream) - 100000 + stats['requests'] * 65536)
+
+    def test_download_song_incomplete(self):
+        self.server.options.drop_rate = 1
+        self.assertRaises(Exception, self.yt.download_song, 'v0000000003', self.dest_dir.name,
+                          retries=0)
+        # next to the .part file there may be the header of a transfer tagged in a single pass
+        files = [name for name in self.files() if not name.endswith('.part.header')]
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith('.mp4.part'))
+
+    def test_download_song_single_pass(self):
+        self.server.options.drop_rate = 0.5
+        self.yt.download_song('v0000000011', self.dest_dir.name, chunk_size=65536, retries=20)
+        self.assertEqual(self.files(), ['Artist 1 - Track 11 [v0000000011].mp4'])
+        path = os.path.join(self.dest_dir.name, self.files()[0])
+        video = MP4(path)
+        self.assertEqual(video['\xa9nam'], ['Track 11'])
+        self.assertEqual(len(video['covr']), 1)
+        self.assertGreater(video.info.length, 100)
+        # the stream follows the tagged header unchanged, resumed at the right offset
+        self.server.options.drop_rate = 0
+        stream = self.stream('v0000000011')
+        header = find_header(stream)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read()[-(len(stream) - header):], stream[header:])
+
+    def test_download_song_adaptive(self):
+        sizer = AdaptiveChunkSize(initial=65536, target=0.1)
+        sizer.update(65536, 0.001)
+        self.assertEqual(sizer.size, 131072)
+        sizer.update(131072, 1.0)
+        self.assertEqual(sizer.size, 65536)
+        sizer.update(1000, 1.0)  # the end of the stream
+        self.assertEqual(sizer.size, 65536)
+
+        # the chunks are read into the buffer without the copies of urllib3
+        stream = self.stream('v0000000012')
+        _, formats = self.yt.get_streaming_data_decrypted('v0000000012')
+        response = requests.get([f for f in formats if f['itag'] == 140][0]['url'], stream=True)
+        response.raw.read = None
+        self.assertEqual(b''.join(bytes(chunk) for chunk in iter_chunks(response, 65536)), stream)
+        self.assertEqual(response.raw.tell(), len(stream))
+        self.assertIsNone(response.raw.connection)
+
+        self.server.options.bandwidth = 4 * 1024 * 1024
+        self.server.options.drop_rate = 0.3
+        self.yt.download_song('v0000000013', self.dest_dir.name, retries=20, fsync='end')
+        path = os.path.join(self.dest_dir.name, 'Artist 1 - Track 13 [v0000000013].mp4')
+        self.assertEqual(self.files(), [os.path.basename(path)])
+        self.server.options.drop_rate = 0
+        stream = self.stream('v0000000013')
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read()[-(len(stream) - find_header(stream)):],
+                             stream[find_header(stream):])
+        self.assertRaises(Exception, self.yt.download_song, 'v0000000014', self.dest_dir.name,
+                          fsync='always')
+
+    def test_download_song_segments(self):
+        self.server.options.bandwidth = 2 * 1024 * 1024
+        self.server.options.drop_rate = 0.2
+        self.yt.download_song('v0000000004', self.dest_dir.name, segments=4, retries=20)
+        path = os.path.join(self.dest_dir.name, 'Artist 1 - Track 4 [v0000000004].mp4')
+        self.assertEqual(self.files(), [os.path.basename(path)])
+        self.server.options.drop_rate = 0
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read()[-1000:], self.stream('v0000000004')[-1000:])
+        self.assertGreater(self.server.stats.snapshot()['videoplayback']['requests'], 4)
+
+    def test_download_song_progress(self):
+        self.server.options.bandwidth = 4 * 1024 * 1024
+        events = []
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            self.yt.download_song('v0000000012', self.dest_dir.name, chunk_size=65536,
+                                  progress=events.append)
+        self.assertEqual(stdout.getvalue(), '')
+        phases = [event.phase for event in events]
+        self.assertEqual(sorted(set(phases), key=phases.index), ['resolve', 'transfer', 'tag'])
+        transfers = [event for event in events if event.phase == 'transfer' and event.status is None]
+        self.assertGreater(len(transfers), 2)
+        self.assertEqual(transfers[-1].bytes_done, transfers[-1].bytes_total)
+        self.assertGreater(transfers[-1].average_rate, 0)
+        self.assertTrue(any(event.rate > 0 for event in transfers))
+        self.assertEqual(events[-1].status, 'downloaded')
+        self.assertEqual(events[-1].bytes_done, transfers[-1].bytes_total)
+
+    def test_download_playlist_progress(self):
+        aggregator = ProgressAggregator()
+        # an unavailable track is left out without printing
+        tracks = self.yt.get_playlist('PLdownloads_3')['tracks'] + [{'videoId': None}]
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            results = self.yt.download_playlist(tracks, self.dest_dir.name, concurrency=3,
+                                                progress=aggregator)
+        self.assertEqual(stdout.getvalue(), '')
+        self.assertEqual(len(results), 3)
+        totals = aggregator.snapshot()
+        self.assertEqual(totals['statuses'], {'downloaded': 3, 'skipped': 0, 'failed': 0})
+        self.assertEqual(totals['phases'], {'resolve': 0, 'transfer': 0, 'tag': 0})
+        self.assertEqual(totals['bytes_done'], totals['bytes_total'])
+        self.assertEqual(totals['bytes_done'], sum(
+            len(self.stream(result['videoId'])) for result in results))
+
+    def test_download_playlist_prefetch(self):
+        # the songs are not in the stream cache of other tests
+        yt = YTMusic(base_url=self.server.url, player_cache=self.player_cache,
+                     thumbnail_cache=self.thumbnail_cache, stream_cache=StreamCache())
+        tracks = yt.get_playlist('PLdownloads_5')['tracks']
+        self.server.stats.reset()
+        results = yt.download_playlist(tracks, self.dest_dir.name, concurrency=2, prefetch=3)
+        self.assertEqual([result['status'] for result in results], ['downloaded'] * 5)
+        # every song is resolved once, by the prefetcher or its worker, and named from its track
+        self.assertEqual(self.server.stats.snapshot()['player']['requests'], 5)
+        self.assertEqual(self.files(), sorted('{} - {} [{}].mp4'.format(
+            track['artists'][0]['name'], track['title'], track['videoId']) for track in tracks))
+
+        resolved = []
+        prefetcher = Prefetcher(lambda job: resolved.append(job['videoId']), ahead=2, workers=1)
+        for index in range(5):
+            prefetcher.add({'videoId': index})
+        prefetcher.started()
+        prefetcher.started()
+        prefetcher.shutdown()
+        self.assertEqual(resolved, [0, 1, 2, 3])
+
+    def test_download_store(self):
+        store_dir = os.path.join(self.dest_dir.name, 'store')
+        playlist = self.yt.get_playlist('PLdownloads_3')['tracks']
+        store = DownloadStore(store_dir, 'hardlink')
+        self.server.stats.reset()
+        for name in ('first', 'second'):
+            os.mkdir(os.path.join(self.dest_dir.name, name))
+            results = self.yt.download_playlist(playlist, os.path.join(self.dest_dir.name, name),
+                                                store=store)
+            self.assertEqual([result['status'] for result in results], ['downloaded'] * 3)
+        # the streams are transferred once and linked into both directories
+        self.assertEqual(self.server.stats.snapshot()['videoplayback']['requests'], 3)
+        for result in results:
+            name = os.path.basename(result['path'])
+            self.assertTrue(os.path.samefile(
+                os.path.join(self.dest_dir.name, 'first', name), result['path']))
+        # the links share the tags of the first download, so they are never tagged for another
+        second_dir = os.path.join(self.dest_dir.name, 'second')
+        self.assertIsNone(DownloadManifest(second_dir).get(playlist[1]['videoId'])['tags'])
+        album = MP4(results[1]['path'])['\xa9alb']
+        track = dict(playlist[1], album={'name': 'Another album', 'id': None})
+        self.yt.download_song(track['videoId'], second_dir, song_info=track, manifest=True,
+                              store=store)
+        self.assertEqual(MP4(results[1]['path'])['\xa9alb'], album)
+        self.assertIsNone(DownloadManifest(second_dir).get(playlist[1]['videoId'])['tags'])
+        self.assertEqual(store._locks, {})
+
+        # copies get tags of their own
+        store = DownloadStore(store_dir, 'copy')
+        track = dict(playlist[0], title='Another title')
+        self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=track, store=store)
+        self.assertEqual(self.server.stats.snapshot()['videoplayback']['requests'], 3)
+        path = os.path.join(self.dest_dir.name, 'Artist 0 - Another title [v0000000000].mp4')
+        self.assertFalse(os.path.samefile(path, results[0]['path']))
+        self.assertEqual(MP4(path)['\xa9nam'], ['Another title'])
+        self.assertEqual(MP4(results[0]['path'])['\xa9nam'], ['Track 0'])
+
+        # other hard links are tagged as usual
+        os.link(path, path + '.backup')
+        track['album'] = {'name': 'Another album', 'id': None}
+        self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=track)
+        self.assertEqual(MP4(path)['\xa9alb'], ['Another album'])
+
+    def test_plan_artist_discography(self):
+        released = []
+        plan = self.yt.plan_artist_discography(
+            'UCartist0001', workers=4,
+            on_release=lambda release, planned: released.append((release['type'], len(planned))))
+        albums = [release for release in plan.releases if release['type'] == 'Album']
+        self.assertEqual(len(albums), 10)
+        self.assertEqual([kind for kind, _ in released], ['Album'] * 10 + ['Single'] * 10)
+        # the first song of each single is planned with its album
+        self.assertEqual([count for kind, count in released if kind == 'Single'], [1] * 10)
+        self.assertEqual(len(plan.duplicates), 10)
+        self.assertEqual(len(plan.tracks), sum(len(album['tracks']) for album in albums) + 10)
+        self.assertEqual(len({entry['videoId'] for entry in plan.tracks}), len(plan.tracks))
+        for duplicate in plan.duplicates:
+            self.assertEqual(duplicate['plannedAs']['release']['type'], 'Album')
+        self.assertEqual(plan.expected_bytes, sum(
+            entry['expectedBytes'] for entry in plan.tracks))
+        self.assertEqual(plan.tracks[0]['expectedBytes'],
+                         130000 * duration_seconds(plan.tracks[0]['track']) // 8)
+
+    def test_plan_duplicates(self):
+        self.assertEqual(duration_seconds({'duration': None, 'lengthMs': '203406'}), 203)
+        artists = [{'name': 'Artist', 'id': None}]
+        plan = DiscographyPlan()
+
+        def release(kind, *tracks):
+            return plan.add({'type': kind, 'artists': artists, 'tracks': [
+                {'videoId': video_id, 'title': title, 'duration': duration}
+                for video_id, title, duration in tracks]})
+
+        self.assertEqual(len(release('Album', ('a1', 'Intro', '1:00'), ('a2', 'Song', '3:00'))), 2)
+        # an intro of another album is planned, the album version of a single is not
+        self.assertEqual(len(release('Album', ('b1', 'Intro', '1:00'))), 1)
+        self.assertEqual(release('Single', ('s1', 'song', '3:00'), ('s2', 'Other', '2:00')),
+                         plan.tracks[-1:])
+        self.assertEqual([entry['plannedAs']['videoId'] for entry in plan.duplicates], ['a2'])
+
+    def test_format_selector(self):
+        _, formats = self.yt.get_song_decrypted('v0000000019')
+
+        def itag(**constraints):
+            fmt = FormatSelector(**constraints).select(formats)
+            return fmt['itag'] if fmt else None
+
+        self.assertEqual(itag(), 140)
+        self.assertEqual(itag(codec='opus'), 251)
+        self.assertEqual(itag(codec='aac', container='mp4'), 140)
+        self.assertEqual(itag(max_bitrate=126000), 251)
+        self.assertEqual(itag(prefer='smallest'), 251)
+        self.assertEqual(itag(audio_only=False), 18)
+        self.assertEqual(itag(codec='avc1'), 18)
+        self.assertIsNone(itag(min_bitrate=200000, audio_only=True))
+        # formats of the same bitrate are ranked by itag instead of comparing the dicts
+        same = [dict(fmt, averageBitrate=128000) for fmt in formats if fmt['itag'] != 18]
+        self.assertEqual(FormatSelector().select(same)['itag'], 251)
+
+        fmt = self.yt.get_stream_format('v0000000019', FormatSelector(codec='opus'))
+        self.assertEqual(expected_bytes(fmt), int(fmt['contentLength']))
+        self.assertEqual(expected_bytes(dict(fmt, contentLength=None)),
+                         fmt['averageBitrate'] * int(fmt['approxDurationMs']) // 8000)
+        data = b''.join(self.yt.stream_song('v0000000019', format_selector=FormatSelector(
+            codec='opus')))
+        self.assertEqual(len(data), expected_bytes(fmt))
+        self.assertRaises(Exception, self.yt.download_song, 'v0000000019', self.dest_dir.name,
+                          format_selector=FormatSelector(codec='flac'))
+
+    def test_stream_song(self):
+        self.server.options.drop_rate = 0
+        stream = self.stream('v0000000015')
+        self.assertEqual(b''.join(self.yt.stream_song('v0000000015')), stream)
+        self.assertEqual(b''.join(self.yt.stream_song('v0000000015', start=1000, end=5000)),
+                         stream[1000:5000])
+
+        self.server.options.drop_rate = 0.3
+        sink = io.BytesIO()
+        self.assertEqual(self.yt.stream_song('v0000000015', sink, chunk_size=65536, retries=20),
+                         len(stream))
+        self.assertEqual(sink.getvalue(), stream)
+        self.assertEqual(self.files(), [])
+
+        class AsyncSink:
+            def __init__(self):
+                self.data = b''
+
+            async def write(self, data):
+                self.data += data
+
+        sink = AsyncSink()
+        asyncio.run(self.yt.stream_song_async('v0000000015', sink, start=len(stream) - 100000,
+                                              retries=20))
+        self.assertEqual(sink.data, stream[-100000:])
+
+    def test_stream_song_tee(self):
+        self.server.options.drop_rate = 0
+        stream = self.stream('v0000000016')
+        path = os.path.join(self.dest_dir.name, 'v0000000016.mp4')
+        b''.join(self.yt.stream_song('v0000000016', end=100000, tee=path))
+        self.assertEqual(self.files(), ['v0000000016.mp4.part'])
+        # a part after the end of the copy is not written to it
+        b''.join(self.yt.stream_song('v0000000016', start=200000, tee=path))
+        self.assertEqual(os.path.getsize(path + '.part'), 100000)
+        # a part continuing it completes the copy
+        b''.join(self.yt.stream_song('v0000000016', start=50000, tee=path))
+        self.assertEqual(self.files(), ['v0000000016.mp4'])
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), stream)
+
+    def test_probe_song(self):
+        self.server.options.drop_rate = 0
+        data, duration_ms, init_range, index_range = media('v0000000017', 140)
+        self.yt.get_stream_format('v0000000017', FormatSelector(container='mp4'))
+        self.server.stats.reset()
+        info = self.yt.probe_song('v0000000017')
+        self.assertEqual(info['itag'], 140)
+        self.assertEqual((info['codec'], info['sampleRate'], info['channels']),
+                         ('mp4a.40.2', 44100, 2))
+        self.assertEqual(int(info['duration'] * 1000), duration_ms)
+        self.assertEqual(info['declaredBitrate'], 129000)
+        self.assertAlmostEqual(info['bitrate'], 129000, delta=5000)
+        self.assertEqual(info['indexRange'], (index_range[0], index_range[1] + 1))
+        segments = info['segments']
+        self.assertEqual(len(segments), -(-duration_ms // 10000))
+        self.assertEqual(segments[0]['start'], index_range[1] + 1)
+        self.assertEqual(segments[-1]['end'], len(data))
+        self.assertTrue(all(data[segment['start'] + 4:segment['start'] + 8] == b'moof'
+                            for segment in segments))
+        stats = self.server.stats.snapshot()['videoplayback']
+        self.assertEqual(stats['requests'], 1)
+        self.assertLess(stats['bytes'], 4096)
+        self.assertEqual(info['bytesFetched'], stats['bytes'])
+
+        preview = self.yt.preview_song('v0000000017', 15)
+        self.assertEqual(preview, data[:segments[1]['end']])
+        sink = io.BytesIO()
+        self.assertEqual(self.yt.preview_song('v0000000017', 5, sink), segments[0]['end'])
+        self.assertEqual(sink.getvalue(), data[:segments[0]['end']])
+
+    def test_audio_proxy(self):
+        stream = self.stream('v0000000017')
+        cache = SegmentCache(self.dest_dir.name, max_bytes=len(stream), segment_size=256 * 1024)
+        with AudioProxy(self.yt, cache, port=0) as proxy:
+            url = proxy.url + '/audio/v0000000017'
+            response = requests.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers['Content-Type'], 'audio/mp4')
+            self.assertEqual(response.content, stream)
+
+            # played again from the cache
+            self.server.stats.reset()
+            response = requests.get(url, headers={'Range': 'bytes=300000-'})
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response.headers['Content-Range'],
+                             'bytes 300000-{}/{}'.format(len(stream) - 1, len(stream)))
+            self.assertEqual(response.content, stream[300000:])
+            self.assertEqual(requests.get(url, headers={'Range': 'bytes=-1000'}).content,
+                             stream[-1000:])
+            self.assertNotIn('videoplayback', self.server.stats.snapshot())
+            response = requests.get(url, headers={'Range': 'bytes={}-'.format(len(stream))})
+            self.assertEqual(response.status_code, 416)
+
+            # concurrent requests for the same range fetch each segment once
+            url = proxy.url + '/audio/v0000000018'
+            expected = self.stream('v0000000018')[:600000]
+            self.server.stats.reset()
+            responses = []
+            threads = [threading.Thread(target=lambda: responses.append(
+                requests.get(url, headers={'Range': 'bytes=0-599999'}))) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([response.content for response in responses], [expected] * 4)
+            self.assertEqual(self.server.stats.snapshot()['videoplayback']['requests'], 3)
+            # the least recently used segments make room for the new ones
+            self.assertLessEqual(cache.size, len(stream))
+            self.assertEqual(len(os.listdir(os.path.join(self.dest_dir.name, 'v0000000018'))), 3)
+
+            # a segment removed behind the cache's back is fetched again
+            segment = sorted(os.listdir(os.path.join(self.dest_dir.name, 'v0000000018')))[0]
+            os.remove(os.path.join(self.dest_dir.name, 'v0000000018', segment))
+            self.server.stats.reset()
+            self.assertEqual(requests.get(url, headers={'Range': 'bytes=0-599999'}).content,
+                             expected)
+            self.assertEqual(self.server.stats.snapshot()['videoplayback']['requests'], 1)
+
+    def test_download_playlist_concurrency(self):
+        results = self.yt.download_playlist('PLdownloads_6', self.dest_dir.name, concurrency=3)
+        self.assertEqual([result['status'] for result in results], ['downloaded'] * 6)
+        self.assertEqual(len(self.files()), 6)
+        self.server.stats.reset()
+        results = self.yt.download_playlist('PLdownloads_6', self.dest_dir.name, concurrency=3)
+        self.assertEqual([result['status'] for result in results], ['skipped'] * 6)
+        # the songs in the manifest are skipped without a request
+        self.assertEqual(list(self.server.stats.snapshot()), ['browse'])
+
+    def test_rebuild_manifest(self):
+        self.yt.download_song('v0000000010', self.dest_dir.name, manifest=False)
+        self.assertEqual(os.listdir(self.dest_dir.name), ['Artist 1 - Track 10 [v0000000010].mp4'])
+        downloader_main(['rebuild-manifest', self.dest_dir.name])
+        entry = DownloadManifest(self.dest_dir.name).get('v0000000010')
+        self.assertEqual(entry['path'], os.path.join(self.dest_dir.name, self.files()[0]))
+
+        # without the tags the file was written with, it is only skipped if the tags are kept
+        self.server.stats.reset()
+        manifest = DownloadManifest(self.dest_dir.name)
+        self.assertFalse(self.yt.download_song('v0000000010', self.dest_dir.name,
+                                               skip_metadata_existing=True, manifest=manifest))
+        self.assertEqual(self.server.stats.snapshot(), {})
+        self.yt.download_song('v0000000010', self.dest_dir.name, manifest=manifest)
+        self.assertIsNotNone(manifest.get('v0000000010')['tags'])
+
+    def test_manifest_tag_hash(self):
+        track = self.yt.get_playlist('PLdownloads_2')['tracks'][1]
+        self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=track, manifest=True)
+        path = os.path.join(self.dest_dir.name, self.files()[0])
+        # fields of the metadata which are not written to the file do not invalidate its entry
+        self.server.stats.reset()
+        changed = dict(track, likeStatus='LIKE', setVideoId='changed',
+                       feedbackTokens={'add': 'added', 'remove': 'removed'})
+        self.assertFalse(self.yt.download_song(track['videoId'], self.dest_dir.name,
+                                               song_info=changed, manifest=True))
+        self.assertEqual(self.server.stats.snapshot(), {})
+        changed['album'] = {'name': 'Another album', 'id': None}
+        self.yt.download_song(track['videoId'], self.dest_dir.name, song_info=changed,
+                              manifest=True)
+        self.assertEqual(MP4(path)['\xa9alb'], ['Another album'])
+
+    def test_download_manager_failures(self):
+        with DownloadManager(self.yt, concurrency=2) as manager:
+            manager.submit('v0000000001', self.dest_dir.name)
+            manager.submit('v0000000002', os.path.join(self.dest_dir.name, 'missing'))
+            results = manager.wait()
+        self.assertEqual(results[0]['status'], 'downloaded')
+        self.assertEqual(results[1]['status'], 'failed')
+        self.assertEqual(results[1]['stage'], 'transfer')
+
+    def test_download_manager_per_host(self):
+        self.server.options.bandwidth = 4 * 1024 * 1024
+        self.server.stats.reset()
+        with DownloadManager(self.yt, concurrency=2, per_host=2, prefetch=2) as manager:
+            # songs short enough that no range is split, which would end a response early
+            for video_id in ('v0000000012', 'v0000000019', 'v0000000021'):
+                manager.submit(video_id, self.dest_dir.name, segments=4)
+            results = manager.wait()
+        self.assertEqual([result['status'] for result in results], ['downloaded'] * 3)
+        # every connection of the segmented transfers counts against the host limit
+        self.assertLessEqual(self.server.stats.snapshot()['videoplayback']['peak'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,928 @@
+"""
+Local stand-in for the YouTube Music and YouTube endpoints used by ytmusicapi, for load testing
+and benchmarking without touching the real services.
+
+Run it from the command line::
+
+    python tests/standin.py --port 8080 --latency 0.05 --error-rate 0.01 --throttle 65536
+
+and point a client at it with ``YTMusic(base_url='http://127.0.0.1:8080')``, or start it from
+a test with :class:`StandInServer`, which runs the server in a background thread.
+
+API responses are served from the fixtures in ``tests/fixtures`` or generated on the fly:
+
+- ``VL<id>`` playlists have a synthetic track list, paged 100 tracks at a time with
+  continuations. A trailing ``_<n>`` in the playlist id sets the number of tracks.
+- ``MPREb_<id>`` albums and the ``player`` responses are generated from the id, so every
+  videoId is playable.
+- Stream URLs are signed and scrambled like the real ones. The signature is descrambled by
+  the synthetic ``base.js`` served under ``/s/player/``, requests with a wrong signature
+  are answered with 403. Streams whose ``n`` parameter was not descrambled are throttled to
+  ``--throttle`` bytes per second, as YouTube does.
+- ``/videoplayback`` serves a fragmented MP4 with an ``sidx`` index, which honours
+  ``Range`` headers and the ``range`` query parameter.
+
+Request counts, bytes sent and the peak number of streams sent at once per route are available
+as JSON under ``/_stats``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import struct
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import parse_qs, quote, urlencode, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+FIXTURE_THUMBNAIL_HOST = b'https://lh3.example.com/'
+
+PLAYER_VERSION = 'standin1'
+PLAYER_PATH = '/s/player/' + PLAYER_VERSION + '/player_ias.vflset/en_US/base.js'
+SIGNATURE_TIMESTAMP = 19000
+PAGE_SIZE = 100
+
+# descrambles the signature with reverse, splice(2) and swap(5) and the n parameter with
+# reverse and push("x"), in the form pytube's Cipher expects from the real player
+BASE_JS = '''var Xy={Ab:function(a){a.reverse()},
+Cd:function(a,b){a.splice(0,b)},
+Ef:function(a,b){var c=a[0];a[0]=a[b%a.length];a[b%a.length]=c}};
+Gh=function(a){a=a.split("");Xy.Ab(a,0);Xy.Cd(a,2);Xy.Ef(a,5);return a.join("")};
+var Ij=function(a){var b=a.split(""),c=[b,function(d){d.reverse()},function(d,e){d.push(e)},"x"];\
+try{c[1](c[0]);c[2](c[0],c[3])}catch(f){return"enhanced_except_"+a}return b.join("")};
+var Mn=[Ij];
+var Kl=function(a){a.C&&(b=a.get("n"))&&(b=Mn[0](b),a.set("n",b))};
+var ytcfg={signatureTimestamp:''' + str(SIGNATURE_TIMESTAMP) + '''};
+'''
+
+HOME_HTML = '''<!DOCTYPE html><html><head><title>YouTube Music</title></head><body>
+<script>ytcfg.set({"VISITOR_DATA":"standin","INNERTUBE_CLIENT_NAME":"WEB_REMIX"});
+ytcfg.set({"PLAYER_JS_URL":"%s","jsUrl":"%s"});</script></body></html>
+''' % (PLAYER_PATH, PLAYER_PATH)
+
+# itag: (mimeType, average bitrate), the muxed itag 18 is listed under formats
+FORMATS = {
+    18: ('video/mp4; codecs="avc1.42001E, mp4a.40.2"', 180000),
+    140: ('audio/mp4; codecs="mp4a.40.2"', 129000),
+    251: ('audio/webm; codecs="opus"', 125000),
+}
+ADAPTIVE_ITAGS = (140, 251)
+SAMPLE_RATE = 44100
+FRAME_SAMPLES = 1024
+SEGMENT_SECONDS = 10
+EXPIRES_IN_SECONDS = 21540
+
+
+class Options:
+    """Behaviour of the stand-in server, see ``python tests/standin.py --help``"""
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 error_rate: float = 0.0,
+                 drop_rate: float = 0.0,
+                 throttle: int = 0,
+                 bandwidth: int = 0,
+                 tracks: int = 300,
+                 expires_in: int = EXPIRES_IN_SECONDS,
+                 fixtures: str = FIXTURES):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.throttle = throttle
+        self.bandwidth = bandwidth
+        self.tracks = tracks
+        self.expires_in = expires_in
+        self.fixtures = fixtures
+
+
+# scrambling, the inverse of BASE_JS
+
+
+def scramble_signature(signature):
+    """Return ``s`` so that the ``base.js`` transform of ``s`` yields ``signature``"""
+    a = list(signature)
+    a[0], a[5 % len(a)] = a[5 % len(a)], a[0]
+    a = ['A', 'B'] + a
+    return ''.join(reversed(a))
+
+
+def descramble_n(n):
+    return n[::-1] + 'x'
+
+
+def expected_signature(video_id, itag, expire):
+    return hashlib.sha1('{}:{}:{}'.format(video_id, itag, expire).encode()).hexdigest()
+
+
+def initial_n(video_id):
+    return hashlib.md5(video_id.encode()).hexdigest()[:16]
+
+
+# synthetic media
+
+
+def box(kind, *payload):
+    data = b''.join(payload)
+    return struct.pack('>I', 8 + len(data)) + kind + data
+
+
+def full_box(kind, version, flags, *payload):
+    return box(kind, struct.pack('>I', version << 24 | flags), *payload)
+
+
+def descriptor(tag, payload):
+    return bytes([tag, len(payload)]) + payload
+
+
+MATRIX = struct.pack('>9I', 0x10000, 0, 0, 0, 0x10000, 0, 0, 0, 0x40000000)
+
+
+def init_segment(duration, bitrate):
+    """ftyp and moov of a fragmented single-track AAC file"""
+    ftyp = box(b'ftyp', b'dash', struct.pack('>I', 0), b'iso6mp41')
+    mvhd = full_box(b'mvhd', 0, 0, struct.pack('>IIII', 0, 0, SAMPLE_RATE, duration),
+                    struct.pack('>IH', 0x10000, 0x100), bytes(10), MATRIX, bytes(24),
+                    struct.pack('>I', 2))
+    tkhd = full_box(b'tkhd', 0, 3, struct.pack('>IIIII', 0, 0, 1, 0, duration), bytes(8),
+                    struct.pack('>HHHH', 0, 0, 0x100, 0), MATRIX, struct.pack('>II', 0, 0))
+    mdhd = full_box(b'mdhd', 0, 0, struct.pack('>IIIIHH', 0, 0, SAMPLE_RATE, duration, 0x55c4,
+                                               0))
+    hdlr = full_box(b'hdlr', 0, 0, bytes(4), b'soun', bytes(12), b'SoundHandler\x00')
+    esds = full_box(
+        b'esds', 0, 0,
+        descriptor(
+            3,
+            struct.pack('>HB', 1, 0) + descriptor(
+                4,
+                struct.pack('>BB', 0x40, 0x15) + (0).to_bytes(3, 'big')
+                + struct.pack('>II', bitrate, bitrate) + descriptor(5, b'\x12\x10'))
+            + descriptor(6, b'\x02')))
+    mp4a = box(b'mp4a', bytes(6), struct.pack('>H', 1), bytes(8),
+               struct.pack('>HHHH', 2, 16, 0, 0), struct.pack('>I', SAMPLE_RATE << 16), esds)
+    stbl = box(b'stbl', full_box(b'stsd', 0, 0, struct.pack('>I', 1), mp4a),
+               full_box(b'stts', 0, 0, struct.pack('>I', 0)),
+               full_box(b'stsc', 0, 0, struct.pack('>I', 0)),
+               full_box(b'stsz', 0, 0, struct.pack('>II', 0, 0)),
+               full_box(b'stco', 0, 0, struct.pack('>I', 0)))
+    minf = box(b'minf', full_box(b'smhd', 0, 0, bytes(4)),
+               box(b'dinf', full_box(b'dref', 0, 0, struct.pack('>I', 1),
+                                     full_box(b'url ', 0, 1))), stbl)
+    trak = box(b'trak', tkhd, box(b'mdia', mdhd, hdlr, minf))
+    mvex = box(b'mvex', full_box(b'trex', 0, 0, struct.pack('>IIIII', 1, 1, 0, 0, 0)))
+    return ftyp + box(b'moov', mvhd, trak, mvex)
+
+
+def media_segment(sequence, decode_time, frame_sizes, payload):
+    trun_entries = b''.join(struct.pack('>II', FRAME_SAMPLES, size) for size in frame_sizes)
+
+    def moof(data_offset):
+        return box(
+            b'moof', full_box(b'mfhd', 0, 0, struct.pack('>I', sequence)),
+            box(b'traf', full_box(b'tfhd', 0, 0x020000, struct.pack('>I', 1)),
+                full_box(b'tfdt', 1, 0, struct.pack('>Q', decode_time)),
+                full_box(b'trun', 0, 0x000301, struct.pack('>Ii', len(frame_sizes), data_offset),
+                         trun_entries)))
+
+    header = moof(0)
+    return moof(len(header) + 8) + box(b'mdat', payload)
+
+
+@lru_cache(maxsize=32)
+def media(video_id, itag):
+    """
+    Fragmented MP4 for a video and format, deterministic for the same arguments.
+
+    :return: Tuple of the file contents, duration in ms, initRange and indexRange
+    """
+    rng = random.Random(video_id + str(itag))
+    seconds = 120 + int(hashlib.md5(video_id.encode()).hexdigest(), 16) % 180
+    bitrate = FORMATS[itag][1]
+    frames = seconds * SAMPLE_RATE // FRAME_SAMPLES
+    frame_size = bitrate * FRAME_SAMPLES // SAMPLE_RATE // 8
+    frames_per_segment = SEGMENT_SECONDS * SAMPLE_RATE // FRAME_SAMPLES
+    duration = frames * FRAME_SAMPLES
+
+    init = init_segment(duration, bitrate)
+    segments = []
+    references = []
+    for sequence, first in enumerate(range(0, frames, frames_per_segment)):
+        count = min(frames_per_segment, frames - first)
+        sizes = [frame_size + rng.randrange(-16, 16) for _ in range(count)]
+        segment = media_segment(sequence + 1, first * FRAME_SAMPLES, sizes,
+                                rng.randbytes(sum(sizes)))
+        segments.append(segment)
+        references.append(
+            struct.pack('>III', len(segment), count * FRAME_SAMPLES, 1 << 31 | 1 << 28))
+    sidx = full_box(b'sidx', 0, 0, struct.pack('>IIIIHH', 1, SAMPLE_RATE, 0, 0, 0,
+                                               len(references)), *references)
+    data = init + sidx + b''.join(segments)
+    return (data, duration * 1000 // SAMPLE_RATE, (0, len(init) - 1),
+            (len(init), len(init) + len(sidx) - 1))
+
+
+@lru_cache(maxsize=None)
+def thumbnail(width, height):
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with BytesIO() as f:
+        Image.new('RGB', (width, height), (width % 256, height % 256, 128)).save(f, 'jpeg')
+        return f.getvalue()
+
+
+# synthetic API responses
+
+
+def video_id(i):
+    return 'v%010d' % i
+
+
+def thumbnails(base_url, key, sizes=((60, 60), (120, 120))):
+    return [{
+        'url': '{}/thumbnails/{}=w{}-h{}'.format(base_url, key, width, height),
+        'width': width,
+        'height': height
+    } for width, height in sizes]
+
+
+def text_run(text, browse_id=None, watch_id=None):
+    run = {'text': text}
+    if browse_id:
+        run['navigationEndpoint'] = {'browseEndpoint': {'browseId': browse_id}}
+    if watch_id:
+        run['navigationEndpoint'] = {'watchEndpoint': {'videoId': watch_id}}
+    return run
+
+
+SEPARATOR = {'text': ' • '}
+
+
+def flex_column(runs):
+    return {'musicResponsiveListItemFlexColumnRenderer': {'text': {'runs': runs}}}
+
+
+def track(base_url, i, set_video_id=None, album=None):
+    """A ``musicResponsiveListItemRenderer`` for the ``i``-th synthetic track"""
+    items = []
+    if set_video_id:
+        items.append({
+            'menuServiceItemRenderer': {
+                'serviceEndpoint': {
+                    'playlistEditEndpoint': {
+                        'actions': [{
+                            'setVideoId': set_video_id,
+                            'removedVideoId': video_id(i)
+                        }]
+                    }
+                }
+            }
+        })
+    items.append({
+        'toggleMenuServiceItemRenderer': {
+            'defaultIcon': {
+                'iconType': 'LIBRARY_ADD'
+            },
+            'defaultServiceEndpoint': {
+                'feedbackEndpoint': {
+                    'feedbackToken': 'FBADD%d' % i
+                }
+            },
+            'toggledServiceEndpoint': {
+                'feedbackEndpoint': {
+                    'feedbackToken': 'FBREM%d' % i
+                }
+            }
+        }
+    })
+    album = album or ('Album %d' % (i % 11), 'MPREb_album%04d' % (i % 11))
+    data = {
+        'thumbnail': {
+            'musicThumbnailRenderer': {
+                'thumbnail': {
+                    'thumbnails': thumbnails(base_url, 't%d' % i)
+                }
+            }
+        },
+        'overlay': {
+            'musicItemThumbnailOverlayRenderer': {
+                'content': {
+                    'musicPlayButtonRenderer': {
+                        'playNavigationEndpoint': {
+                            'watchEndpoint': {
+                                'videoId': video_id(i)
+                            }
+                        }
+                    }
+                }
+            }
+        },
+        'flexColumns': [
+            flex_column([text_run('Track %d' % i, watch_id=video_id(i))]),
+            flex_column([text_run('Artist %d' % (i % 7), 'UCartist%04d' % (i % 7))]),
+            flex_column([text_run(*album)])
+        ],
+        'fixedColumns': [{
+            'musicResponsiveListItemFixedColumnRenderer': {
+                'text': {
+                    'runs': [{
+                        'text': '%d:%02d' % (2 + i % 4, (i * 7) % 60)
+                    }]
+                }
+            }
+        }],
+        'menu': {
+            'menuRenderer': {
+                'items': items,
+                'topLevelButtons': [{
+                    'likeButtonRenderer': {
+                        'likeStatus': 'INDIFFERENT'
+                    }
+                }]
+            }
+        }
+    }
+    return {'musicResponsiveListItemRenderer': data}
+
+
+def detail_header(base_url, title, kind, key, count, extra=None):
+    header = {
+        'title': {
+            'runs': [{
+                'text': title
+            }]
+        },
+        'thumbnail': {
+            'croppedSquareThumbnailRenderer': {
+                'thumbnail': {
+                    'thumbnails': thumbnails(base_url, key, ((60, 60), (226, 226), (544, 544)))
+                }
+            }
+        },
+        'description': {
+            'runs': [{
+                'text': 'Stand-in ' + kind.lower()
+            }]
+        },
+        'subtitle': {
+            'runs': [
+                {'text': kind}, SEPARATOR, text_run('Artist 1', 'UCartist0001'), SEPARATOR,
+                {'text': '2021'}
+            ]
+        },
+        'secondSubtitle': {
+            'runs': [{
+                'text': '%d songs' % count
+            }, SEPARATOR, {
+                'text': '%d minutes' % (count * 4)
+            }]
+        }
+    }
+    header.update(extra or {})
+    return {'musicDetailHeaderRenderer': header}
+
+
+def single_column(contents):
+    return {
+        'singleColumnBrowseResultsRenderer': {
+            'tabs': [{
+                'tabRenderer': {
+                    'content': {
+                        'sectionListRenderer': {
+                            'contents': contents
+                        }
+                    }
+                }
+            }]
+        }
+    }
+
+
+def playlist_size(playlist_id, default):
+    match = re.search(r'_(\d+)$', playlist_id)
+    return int(match.group(1)) if match else default
+
+
+def playlist_page(base_url, playlist_id, offset, count):
+    """Tracks and continuation of the playlist shelf starting at ``offset``"""
+    end = min(offset + PAGE_SIZE, count)
+    shelf = {
+        'contents': [
+            track(base_url, i, 'SV%08d' % i) for i in range(offset, end)
+        ]
+    }
+    if end < count:
+        token = '{}:{}'.format(playlist_id, end)
+        shelf['continuations'] = [{'nextContinuationData': {'continuation': token}}]
+    return shelf
+
+
+def playlist_response(base_url, playlist_id, count):
+    shelf = playlist_page(base_url, playlist_id, 0, count)
+    shelf['playlistId'] = playlist_id
+    return {
+        'header': detail_header(base_url, 'Playlist ' + playlist_id, 'Playlist', playlist_id,
+                                count),
+        'contents': single_column([{
+            'musicPlaylistShelfRenderer': shelf
+        }])
+    }
+
+
+def album_response(base_url, browse_id):
+    seed = int(hashlib.md5(browse_id.encode()).hexdigest(), 16)
+    first = seed % 100000 * 20
+    indices = list(range(first, first + 8 + seed % 8))
+    kind = 'Album'
+    if browse_id.startswith('MPREb_single'):
+        # the first song of the album with the same number, and a song of its own
+        album_id = 'MPREb_album' + browse_id[len('MPREb_single'):]
+        indices = [int(hashlib.md5(album_id.encode()).hexdigest(), 16) % 100000 * 20, first]
+        kind = 'Single'
+    title = 'Album ' + browse_id[len('MPREb_'):]
+    buttons = {
+        'menu': {
+            'menuRenderer': {
+                'topLevelButtons': [{
+                    'buttonRenderer': {
+                        'navigationEndpoint': {
+                            'watchEndpoint': {
+                                'playlistId': 'OLAK5uy_' + browse_id
+                            }
+                        }
+                    }
+                }, {
+                    'buttonRenderer': {
+                        'defaultServiceEndpoint': {
+                            'likeEndpoint': {
+                                'status': 'INDIFFERENT'
+                            }
+                        }
+                    }
+                }]
+            }
+        }
+    }
+    return {
+        'header': detail_header(base_url, title, kind, browse_id, len(indices), buttons),
+        'contents': single_column([{
+            'musicShelfRenderer': {
+                'contents': [
+                    track(base_url, i, album=(title, browse_id)) for i in indices
+                ]
+            }
+        }])
+    }
+
+
+def artist_albums_response(artist):
+    """Grid of all albums of the artist fixture, as returned for the artist's album params"""
+    sections = artist['contents']['singleColumnBrowseResultsRenderer']['tabs'][0][
+        'tabRenderer']['content']['sectionListRenderer']['contents']
+    items = [
+        item for section in sections if 'musicCarouselShelfRenderer' in section
+        for item in section['musicCarouselShelfRenderer']['contents']
+        if 'MPREb' in json.dumps(item)
+    ]
+    return {'contents': single_column([{'gridRenderer': {'items': items}}])}
+
+
+def player_response(base_url, video_id, options, signature_timestamp=SIGNATURE_TIMESTAMP):
+    """
+    ``player`` response with signed, scrambled stream URLs for every format. Like YouTube, the
+    signatures only descramble to valid ones with the ``base.js`` of the ``signature_timestamp``.
+    """
+    expire = int(time.time()) + options.expires_in
+    formats = {}
+    duration_ms = 0
+    for itag, (mime_type, bitrate) in FORMATS.items():
+        data, duration_ms, init_range, index_range = media(video_id, itag)
+        url = base_url + '/videoplayback?' + urlencode({
+            'id': video_id,
+            'itag': itag,
+            'expire': expire,
+            'n': initial_n(video_id)
+        })
+        signature = expected_signature(video_id, itag, expire)
+        if signature_timestamp != SIGNATURE_TIMESTAMP:
+            signature = signature[::-1]
+        cipher = urlencode({
+            's': scramble_signature(signature),
+            'sp': 'sig',
+            'url': url
+        })
+        fmt = {
+            'itag': itag,
+            'mimeType': mime_type,
+            'bitrate': bitrate + 1000,
+            'averageBitrate': bitrate,
+            'contentLength': str(len(data)),
+            'approxDurationMs': str(duration_ms),
+            'lastModified': '1614620870611066',
+            'quality': 'tiny',
+            'audioQuality': 'AUDIO_QUALITY_MEDIUM',
+            'audioSampleRate': str(SAMPLE_RATE),
+            'audioChannels': 2,
+            'signatureCipher': cipher
+        }
+        if itag in ADAPTIVE_ITAGS:
+            fmt['initRange'] = {'start': str(init_range[0]), 'end': str(init_range[1])}
+            fmt['indexRange'] = {'start': str(index_range[0]), 'end': str(index_range[1])}
+        formats[itag] = fmt
+
+    title = 'Track ' + str(int(video_id[1:])) if video_id[1:].isdigit() else video_id
+    watch_url = base_url + '/watch?v=' + video_id
+    return {
+        'playabilityStatus': {
+            'status': 'OK',
+            'playableInEmbed': True
+        },
+        'streamingData': {
+            'expiresInSeconds': str(options.expires_in),
+            'formats': [formats[18]],
+            'adaptiveFormats': [formats[itag] for itag in ADAPTIVE_ITAGS]
+        },
+        'videoDetails': {
+            'videoId': video_id,
+            'title': title,
+            'lengthSeconds': str(duration_ms // 1000),
+            'channelId': 'UCartist0001',
+            'author': 'Artist 1 - Topic',
+            'isPrivate': False,
+            'musicVideoType': 'MUSIC_VIDEO_TYPE_ATV',
+            'thumbnail': {
+                'thumbnails': thumbnails(base_url, video_id, ((60, 60), (120, 120), (226, 226),
+                                                              (544, 544)))
+            },
+            'viewCount': '1000'
+        },
+        'microformat': {
+            'microformatDataRenderer': {
+                'urlCanonical': watch_url,
+                'title': title,
+                'category': 'Music',
+                'publishDate': '2021-01-01'
+            }
+        }
+    }
+
+
+# server
+
+
+class Stats:
+    """Thread safe request and byte counters per route"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active = {}
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+
+    def _counters(self, route):
+        return self._routes.setdefault(route, {'requests': 0, 'errors': 0, 'bytes': 0, 'peak': 0})
+
+    @contextmanager
+    def sending(self, route):
+        """Count a response body being sent, the most sent at the same time is the ``peak``"""
+        with self._lock:
+            self._active[route] = self._active.get(route, 0) + 1
+            counters = self._counters(route)
+            counters['peak'] = max(counters['peak'], self._active[route])
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active[route] -= 1
+
+    def record(self, route, status=None, sent=0):
+        with self._lock:
+            counters = self._counters(route)
+            if status is not None:
+                counters['requests'] += 1
+                counters['errors'] += status >= 400
+            counters['bytes'] += sent
+
+    def snapshot(self):
+        with self._lock:
+            return {route: dict(counters) for route, counters in self._routes.items()}
+
+
+class Dropped(Exception):
+    pass
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'StandIn/1.0'
+
+    @property
+    def options(self):
+        return self.server.options
+
+    @property
+    def base_url(self):
+        return 'http://' + self.headers.get('Host', '{}:{}'.format(*self.server.server_address))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        body = b''
+        if 'Content-Length' in self.headers:
+            body = self.rfile.read(int(self.headers['Content-Length']))
+
+        route, handler = self._route(method, url.path)
+        if route != '_stats':
+            delay = self.options.latency + random.uniform(0, self.options.jitter)
+            if delay > 0:
+                time.sleep(delay)
+            if random.random() < self.options.error_rate:
+                return self._send_json(route, {
+                    'error': {
+                        'code': 503,
+                        'message': 'Stand-in error'
+                    }
+                }, 503)
+        try:
+            handler(route, url.path, query, body)
+        except (BrokenPipeError, ConnectionResetError, Dropped):
+            self.close_connection = True
+
+    def _route(self, method, path):
+        if path.startswith('/youtubei/v1/') and method == 'POST':
+            endpoint = path[len('/youtubei/v1/'):]
+            if endpoint == 'browse':
+                return endpoint, self.browse
+            if endpoint == 'player':
+                return endpoint, self.player
+            if endpoint in ('search', 'next'):
+                return endpoint, self.fixture_endpoint
+            return endpoint, self.edit_endpoint
+        routes = {
+            '/': self.home,
+            '/watch': self.home,
+            '/playlist': self.playlist_page,
+            '/get_video_info': self.get_video_info,
+            '/videoplayback': self.videoplayback,
+            '/_stats': self.stats
+        }
+        if path in routes:
+            return path.strip('/') or 'home', routes[path]
+        if path.startswith('/s/player/') and path.endswith('/base.js'):
+            return 'base.js', self.base_js
+        if path.startswith('/thumbnails/'):
+            return 'thumbnails', self.thumbnail
+        return 'not found', self.not_found
+
+    def _send(self, route, data: bytes, content_type, status=200, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        # count the request before the client can see the response, so it is in the stats by then
+        self.server.stats.record(route, status)
+        self.wfile.write(data)
+        self.server.stats.record(route, sent=len(data))
+
+    def _send_json(self, route, response, status=200):
+        self._send(route, json.dumps(response).encode(), 'application/json; charset=UTF-8', status)
+
+    def fixture(self, name):
+        with open(os.path.join(self.options.fixtures, name + '.json'), 'rb') as f:
+            data = f.read()
+        return json.loads(data.replace(FIXTURE_THUMBNAIL_HOST,
+                                       self.base_url.encode() + b'/thumbnails/'))
+
+    def not_found(self, route, path, query, body):
+        self._send_json(route, {'error': {'code': 404, 'message': 'Not found: ' + path}}, 404)
+
+    def home(self, route, path, query, body):
+        self._send(route, HOME_HTML.encode(), 'text/html; charset=utf-8')
+
+    def playlist_page(self, route, path, query, body):
+        playlist_id = query.get('list', [''])[0]
+        html = '<script>var data = {"browseId":"MPREb_%s"};</script>' % playlist_id
+        self._send(route, html.encode(), 'text/html; charset=utf-8')
+
+    def base_js(self, route, path, query, body):
+        self._send(route, BASE_JS.encode(), 'text/javascript')
+
+    def stats(self, route, path, query, body):
+        self._send(route, json.dumps(self.server.stats.snapshot()).encode(), 'application/json')
+
+    def thumbnail(self, route, path, query, body):
+        match = re.search(r'=w(\d+)-h(\d+)$', path)
+        data = thumbnail(int(match.group(1)), int(match.group(2))) if match else None
+        if data is None:
+            return self.not_found(route, path, query, body)
+        self._send(route, data, 'image/jpeg')
+
+    def browse(self, route, path, query, body):
+        request = json.loads(body or b'{}')
+        if 'ctoken' in query:
+            playlist_id, offset = query['ctoken'][0].rsplit(':', 1)
+            count = playlist_size(playlist_id, self.options.tracks)
+            return self._send_json(route, {
+                'continuationContents': {
+                    'musicPlaylistShelfContinuation':
+                    playlist_page(self.base_url, playlist_id, int(offset), count)
+                }
+            })
+
+        browse_id = request.get('browseId', '')
+        if browse_id.startswith('VL'):
+            playlist_id = browse_id[2:]
+            count = playlist_size(playlist_id, self.options.tracks)
+            return self._send_json(route, playlist_response(self.base_url, playlist_id, count))
+        if browse_id.startswith('MPREb'):
+            return self._send_json(route, album_response(self.base_url, browse_id))
+        if browse_id.startswith('UC'):
+            artist = self.fixture('artist')
+            if 'params' in request:
+                return self._send_json(route, artist_albums_response(artist))
+            return self._send_json(route, artist)
+        fixtures = {
+            'FEmusic_liked_videos': 'library_songs',
+            'FEmusic_liked_albums': 'library_albums',
+            'FEmusic_library_corpus_track_artists': 'library_artists',
+            'FEmusic_library_corpus_artists': 'library_artists',
+            'FEmusic_library_privately_owned_tracks': 'upload_songs'
+        }
+        if browse_id in fixtures:
+            return self._send_json(route, self.fixture(fixtures[browse_id]))
+        self.not_found(route, path, query, body)
+
+    def fixture_endpoint(self, route, path, query, body):
+        self._send_json(route, self.fixture({'search': 'search', 'next': 'watch'}[route]))
+
+    def edit_endpoint(self, route, path, query, body):
+        response = {'status': 'STATUS_SUCCEEDED'}
+        if route == 'playlist/create':
+            response['playlistId'] = 'PLstandin%08d' % random.randrange(10**8)
+        self._send_json(route, response)
+
+    def player(self, route, path, query, body):
+        request = json.loads(body or b'{}')
+        video_id = request.get('video_id', request.get('videoId', ''))
+        signature_timestamp = request.get('playbackContext', {}).get(
+            'contentPlaybackContext', {}).get('signatureTimestamp', SIGNATURE_TIMESTAMP)
+        self._send_json(
+            route, player_response(self.base_url, video_id, self.options, signature_timestamp))
+
+    def get_video_info(self, route, path, query, body):
+        video_id = query.get('video_id', [''])[0]
+        response = player_response(self.base_url, video_id, self.options)
+        data = 'status=ok&player_response=' + quote(json.dumps(response))
+        self._send(route, data.encode(), 'application/x-www-form-urlencoded')
+
+    def videoplayback(self, route, path, query, body):
+        video_id = query.get('id', [''])[0]
+        itag = int(query.get('itag', ['0'])[0])
+        expire = int(query.get('expire', ['0'])[0])
+        if itag not in FORMATS or not video_id:
+            return self.not_found(route, path, query, body)
+        if (expire < time.time()
+                or query.get('sig', [''])[0] != expected_signature(video_id, itag, expire)):
+            return self._send(route, b'', 'text/plain', 403)
+
+        data = media(video_id, itag)[0]
+        start, end = 0, len(data) - 1
+        requested = self.headers.get('Range', '').replace('bytes=', '') or query.get(
+            'range', [''])[0]
+        if requested:
+            first, _, last = requested.partition('-')
+            start = int(first) if first else max(len(data) - int(last), 0)
+            end = min(int(last), len(data) - 1) if first and last else len(data) - 1
+            if start > end:
+                return self._send(route, b'', 'text/plain', 416,
+                                  {'Content-Range': 'bytes */{}'.format(len(data))})
+
+        self.send_response(206 if requested else 200)
+        self.send_header('Content-Type', FORMATS[itag][0].split(';')[0])
+        self.send_header('Content-Length', str(end - start + 1))
+        self.send_header('Accept-Ranges', 'bytes')
+        if requested:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end, len(data)))
+        self.end_headers()
+        self.server.stats.record(route, 206 if requested else 200)
+
+        rate = self.options.bandwidth
+        if query.get('n', [''])[0] != descramble_n(initial_n(video_id)) and self.options.throttle:
+            rate = min(rate, self.options.throttle) if rate else self.options.throttle
+        drop_at = None
+        if random.random() < self.options.drop_rate:
+            drop_at = random.randint(start, end)
+        chunk_size = min(rate // 10, 65536) if rate else 65536
+        with self.server.stats.sending(route):
+            position = start
+            began = time.perf_counter()
+            while position <= end:
+                chunk = data[position:min(position + chunk_size, end + 1)]
+                if drop_at is not None and position + len(chunk) > drop_at:
+                    self.wfile.write(chunk[:drop_at - position])
+                    self.server.stats.record(route, sent=drop_at - position)
+                    raise Dropped()
+                self.wfile.write(chunk)
+                self.server.stats.record(route, sent=len(chunk))
+                position += len(chunk)
+                if rate:
+                    ahead = (position - start) / rate - (time.perf_counter() - began)
+                    if ahead > 0:
+                        time.sleep(ahead)
+
+
+class StandInServer(ThreadingHTTPServer):
+    """
+    Stand-in server running in a background thread::
+
+        with StandInServer(latency=0.02) as server:
+            yt = YTMusic(base_url=server.url)
+    """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, verbose=False, **options):
+        super().__init__((host, port), StandInHandler)
+        self.options = Options(**options)
+        self.stats = Stats()
+        self.verbose = verbose
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, execType=None, execValue=None, traceback=None):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Delay before every response in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Additional random delay of up to this many seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with 503')
+    parser.add_argument('--drop-rate', type=float, default=0.0,
+                        help='Fraction of stream transfers dropped midway')
+    parser.add_argument('--throttle', type=int, default=0,
+                        help='Bytes per second for streams with an undescrambled n parameter')
+    parser.add_argument('--bandwidth', type=int, default=0,
+                        help='Bytes per second for every stream transfer')
+    parser.add_argument('--tracks', type=int, default=300,
+                        help='Number of tracks of playlists without a size in their id')
+    parser.add_argument('--expires-in', type=int, default=EXPIRES_IN_SECONDS,
+                        help='Lifetime of stream URLs in seconds')
+    parser.add_argument('--fixtures', default=FIXTURES)
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    args = vars(parser.parse_args(argv))
+    server = StandInServer(args.pop('host'), args.pop('port'), args.pop('verbose'), **args)
+    print('Serving on ' + server.url, file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
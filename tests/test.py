@@ -1,9 +1,13 @@
 import unittest
 import unittest.mock
 import configparser
+import os
 import sys
 sys.path.insert(0, '..')
 from ytmusicapi.ytmusic import YTMusic  # noqa: E402
+from ytmusicapi.parsers.browsing import THOUSANDS_SEPARATORS, get_parser  # noqa: E402
+from ytmusicapi.parsers.executor import ParseExecutor  # noqa: E402
+from ytmusicapi.parsers.playlists import LazyPlaylistItem, LazyPlaylistItems  # noqa: E402
 
 config = configparser.RawConfigParser()
 config.read('./test.cfg', 'utf-8')
@@ -23,6 +27,17 @@ class TestYTMusic(unittest.TestCase):
     def test_init(self):
         self.assertRaises(Exception, YTMusic, "{}")
 
+    def test_to_int(self):
+        locales = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ytmusicapi',
+                               'locales')
+        languages = [name for name in os.listdir(locales)
+                     if os.path.isdir(os.path.join(locales, name))]
+        self.assertEqual(sorted(THOUSANDS_SEPARATORS), sorted(languages))
+        self.assertEqual(get_parser('en').to_int('1,234 songs'), 1234)
+        self.assertEqual(get_parser('de').to_int('1.234 Titel'), 1234)
+        self.assertEqual(get_parser('de').to_int('1,5 Titel'), 1)
+        self.assertEqual(get_parser('fr').to_int('1\u202f234 titres'), 1234)
+
     def test_setup(self):
         headers = YTMusic.setup(config['auth']['headers_file'], config['auth']['headers_raw'])
         self.assertGreaterEqual(len(headers), 2)
@@ -59,6 +74,17 @@ class TestYTMusic(unittest.TestCase):
         results = self.yt_auth.search("hip hop", 'featured_playlists')
         self.assertGreater(len(results), 5)
 
+    def test_search_languages(self):
+        from concurrent.futures import ThreadPoolExecutor
+        languages = ['de', 'es', 'fr', 'it', 'ja', 'en']
+        clients = [YTMusic(requests_session=False, language=language) for language in languages]
+        with ThreadPoolExecutor(len(clients)) as pool:
+            results = list(pool.map(lambda yt: yt.search("Oasis Wonderwall"), clients))
+        for language, result in zip(languages, results):
+            result_types = {item['resultType'] for item in result}
+            self.assertIn('song', result_types, language)
+            self.assertIn('artist', result_types, language)
+
     def test_search_uploads(self):
         results = self.yt_auth.search('audiomachine', 'uploads', limit=40)
         self.assertGreater(len(results), 20)
@@ -263,6 +289,34 @@ class TestYTMusic(unittest.TestCase):
         playlist = self.yt.get_playlist(sample_playlist, 300)
         self.assertGreater(len(playlist['tracks']), 200)
 
+    def test_get_playlist_parse_executor(self):
+        with ParseExecutor(max_workers=1) as executor:
+            yt = YTMusic(requests_session=False, parse_executor=executor)
+            playlist = yt.get_playlist(sample_playlist, 300)
+            self.assertGreater(len(playlist['tracks']), 200)
+            timings = executor.timings
+            self.assertEqual(timings['playlists.parse_playlist_response']['offloaded'], 1)
+            continuations = timings['playlists.parse_playlist_continuation']
+            self.assertGreater(continuations['calls'], 0)
+            self.assertEqual(continuations['calls'], continuations['offloaded'])
+
+    def test_get_playlist_lazy(self):
+        playlist = self.yt.get_playlist(sample_playlist, 300)
+        lazy = self.yt.get_playlist(sample_playlist, 300, lazy=True)
+        self.assertEqual(len(lazy['tracks']), len(playlist['tracks']))
+        self.assertEqual(lazy['tracks'][5]['videoId'], playlist['tracks'][5]['videoId'])
+        self.assertEqual([dict(track) for track in lazy['tracks'][:10]], playlist['tracks'][:10])
+        # parsed items are kept as they are
+        tracks = lazy['tracks'][:2]
+        tracks.extend(playlist['tracks'][2:4])
+        self.assertEqual([dict(track) for track in tracks], playlist['tracks'][:4])
+        self.assertRaises(TypeError, tracks.extend, [None])
+        # broken items do not fail the playlist
+        item = LazyPlaylistItem({'flexColumns': []})
+        self.assertIsNone(item['title'])
+        self.assertIsNone(item['videoId'])
+        self.assertEqual(len(LazyPlaylistItems([{'musicResponsiveListItemRenderer': {}}])), 0)
+
     def test_get_owned_playlist(self):
         playlist = self.yt_brand.get_playlist(config['playlists']['own'])
         self.assertLess(len(playlist['tracks']), 100)
@@ -1,5 +1,10 @@
 from ytmusicapi._version import __version__
 from ytmusicapi.ytmusic import YTMusic
+from ytmusicapi.parsers.executor import ParseExecutor
+from ytmusicapi.downloader import (DownloadManager, SegmentedDownload, PlayerCache, StreamCache,
+                                   DownloadManifest, ThumbnailCache, Retagger, ProgressEvent,
+                                   ProgressAggregator, AudioProxy, SegmentCache, FormatSelector,
+                                   Prefetcher, DiscographyPlan, DownloadStore)
 
 __copyright__ = 'Copyright 2020 sigma67'
 __license__ = 'MIT'
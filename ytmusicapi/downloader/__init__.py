@@ -0,0 +1,13 @@
+from ytmusicapi.downloader.manager import DownloadManager
+from ytmusicapi.downloader.prefetch import Prefetcher
+from ytmusicapi.downloader.planner import DiscographyPlan
+from ytmusicapi.downloader.segmented import SegmentedDownload
+from ytmusicapi.downloader.player import Player, PlayerCache
+from ytmusicapi.downloader.streams import StreamCache
+from ytmusicapi.downloader.manifest import DownloadManifest
+from ytmusicapi.downloader.store import DownloadStore
+from ytmusicapi.downloader.thumbnails import ThumbnailCache
+from ytmusicapi.downloader.retag import Retagger
+from ytmusicapi.downloader.progress import ProgressEvent, ProgressAggregator
+from ytmusicapi.downloader.proxy import AudioProxy, SegmentCache
+from ytmusicapi.downloader.formats import FormatSelector
@@ -0,0 +1,63 @@
+"""
+Command line tools for downloads::
+
+    python -m ytmusicapi.downloader rebuild-manifest ~/Music
+    python -m ytmusicapi.downloader serve --port 8080 --cache-size 2048
+"""
+import argparse
+import os
+import sys
+
+from ytmusicapi.downloader.manifest import DownloadManifest
+from ytmusicapi.downloader.proxy import AudioProxy, SegmentCache
+from ytmusicapi.ytmusic import YTMusic
+
+
+def rebuild_manifest(args):
+    if not os.path.isdir(args.directory):
+        raise SystemExit('Not a directory: ' + args.directory)
+    manifest = DownloadManifest(args.directory)
+    print('Recorded {} songs in {}'.format(manifest.rebuild(), manifest.path), file=sys.stderr)
+
+
+def serve(args):
+    cache = SegmentCache(args.cache_dir, args.cache_size * 1024 * 1024,
+                         args.segment_size * 1024)
+    proxy = AudioProxy(YTMusic(args.auth), cache, args.host, args.port, args.verbose)
+    print('Serving /audio/<videoId> on ' + proxy.url, file=sys.stderr)
+    try:
+        proxy.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        proxy.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m ytmusicapi.downloader',
+                                     description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    rebuild = commands.add_parser(
+        'rebuild-manifest',
+        help='Record the files with a [videoId] in their name in the download manifest')
+    rebuild.add_argument('directory', help='Top directory of the downloads')
+    rebuild.set_defaults(function=rebuild_manifest)
+    proxy = commands.add_parser(
+        'serve', help='Serve the audio of songs at /audio/<videoId>, cached on disk')
+    proxy.add_argument('--host', default='127.0.0.1')
+    proxy.add_argument('--port', type=int, default=8080)
+    proxy.add_argument('--auth', help='Optional headers file of an account, see YTMusic()')
+    proxy.add_argument('--cache-dir', default=SegmentCache().directory,
+                       help='Directory of the cached segments')
+    proxy.add_argument('--cache-size', type=int, default=2048,
+                       help='Maximum size of the cache in MiB')
+    proxy.add_argument('--segment-size', type=int, default=1024,
+                       help='Size of the cached segments in KiB')
+    proxy.add_argument('--verbose', action='store_true', help='Log every request')
+    proxy.set_defaults(function=serve)
+    args = parser.parse_args(argv)
+    args.function(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+from typing import Dict, List, Optional, Tuple
+
+# names of codecs which differ from their identifier in the mimeType
+CODEC_ALIASES = {'aac': 'mp4a', 'h264': 'avc1'}
+
+
+def parse_mime_type(mime_type: str) -> Tuple[str, str, List[str]]:
+    """
+    Kind, container and codecs of a format, i.e. ``('audio', 'webm', ['opus'])`` for
+    ``audio/webm; codecs="opus"``
+    """
+    kind, _, parameters = mime_type.partition(';')
+    kind, _, container = kind.strip().partition('/')
+    codecs = []
+    for parameter in parameters.split(';'):
+        key, _, value = parameter.strip().partition('=')
+        if key == 'codecs':
+            codecs = [codec.strip() for codec in value.strip('"').split(',') if codec.strip()]
+    return kind, container, codecs
+
+
+def bitrate(fmt: Dict) -> int:
+    """Average bitrate of a format in bits per second, its peak bitrate if it has no average"""
+    return int(fmt.get('averageBitrate') or fmt.get('bitrate') or 0)
+
+
+def expected_bytes(fmt: Dict) -> Optional[int]:
+    """
+    Size of the stream of a format in bytes, its ``contentLength``. Estimated from the bitrate and
+    the duration for formats without one, ``None`` if that is not possible either.
+    """
+    if fmt.get('contentLength'):
+        return int(fmt['contentLength'])
+    if fmt.get('approxDurationMs') and bitrate(fmt):
+        return bitrate(fmt) * int(fmt['approxDurationMs']) // 8000
+    return None
+
+
+class FormatSelector:
+    """
+    Chooses the format to download from the ``formats`` and ``adaptiveFormats`` of a player
+    response. The formats that do not meet the constraints are left out, the others are ranked
+    by their bitrate, the highest first unless ``prefer`` is ``smallest``::
+
+        # opus up to 160 kbps
+        FormatSelector(codec='opus', max_bitrate=160000)
+        # the smallest audio-only format above 64 kbps
+        FormatSelector(audio_only=True, min_bitrate=64000, prefer='smallest')
+
+    The default is the audio-only format with the highest bitrate, or the format with the highest
+    bitrate if there is no audio-only format.
+    """
+    def __init__(self, codec: Optional[str] = None, container: Optional[str] = None,
+                 min_bitrate: Optional[int] = None, max_bitrate: Optional[int] = None,
+                 audio_only: Optional[bool] = None, prefer: str = 'highest'):
+        """
+        :param codec: Optional. Codec of the format, i.e. ``opus`` or ``mp4a``, also ``aac``
+        :param container: Optional. Container of the format, i.e. ``webm`` or ``mp4``
+        :param min_bitrate: Optional. Lowest average bitrate in bits per second
+        :param max_bitrate: Optional. Highest average bitrate in bits per second
+        :param audio_only: True to only take audio-only formats, False to take any format.
+            Default: ``None``, audio-only formats if there are any, otherwise any format
+        :param prefer: ``highest`` for the highest bitrate, ``smallest`` for the lowest.
+            Default: ``highest``
+        """
+        if prefer not in ('highest', 'smallest'):
+            raise Exception('prefer must be "highest" or "smallest"')
+        self.codec = CODEC_ALIASES.get(codec.lower(), codec.lower()) if codec else None
+        self.container = container.lower() if container else None
+        self.min_bitrate = min_bitrate
+        self.max_bitrate = max_bitrate
+        self.audio_only = audio_only
+        self.prefer = prefer
+
+    def matches(self, fmt: Dict) -> bool:
+        """Whether a format meets the constraints, apart from ``audio_only``"""
+        kind, container, codecs = parse_mime_type(fmt.get('mimeType', ''))
+        if self.codec is not None and not any(
+                codec.lower().split('.')[0] == self.codec for codec in codecs):
+            return False
+        if self.container is not None and container.lower() != self.container:
+            return False
+        if self.min_bitrate is not None and bitrate(fmt) < self.min_bitrate:
+            return False
+        if self.max_bitrate is not None and bitrate(fmt) > self.max_bitrate:
+            return False
+        return True
+
+    def rank(self, formats: List[Dict]) -> List[Dict]:
+        """
+        The formats which meet the constraints, the preferred one first. Formats of the same
+        bitrate are ranked by their ``itag``, so the choice does not depend on their order.
+        """
+        candidates = [fmt for fmt in formats if self.matches(fmt)]
+        audio = [fmt for fmt in candidates if fmt.get('mimeType', '').startswith('audio/')]
+        if self.audio_only or (self.audio_only is None and audio):
+            candidates = audio
+        return sorted(candidates,
+                      key=lambda fmt: (bitrate(fmt), fmt.get('itag', 0)),
+                      reverse=self.prefer == 'highest')
+
+    def select(self, formats: List[Dict]) -> Optional[Dict]:
+        """The preferred format which meets the constraints, ``None`` if there is none"""
+        ranked = self.rank(formats)
+        return ranked[0] if ranked else None
+
+    def __repr__(self):
+        return 'FormatSelector({})'.format(', '.join(
+            '{}={!r}'.format(key, value) for key, value in vars(self).items()
+            if value is not None))
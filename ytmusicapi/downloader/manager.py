@@ -0,0 +1,172 @@
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ytmusicapi.downloader.prefetch import Prefetcher
+
+STAGES = ('resolve', 'decrypt', 'transfer', 'tag')
+
+
+class DownloadManager:
+    """
+    Downloads many songs concurrently with a :class:`ytmusicapi.YTMusic` instance.
+
+    Every song passes through four stages: resolving its metadata, decrypting the stream URL,
+    transferring the bytes and tagging the file. Each stage admits at most ``concurrency``
+    songs at a time (``tag_workers`` for tagging), so the stages of different songs overlap,
+    i.e. the next songs are resolved while the current ones are transferred. Requests to the
+    same host are additionally limited to ``per_host`` connections, counting each connection of a
+    segmented transfer. With ``prefetch``, the player responses of the next songs are resolved
+    ahead of the workers by a :py:class:`ytmusicapi.downloader.prefetch.Prefetcher`, within the
+    limits of the resolve stage.
+
+    A failing song does not stop the others, its result is reported with the status
+    ``failed`` together with the stage and the error.
+
+    Nothing is printed. The progress of the songs is reported as
+    :py:class:`ytmusicapi.downloader.progress.ProgressEvent` objects to the ``progress``
+    callback, which is called from the download threads. A
+    :py:class:`ytmusicapi.downloader.progress.ProgressAggregator` adds them up.
+    """
+    def __init__(self, ytmusic, concurrency: int = 4, per_host: int = 4, tag_workers: int = 1,
+                 progress: Optional[Callable] = None, prefetch: int = 0):
+        """
+        :param ytmusic: :class:`ytmusicapi.YTMusic` instance used for the downloads
+        :param concurrency: Maximum number of songs in each of the resolve, decrypt and transfer
+            stages. Default: 4
+        :param per_host: Maximum number of concurrent requests to the same host. Default: 4
+        :param tag_workers: Maximum number of files tagged at the same time. Default: 1
+        :param progress: Optional. Called with every
+            :py:class:`ytmusicapi.downloader.progress.ProgressEvent` of the songs, unless they
+            are submitted with a ``progress`` option of their own
+        :param prefetch: Number of songs to resolve ahead of the ones the workers have started,
+            0 to resolve each song when its worker gets to it. Default: 0
+        """
+        self.ytmusic = ytmusic
+        self.progress = progress
+        self.concurrency = max(concurrency, 1)
+        self.per_host = max(per_host, 1)
+        self._stages = {stage: threading.BoundedSemaphore(self.concurrency) for stage in STAGES}
+        self._stages['tag'] = threading.BoundedSemaphore(max(tag_workers, 1))
+        self._hosts = {}
+        self._hosts_lock = threading.Lock()
+        # twice the stage limit, so that every stage can be busy at the same time
+        self._pool = ThreadPoolExecutor(self.concurrency * 2)
+        self._futures = []
+        self._prefetcher = Prefetcher(self._prefetch, prefetch,
+                                      self.concurrency) if prefetch > 0 else None
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=self.per_host, pool_block=True)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        with self._hosts_lock:
+            if host not in self._hosts:
+                self._hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self._hosts[host]
+
+    @contextmanager
+    def _stage(self, result, stage, url=None):
+        result['stage'] = stage
+        with ExitStack() as stack:
+            stack.enter_context(self._stages[stage])
+            if url is not None:
+                stack.enter_context(self._host(url))
+            yield
+
+    def _prefetch(self, job):
+        with self._stage({}, 'resolve', self.ytmusic.domain):
+            self.ytmusic._prefetch_song(job)
+
+    def _run(self, job):
+        yt = self.ytmusic
+        result = {'videoId': job['videoId'], 'status': None, 'path': None, 'stage': None,
+                  'error': None, 'traceback': None}
+        if self._prefetcher is not None:
+            self._prefetcher.started()
+        try:
+            # a song in the manifest is skipped without any request
+            if yt._skip_recorded(job):
+                result.update(status='skipped', path=job['path'])
+                yt._progress(job, status='skipped')
+                return result
+            with self._stage(result, 'resolve', yt.domain):
+                yt._resolve_song(job)
+            # the formats usually come with the song, or were prefetched along with it
+            with self._stage(result, 'decrypt', yt.domain if job['formats'] is None else None):
+                yt._resolve_stream(job)
+            result['path'] = job['path']
+            # the transfer takes a host permit for each of its connections
+            job['connections'] = self._host(job['format']['url'])
+            with self._stage(result, 'transfer'):
+                transferred = yt._transfer_stream(job, self.session)
+            result['status'] = 'downloaded' if transferred else 'skipped'
+            tagged = transferred or not job['skip_metadata_existing']
+            if tagged:
+                with self._stage(result, 'tag'):
+                    yt._tag_download(job)
+            yt._record_download(job, tagged)
+            result['stage'] = None
+            yt._progress(job, status=result['status'])
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = e
+            result['traceback'] = traceback.format_exc()
+            yt._progress(job, status='failed', error=e)
+        return result
+
+    def submit(self, video_id: str, dest_dir: str, **options) -> Future:
+        """
+        Queue a song for download.
+
+        :param video_id: Video id of the song
+        :param dest_dir: Directory to save the file in
+        :param options: Keyword arguments of :py:func:`download_song`,
+            i.e. ``song_info`` or ``title_only_filename``
+        :return: Future of the result, see :py:func:`wait`
+        """
+        options.setdefault('progress', self.progress)
+        job = self.ytmusic._download_job(video_id, dest_dir, **options)
+        future = self._pool.submit(self._run, job)
+        self._futures.append(future)
+        if self._prefetcher is not None:
+            self._prefetcher.add(job)
+        return future
+
+    def wait(self) -> List[Dict]:
+        """
+        Wait for all queued songs.
+
+        :return: List of results in the order the songs were queued::
+
+            {
+                "videoId": "ZrOKjDZOtkA",
+                "status": "failed",  # or "downloaded", "skipped"
+                "path": "/home/user/Music/Oasis - Wonderwall [ZrOKjDZOtkA].mp4",
+                "stage": "transfer",  # stage of the failure
+                "error": ConnectionError(...),
+                "traceback": "Traceback (most recent call last): ..."
+            }
+        """
+        return [future.result() for future in self._futures]
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait)
+        if self._prefetcher is not None:
+            self._prefetcher.shutdown(wait)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, execType=None, execValue=None, traceback=None):
+        self.shutdown()
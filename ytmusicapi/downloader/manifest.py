@@ -0,0 +1,141 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Optional
+
+MANIFEST_NAME = '.ytmusicapi-downloads.jsonl'
+# i.e. "Artist - Title [ZrOKjDZOtkA].mp4"
+FILENAME_PATTERN = re.compile(r'\[([A-Za-z0-9_-]{11})\]\.\w+$')
+
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+class DownloadManifest:
+    """
+    Record of the songs downloaded into a directory tree, kept in a JSON lines file at its top,
+    so downloads can be skipped without any request when the file is there already.
+
+    Every line is an entry with the ``videoId``, the ``path`` of the file relative to the
+    directory, its ``size``, the ``itag`` of the downloaded format and ``tags``, a hash of the
+    metadata the file was tagged with. Later lines replace earlier ones of the same videoId.
+    """
+    def __init__(self, directory: str, filename: str = MANIFEST_NAME):
+        """
+        :param directory: Top directory of the downloads
+        :param filename: Name of the manifest file in the directory.
+            Default: ``.ytmusicapi-downloads.jsonl``
+        """
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.path = os.path.join(self.directory, filename)
+        self._entries = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory: str) -> 'DownloadManifest':
+        """The manifest of a directory, shared by every caller in this process"""
+        directory = os.path.abspath(os.path.expanduser(directory))
+        with _manifests_lock:
+            if directory not in _manifests:
+                _manifests[directory] = cls(directory)
+            return _manifests[directory]
+
+    def _load(self):
+        self._entries = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._entries[entry['videoId']] = entry
+                        lines += 1
+                    except (ValueError, KeyError, TypeError):
+                        # i.e. a line cut short when the process was killed
+                        pass
+        if lines > 2 * len(self._entries) + 100:
+            self._save()
+
+    def _save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry) + '\n')
+        os.replace(temp_path, self.path)
+
+    def _entries_loaded(self) -> Dict:
+        if self._entries is None:
+            self._load()
+        return self._entries
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        """
+        Get the entry of a videoId, if its file still exists with the recorded size.
+
+        :param video_id: Video id
+        :return: The entry with the absolute ``path`` of the file, or ``None``
+        """
+        with self._lock:
+            entry = self._entries_loaded().get(video_id)
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry['path'])
+        if not os.path.isfile(path) or os.path.getsize(path) != entry['size']:
+            return None
+        return dict(entry, path=path)
+
+    def add(self, video_id: str, path: str, itag: int = None, tags: str = None):
+        """
+        Record a downloaded file, with its current size.
+
+        :param video_id: Video id
+        :param path: Path of the file
+        :param itag: Optional. itag of the downloaded format
+        :param tags: Optional. Hash of the metadata the file was tagged with
+        """
+        entry = {
+            'videoId': video_id,
+            'path': os.path.relpath(os.path.abspath(path), self.directory),
+            'size': os.path.getsize(path),
+            'itag': itag,
+            'tags': tags
+        }
+        with self._lock:
+            self._entries_loaded()[video_id] = entry
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(entry) + '\n')
+
+    def rebuild(self) -> int:
+        """
+        Replace the entries with the files below the directory that have a ``[videoId]`` at the
+        end of their name. The itag and tags of entries whose file did not change are kept.
+
+        :return: Number of entries
+        """
+        with self._lock:
+            old = self._entries_loaded()
+            self._entries = {}
+            for root, dirs, files in os.walk(self.directory):
+                dirs.sort()
+                for name in sorted(files):
+                    match = FILENAME_PATTERN.search(name)
+                    if match is None:
+                        continue
+                    video_id = match.group(1)
+                    path = os.path.join(root, name)
+                    entry = {
+                        'videoId': video_id,
+                        'path': os.path.relpath(path, self.directory),
+                        'size': os.path.getsize(path),
+                        'itag': None,
+                        'tags': None
+                    }
+                    previous = old.get(video_id)
+                    if previous is not None and all(previous[key] == entry[key]
+                                                    for key in ('path', 'size')):
+                        entry = previous
+                    self._entries[video_id] = entry
+            self._save()
+            return len(self._entries)
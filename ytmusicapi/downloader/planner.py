@@ -0,0 +1,119 @@
+import re
+import threading
+from typing import Dict, List, Optional
+
+from ytmusicapi.downloader.formats import expected_bytes
+
+# about the average bitrate of the highest quality audio-only formats, to estimate the size of a
+# track before its formats are known
+ESTIMATED_BITRATE = 130000
+# kinds of releases which come after the albums, so their songs are planned with the albums
+SINGLE_TYPES = ('Single', 'EP')
+
+
+def duration_seconds(track: Dict) -> Optional[int]:
+    """
+    Duration of a track in seconds, from ``duration_seconds``, ``duration``, i.e. ``3:25``, or
+    ``lengthMs``
+    """
+    if track.get('duration_seconds'):
+        return int(track['duration_seconds'])
+    duration = track.get('duration') or ''
+    if not re.fullmatch(r'\d+(:\d+)*', duration):
+        if track.get('lengthMs'):
+            return int(track['lengthMs']) // 1000
+        return None
+    seconds = 0
+    for part in duration.split(':'):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def release_order(release: Dict) -> int:
+    """Sort key of the releases of an artist, the albums first, then the singles and EPs"""
+    return 1 if release.get('type') in SINGLE_TYPES else 0
+
+
+class DiscographyPlan:
+    """
+    The tracks to download from the releases of an artist, each song once. The releases are
+    added as their pages arrive, in the order of :py:func:`release_order`, and a song is planned
+    on the first release it appears on, so a song that was released as a single ahead of its album
+    is downloaded with the album. The other appearances are kept in ``duplicates``.
+
+    Songs are told apart by their ``videoId``. Since the single and the album version of a song
+    often have different videoIds, a song of a single or EP is also the same as a song planned
+    before with the same title, duration and artists. Songs of albums are only compared by their
+    videoId, so the tracks of different albums which share a title, like an "Intro", are all
+    planned.
+
+    The size of each track is estimated from its duration at ``bitrate``, before its formats are
+    resolved, so the plan has the total size of the download as soon as the releases are known.
+    """
+    def __init__(self, artist: Optional[Dict] = None, bitrate: int = ESTIMATED_BITRATE):
+        """
+        :param artist: Optional. The artist, as returned by :py:func:`YTMusic.get_artist`
+        :param bitrate: Bitrate in bits per second to estimate the sizes with. Default: 130000
+        """
+        self.artist = artist
+        self.bitrate = bitrate
+        self.releases = []
+        self.tracks = []
+        self.duplicates = []
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    def _track_keys(self, track: Dict, release: Dict) -> List:
+        keys = [track['videoId']]
+        artists = tuple(artist['name'].casefold()
+                        for artist in track.get('artists') or release.get('artists') or []
+                        if artist.get('name'))
+        if track.get('title') and duration_seconds(track) and artists:
+            keys.append((track['title'].casefold(), duration_seconds(track), artists))
+        return keys
+
+    def add(self, release: Dict) -> List[Dict]:
+        """
+        Plan the tracks of a release.
+
+        :param release: The release, as returned by :py:func:`YTMusic.get_album`
+        :return: The tracks that were not planned before, each a dict with the ``videoId``, the
+            ``track`` of the release, the ``release`` and the ``expectedBytes``, if they can be
+            estimated
+        """
+        planned = []
+        with self._lock:
+            for track in release.get('tracks', []):
+                if not track.get('videoId'):
+                    continue
+                keys = self._track_keys(track, release)
+                compared = keys if release.get('type') in SINGLE_TYPES else keys[:1]
+                first = next((self._keys[key] for key in compared if key in self._keys), None)
+                if first is not None:
+                    self.duplicates.append({'videoId': track['videoId'], 'track': track,
+                                            'release': release, 'plannedAs': first})
+                    continue
+                seconds = duration_seconds(track)
+                entry = {
+                    'videoId': track['videoId'],
+                    'track': track,
+                    'release': release,
+                    'expectedBytes': expected_bytes({'approxDurationMs': seconds * 1000,
+                                                     'bitrate': self.bitrate}) if seconds else None
+                }
+                for key in keys:
+                    self._keys[key] = entry
+                planned.append(entry)
+            self.tracks.extend(planned)
+            self.releases.append(release)
+        return planned
+
+    @property
+    def expected_bytes(self) -> int:
+        """Estimated size of all planned tracks, those with an unknown duration are left out"""
+        return sum(entry['expectedBytes'] or 0 for entry in self.tracks)
+
+    def summary(self) -> Dict:
+        """Numbers of releases, planned and duplicate tracks, and the ``expectedBytes``"""
+        return {'releases': len(self.releases), 'tracks': len(self.tracks),
+                'duplicates': len(self.duplicates), 'expectedBytes': self.expected_bytes}
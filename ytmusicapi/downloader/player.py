@@ -0,0 +1,265 @@
+import json
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from pytube import cipher as pytube_cipher
+
+# patterns of the steps of the transform plan, i.e. ``Xy.Ab(a,3)`` or ``Xy["Ab"](a,3)``
+TRANSFORM_STEP_PATTERNS = [r"\w+\.(\w+)\(\w,(\d+)\)", r"\w+\[(\"\w+\")\]\(\w,(\d+)\)"]
+TRANSFORMS = {
+    'reverse': pytube_cipher.reverse,
+    'splice': pytube_cipher.splice,
+    'swap': pytube_cipher.swap
+}
+# version of the cache file, players cached by an older version are extracted again
+CACHE_FORMAT = 2
+
+
+def get_player_version(js_url: str) -> str:
+    """Version of the player in a ``base.js`` URL, i.e. ``/s/player/<version>/.../base.js``"""
+    match = re.search(r'/s/player/([\w-]+)/', js_url)
+    if match is None:
+        raise Exception("Unable to identify the player version of " + js_url)
+    return match.group(1)
+
+
+def get_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'ytmusicapi')
+
+
+class Player:
+    """
+    Everything needed from one version of the YouTube player's ``base.js`` to decrypt stream URLs,
+    extracted once so that the JavaScript does not have to be fetched and parsed again.
+    """
+    def __init__(self,
+                 version: str,
+                 js_url: str,
+                 signature_timestamp: int,
+                 transform_plan: List[List],
+                 throttling_plan: Optional[List[List[int]]] = None,
+                 throttling_array: Optional[List] = None):
+        """
+        :param version: Player version
+        :param js_url: URL of the ``base.js`` script
+        :param signature_timestamp: ``signatureTimestamp`` to send with ``player`` requests
+        :param transform_plan: Steps to descramble a signature as pairs of the transform,
+            one of ``reverse``, ``splice`` or ``swap``, and its argument
+        :param throttling_plan: Steps to descramble the ``n`` parameter as lists of indices into
+            ``throttling_array``: the function to call and its one or two arguments.
+            ``None`` if the throttling function could not be extracted.
+        :param throttling_array: Elements of the throttling function's array. Functions are
+            given as ``{"function": name}`` of the function in :py:mod:`pytube.cipher`,
+            ``None`` stands for the array itself and ``"b"`` for the ``n`` parameter.
+        """
+        self.version = version
+        self.js_url = js_url
+        self.signature_timestamp = signature_timestamp
+        self.transform_plan = transform_plan
+        self.throttling_plan = throttling_plan
+        self.throttling_array = throttling_array
+
+    @classmethod
+    def from_js(cls, js_url: str, js: str) -> 'Player':
+        """Extract the player from the ``base.js`` script"""
+        match = re.search(r"signatureTimestamp[:=](\d+)", js)
+        if match is None:
+            raise Exception("Unable to identify the signatureTimestamp.")
+        signature_timestamp = int(match.group(1))
+
+        steps = pytube_cipher.get_transform_plan(js)
+        var = re.search(r"^\w+\W", steps[0]).group(0)[:-1]
+        transform_map = pytube_cipher.get_transform_map(js, var)
+        transform_plan = []
+        for step in steps:
+            for pattern in TRANSFORM_STEP_PATTERNS:
+                match = re.search(pattern, step)
+                if match:
+                    name, argument = match.groups()
+                    transform_plan.append([transform_map[name].__name__, int(argument)])
+                    break
+            else:
+                raise Exception("Unable to parse the signature transform " + step)
+
+        try:
+            throttling_plan = [[int(index) for index in step]
+                               for step in pytube_cipher.get_throttling_plan(js)]
+            array = pytube_cipher.get_throttling_function_array(js)
+        except Exception:
+            # the stream URLs still work without it, the downloads are just throttled
+            throttling_plan = throttling_array = None
+        else:
+            throttling_array = []
+            for element in array:
+                if element is array:
+                    throttling_array.append(None)
+                elif callable(element):
+                    throttling_array.append({'function': element.__name__})
+                else:
+                    throttling_array.append(element)
+
+        return cls(get_player_version(js_url), js_url, signature_timestamp, transform_plan,
+                   throttling_plan, throttling_array)
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Player':
+        return cls(data['version'], data['js_url'], data['signature_timestamp'],
+                   data['transform_plan'], data['throttling_plan'], data['throttling_array'])
+
+    def to_dict(self) -> Dict:
+        return {
+            'version': self.version,
+            'js_url': self.js_url,
+            'signature_timestamp': self.signature_timestamp,
+            'transform_plan': self.transform_plan,
+            'throttling_plan': self.throttling_plan,
+            'throttling_array': self.throttling_array
+        }
+
+    def get_signature(self, ciphered_signature: str) -> str:
+        """Descramble the ``s`` parameter of a ``signatureCipher``"""
+        signature = list(ciphered_signature)
+        for transform, argument in self.transform_plan:
+            signature = TRANSFORMS[transform](signature, argument)
+        return ''.join(signature)
+
+    def get_n(self, n: str) -> str:
+        """
+        Descramble the ``n`` parameter of a stream URL, without which the stream is throttled.
+        Returns ``n`` unchanged if the player has no throttling function.
+        """
+        if self.throttling_plan is None:
+            return n
+        # the functions work in place, so every call needs its own array
+        result = list(n)
+        array = []
+        for element in self.throttling_array:
+            if element is None:
+                array.append(array)
+            elif isinstance(element, dict):
+                array.append(getattr(pytube_cipher, element['function']))
+            elif element == 'b':
+                array.append(result)
+            else:
+                array.append(element)
+        for step in self.throttling_plan:
+            function = array[step[0]]
+            if not callable(function):
+                raise Exception("Unable to descramble n, {} is not callable".format(function))
+            function(*[array[index] for index in step[1:]])
+        return ''.join(result)
+
+
+class PlayerCache:
+    """
+    Caches the :class:`Player` of each player version in memory and in a JSON file on disk.
+
+    The current player version is looked up from the ``base.js`` URL at most once per
+    ``max_age`` seconds, and ``base.js`` itself is only downloaded when the version changed.
+    Lookups and downloads happen one at a time, without holding up the callers which find a
+    current player in the cache.
+    """
+    def __init__(self, path: str = os.path.join(get_cache_dir(), 'player.json'),
+                 max_age: float = 3600, max_versions: int = 5):
+        """
+        :param path: File to store the players in. Set to ``None`` to only cache in memory.
+            Default: ``~/.cache/ytmusicapi/player.json``
+        :param max_age: Seconds after which the current player version is looked up again.
+            Default: 3600
+        :param max_versions: Number of player versions to keep. Default: 5
+        """
+        self.path = path
+        self.max_age = max_age
+        self.max_versions = max_versions
+        self._players = None
+        self._current = None
+        self._checked = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _load(self):
+        self._players = {}
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data.get('format') != CACHE_FORMAT:
+                return
+            self._players = {
+                version: Player.from_dict(player)
+                for version, player in data['players'].items()
+            }
+            self._current = data.get('current')
+        except (ValueError, KeyError, TypeError):
+            # unreadable cache file, start over
+            self._players = {}
+
+    def _save(self):
+        if self.path is None:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(
+                {
+                    'format': CACHE_FORMAT,
+                    'current': self._current,
+                    'players':
+                    {version: player.to_dict()
+                     for version, player in self._players.items()}
+                }, f)
+        os.replace(temp_path, self.path)
+
+    def get(self, get_js_url: Callable[[], str], request_func: Callable[[str], str]) -> Player:
+        """
+        Get the current player.
+
+        :param get_js_url: Returns the URL of the current ``base.js``,
+            i.e. :py:func:`YTMusic.get_basejs_url`
+        :param request_func: Returns the text at a URL, used to download ``base.js``
+        :return: :class:`Player` of the current version
+        """
+        player = self._cached()
+        if player is not None:
+            return player
+        with self._refresh_lock:
+            # another caller may have looked it up in the meantime
+            player = self._cached()
+            if player is not None:
+                return player
+            js_url = get_js_url()
+            version = get_player_version(js_url)
+            with self._lock:
+                player = self._players.get(version)
+            if player is None:
+                player = Player.from_js(js_url, request_func(js_url))
+            with self._lock:
+                self._players[version] = player
+                for old in list(self._players)[:-self.max_versions]:
+                    del self._players[old]
+                self._current = version
+                self._checked = time.time()
+                self._save()
+            return player
+
+    def _cached(self) -> Optional[Player]:
+        with self._lock:
+            if self._players is None:
+                self._load()
+            if self._current in self._players and time.time() - self._checked < self.max_age:
+                return self._players[self._current]
+            return None
+
+    def clear(self):
+        """Remove all players from memory and disk"""
+        with self._lock:
+            self._players = {}
+            self._current = None
+            self._checked = 0
+            if self.path is not None and os.path.exists(self.path):
+                os.remove(self.path)
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict
+
+
+class Prefetcher:
+    """
+    Resolves queued downloads ahead of the workers of a :py:class:`DownloadManager`, so the
+    player responses of the next songs are in the :py:class:`StreamCache` by the time the workers
+    get to them, and a song is transferred as soon as the previous one is done.
+
+    Only the next ``ahead`` songs past the ones the workers have started are resolved, so the
+    stream URLs are not fetched so early that they expire before they are used.
+    """
+    def __init__(self, resolve: Callable[[Dict], None], ahead: int = 8, workers: int = 4):
+        """
+        :param resolve: Called with a queued job to resolve it, on one of the prefetch threads.
+            Its exceptions are ignored, the worker resolves the song again and reports them
+        :param ahead: Number of songs to resolve ahead of the started ones. Default: 8
+        :param workers: Number of songs resolved at the same time. Default: 4
+        """
+        self.resolve = resolve
+        self.ahead = max(ahead, 1)
+        self._jobs = []
+        self._next = 0
+        self._started = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max(workers, 1), thread_name_prefix='prefetch')
+
+    def _fill(self):
+        while self._next < len(self._jobs) and self._next < self._started + self.ahead:
+            self._pool.submit(self._prefetch, self._jobs[self._next])
+            # the job is not needed here any more
+            self._jobs[self._next] = None
+            self._next += 1
+
+    def _prefetch(self, job: Dict):
+        try:
+            self.resolve(job)
+        except Exception:
+            pass
+
+    def add(self, job: Dict):
+        """Queue a job, it is resolved once it is among the next ``ahead`` songs"""
+        with self._lock:
+            self._jobs.append(job)
+            self._fill()
+
+    def started(self):
+        """Move the window on after a worker started the next song"""
+        with self._lock:
+            self._started += 1
+            self._fill()
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait)
@@ -0,0 +1,137 @@
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from ytmusicapi.downloader.tagging import iter_boxes
+
+# boxes on the way from moov to the sample description of a track
+CONTAINERS = (b'moov', b'trak', b'mdia', b'minf', b'stbl')
+
+
+def find_box(data: bytes, path: Tuple[bytes, ...], start: int = 0,
+             end: int = None) -> Optional[Tuple[int, int]]:
+    """
+    Offset and size of the first box at ``path`` of box types, i.e. ``(b'moov', b'mvhd')``, or
+    ``None`` if there is none
+    """
+    for kind, offset, size in iter_boxes(data, start, end):
+        if kind != path[0]:
+            continue
+        size = len(data) - offset if size is None else size
+        if len(path) == 1:
+            return offset, size
+        header = 16 if struct.unpack('>I', data[offset:offset + 4])[0] == 1 else 8
+        return find_box(data, path[1:], offset + header, offset + size)
+    return None
+
+
+def _header_duration(data: bytes, offset: int) -> Tuple[int, int]:
+    # timescale and duration of an mvhd or mdhd box
+    if data[offset + 8] == 1:
+        return struct.unpack('>IQ', data[offset + 28:offset + 40])
+    return struct.unpack('>II', data[offset + 20:offset + 28])
+
+
+def _descriptors(data: bytes, position: int, end: int):
+    # the descriptors of an esds box as tuples of their tag and the offset and end of the payload
+    while position + 2 <= end:
+        tag = data[position]
+        length = 0
+        position += 1
+        for _ in range(4):
+            byte = data[position]
+            position += 1
+            length = length << 7 | byte & 0x7f
+            if not byte & 0x80:
+                break
+        yield tag, position, min(position + length, end)
+        position += length
+
+
+def parse_init(data: bytes) -> Dict:
+    """
+    Properties of an MP4 stream from its init segment, the ``ftyp`` and ``moov`` boxes of its
+    ``initRange``.
+
+    :return: Dictionary with the ``timescale`` and ``duration`` of the first track, in its
+        timescale units, the ``codec`` type of its sample description, i.e. ``mp4a``, and for
+        audio the ``sampleRate`` and ``channels``, and the ``maxBitrate`` and ``avgBitrate``
+        declared by the decoder configuration, if there is one
+    """
+    if find_box(data, (b'moov',)) is None:
+        raise Exception('Not an MP4 init segment, no moov box found')
+    info = {'timescale': None, 'duration': None, 'codec': None, 'sampleRate': None,
+            'channels': None, 'maxBitrate': None, 'avgBitrate': None}
+    header = find_box(data, (b'moov', b'trak', b'mdia', b'mdhd')) or find_box(
+        data, (b'moov', b'mvhd'))
+    if header is not None:
+        info['timescale'], info['duration'] = _header_duration(data, header[0])
+    stsd = find_box(data, CONTAINERS + (b'stsd',))
+    if stsd is None:
+        return info
+    # the first sample entry follows the full box header and the entry count
+    entry = stsd[0] + 16
+    entry_size, kind = struct.unpack('>I4s', data[entry:entry + 8])
+    info['codec'] = kind.decode('latin-1')
+    if kind in (b'mp4a', b'Opus', b'fLaC', b'ac-3', b'ec-3'):
+        info['channels'] = struct.unpack('>H', data[entry + 24:entry + 26])[0]
+        info['sampleRate'] = struct.unpack('>I', data[entry + 32:entry + 36])[0] >> 16
+        esds = find_box(data, (b'esds',), entry + 36, entry + entry_size)
+        if esds is not None:
+            for tag, start, end in _descriptors(data, esds[0] + 12, esds[0] + esds[1]):
+                if tag != 3:
+                    continue
+                flags = data[start + 2]
+                position = start + 3 + (2 if flags & 0x80 else 0) + (2 if flags & 0x20 else 0)
+                if flags & 0x40:
+                    position += 1 + data[position]
+                for inner, inner_start, _ in _descriptors(data, position, end):
+                    if inner == 4:
+                        info['maxBitrate'], info['avgBitrate'] = struct.unpack(
+                            '>II', data[inner_start + 5:inner_start + 13])
+    return info
+
+
+def parse_sidx(data: bytes, offset: int = 0) -> Dict:
+    """
+    The segment index of a stream, its ``sidx`` box.
+
+    :param data: Bytes of the stream starting with the box, i.e. its ``indexRange``
+    :param offset: Offset of the box in the stream. Default: 0
+    :return: Dictionary with the ``timescale`` and the ``segments``, each a dict with the byte
+        offsets ``start`` and ``end``, exclusive, in the stream and the ``time`` and ``duration``
+        in seconds
+    """
+    kind, version = data[4:8], data[8]
+    if kind != b'sidx':
+        raise Exception('Not a segment index, found {!r} instead of a sidx box'.format(kind))
+    timescale = struct.unpack('>I', data[16:20])[0]
+    if version == 0:
+        earliest, first_offset = struct.unpack('>II', data[20:28])
+        position = 28
+    else:
+        earliest, first_offset = struct.unpack('>QQ', data[20:36])
+        position = 36
+    count = struct.unpack('>H', data[position + 2:position + 4])[0]
+    position += 4
+    start = offset + struct.unpack('>I', data[:4])[0] + first_offset
+    time = earliest
+    segments = []
+    for _ in range(count):
+        reference, duration = struct.unpack('>II', data[position:position + 8])
+        size = reference & 0x7fffffff
+        segments.append({'start': start, 'end': start + size, 'time': time / timescale,
+                         'duration': duration / timescale})
+        start += size
+        time += duration
+        position += 12
+    return {'timescale': timescale, 'segments': segments}
+
+
+def segments_until(segments: List[Dict], seconds: float) -> List[Dict]:
+    """The first segments, as many as are needed to play ``seconds``"""
+    needed = []
+    for segment in segments:
+        if needed and segment['time'] >= seconds:
+            break
+        needed.append(segment)
+    return needed
@@ -0,0 +1,210 @@
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+PHASES = ('resolve', 'transfer', 'tag')
+# instantaneous rates are averaged over about this many seconds
+RATE_WINDOW = 1.0
+
+
+class ProgressEvent:
+    """
+    Progress of one download, passed to the ``progress`` callback of
+    :py:func:`YTMusic.download_song` and :py:class:`DownloadManager`.
+
+    :ivar video_id: Video id of the song
+    :ivar phase: ``resolve``, ``transfer`` or ``tag``
+    :ivar status: ``None`` while the download runs. In the last event of a download one of
+        ``downloaded``, ``skipped`` or ``failed``
+    :ivar bytes_done: Bytes of the stream transferred so far, including those of a resumed
+        ``.part`` file
+    :ivar bytes_total: Size of the stream, ``None`` if unknown
+    :ivar rate: Bytes per second over the last second of the transfer
+    :ivar average_rate: Bytes per second since the transfer started
+    :ivar path: Path of the file once it is known
+    :ivar error: Exception of a failed download
+    """
+    __slots__ = ('video_id', 'phase', 'status', 'bytes_done', 'bytes_total', 'rate',
+                 'average_rate', 'path', 'error', 'time')
+
+    def __init__(self, video_id: str, phase: str, status: str = None, bytes_done: int = 0,
+                 bytes_total: int = None, rate: float = 0.0, average_rate: float = 0.0,
+                 path: str = None, error: Exception = None):
+        self.video_id = video_id
+        self.phase = phase
+        self.status = status
+        self.bytes_done = bytes_done
+        self.bytes_total = bytes_total
+        self.rate = rate
+        self.average_rate = average_rate
+        self.path = path
+        self.error = error
+        self.time = time.time()
+
+    def to_dict(self) -> Dict:
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self):
+        return 'ProgressEvent({})'.format(', '.join(
+            '{}={!r}'.format(key, getattr(self, key)) for key in self.__slots__[:7]))
+
+
+class TransferMeter:
+    """
+    Measures the throughput of one transfer and reports it as ``transfer`` events, at most
+    every ``interval`` seconds unless forced. The rates count from the first update, so the
+    bytes of a resumed transfer that were there already do not add to them.
+    """
+    def __init__(self, video_id: str, callback: Callable[[ProgressEvent], None],
+                 bytes_total: int = None, path: str = None, interval: float = 0.1):
+        """
+        :param video_id: Video id of the song
+        :param callback: Called with each :py:class:`ProgressEvent`
+        :param bytes_total: Optional. Size of the stream
+        :param path: Optional. Path of the file
+        :param interval: Minimum seconds between two events. Default: 0.1
+        """
+        self.video_id = video_id
+        self.callback = callback
+        self.bytes_total = bytes_total
+        self.path = path
+        self.interval = interval
+        self.started = None
+        self.bytes_start = 0
+        self.bytes_done = 0
+        self._window = []
+        self._reported = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def average_rate(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.bytes_done - self.bytes_start) / max(time.perf_counter() - self.started, 1e-3)
+
+    def update(self, bytes_done: int, force: bool = False):
+        """Set the bytes transferred so far, called from any thread"""
+        now = time.perf_counter()
+        with self._lock:
+            if self.started is None:
+                self.started = now
+                self.bytes_start = bytes_done
+            self.bytes_done = bytes_done
+            self._window.append((now, bytes_done))
+            while len(self._window) > 2 and now - self._window[1][0] >= RATE_WINDOW:
+                self._window.pop(0)
+            if not force and now - self._reported < self.interval:
+                return
+            self._reported = now
+            first_time, first_bytes = self._window[0]
+            rate = (bytes_done - first_bytes) / max(now - first_time, 1e-3)
+            event = ProgressEvent(self.video_id, 'transfer', None, bytes_done, self.bytes_total,
+                                  rate, self.average_rate, self.path)
+        self.callback(event)
+
+
+class ProgressAggregator:
+    """
+    Combines the events of concurrent downloads, i.e. those of a :py:class:`DownloadManager`,
+    into totals. Pass it as the ``progress`` callback.
+
+    :ivar downloads: Last event of every download by video id
+    """
+    def __init__(self, callback: Optional[Callable[['ProgressAggregator', ProgressEvent],
+                                                   None]] = None):
+        """
+        :param callback: Optional. Called with the aggregator and the event after every event
+        """
+        self.callback = callback
+        self.downloads = {}
+        self.started = None
+        self._lock = threading.Lock()
+
+    def __call__(self, event: ProgressEvent):
+        with self._lock:
+            if self.started is None:
+                self.started = event.time
+            previous = self.downloads.get(event.video_id)
+            if previous is not None and event.phase != 'transfer':
+                # keep the bytes of the transfer in the events of the other phases
+                event.bytes_done = max(event.bytes_done, previous.bytes_done)
+                event.bytes_total = event.bytes_total or previous.bytes_total
+                event.average_rate = event.average_rate or previous.average_rate
+            self.downloads[event.video_id] = event
+        if self.callback is not None:
+            self.callback(self, event)
+
+    def snapshot(self) -> Dict:
+        """
+        Totals of all downloads so far.
+
+        :return: Dictionary with the ``bytes_done`` and known ``bytes_total`` of all transfers,
+            the current ``rate`` of the running transfers combined, the ``average_rate`` since the
+            first event, the number of downloads in each phase that are still running, under
+            ``phases``, and the number of finished downloads by status, under ``statuses``
+        """
+        with self._lock:
+            events = list(self.downloads.values())
+            started = self.started
+        bytes_done = sum(event.bytes_done for event in events)
+        running = [event for event in events if event.status is None]
+        elapsed = time.time() - started if started is not None else 0
+        return {
+            'downloads': len(events),
+            'bytes_done': bytes_done,
+            'bytes_total': sum(event.bytes_total or 0 for event in events),
+            'rate': sum(event.rate for event in running if event.phase == 'transfer'),
+            'average_rate': bytes_done / elapsed if elapsed > 0 else 0.0,
+            'phases': {phase: len([e for e in running if e.phase == phase]) for phase in PHASES},
+            'statuses': {
+                status: len([event for event in events if event.status == status])
+                for status in ('downloaded', 'skipped', 'failed')
+            }
+        }
+
+
+def print_progress(event: ProgressEvent):
+    """Progress callback printing a line for each download to the terminal"""
+    if event.status is not None:
+        message = '{} {}{}'.format(event.status.capitalize(), event.video_id,
+                                   ': ' + str(event.error) if event.error else '')
+        end = '\n'
+    elif event.phase == 'transfer':
+        message = 'Downloading {}: {} kbytes{} at {:.0f} kB/s'.format(
+            event.video_id, event.bytes_done // 1024,
+            ' of ' + str(event.bytes_total // 1024) if event.bytes_total else '',
+            event.rate / 1024)
+        end = '\r'
+    else:
+        message = '{} {}...'.format(event.phase.capitalize(), event.video_id)
+        end = '\r'
+    sys.stdout.write('\x1b[K' + message + end)
+    sys.stdout.flush()
+
+
+def print_totals(aggregator: ProgressAggregator, event: ProgressEvent):
+    """Callback of a :py:class:`ProgressAggregator` printing the totals to the terminal"""
+    if event.status == 'failed':
+        sys.stdout.write('\x1b[KFailed {}: {}\n'.format(event.video_id, event.error))
+    totals = aggregator.snapshot()
+    sys.stdout.write(
+        '\x1b[K{} downloaded, {} skipped, {} failed, {} running: {:.1f} MB at {:.0f} kB/s\r'.format(
+            totals['statuses']['downloaded'], totals['statuses']['skipped'],
+            totals['statuses']['failed'], sum(totals['phases'].values()),
+            totals['bytes_done'] / 1e6, totals['rate'] / 1024))
+    sys.stdout.flush()
+
+
+def async_queue_callback(queue, loop) -> Callable[[ProgressEvent], None]:
+    """
+    Progress callback putting the events into an ``asyncio.Queue``, safe to call from the
+    download threads.
+
+    :param queue: The queue
+    :param loop: Event loop of the queue
+    """
+    def callback(event):
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    return callback
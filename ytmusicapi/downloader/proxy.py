@@ -0,0 +1,315 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterator, Optional, Tuple
+from urllib.parse import urlsplit
+
+from ytmusicapi.downloader.player import get_cache_dir
+
+AUDIO_PATH = re.compile(r'/audio/([A-Za-z0-9_-]{11})')
+RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)')
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The byte range requested by a ``Range`` header.
+
+    :param header: Value of the header, if there is one
+    :param size: Size of the content
+    :return: Tuple of the first byte and the end, exclusive. ``None`` if the header is missing
+        or asks for several ranges, in which case the whole content is sent
+    :raises ValueError: If the range is not satisfiable
+    """
+    match = RANGE_PATTERN.fullmatch(header.strip()) if header else None
+    if match is None or match.group(0) == 'bytes=-':
+        return None
+    first, last = match.groups()
+    if not first:
+        # the last bytes of the content
+        start, end = max(size - int(last), 0), size
+    else:
+        start, end = int(first), min(int(last) + 1, size) if last else size
+    if start >= end:
+        raise ValueError('Range not satisfiable: ' + header)
+    return start, end
+
+
+class SegmentCache:
+    """
+    Byte-bounded cache on disk of the segments of streams, each ``segment_size`` bytes at a
+    multiple of it, stored in ``<directory>/<videoId>/<itag>-<index>``. The least recently used
+    segments are removed when the cache grows beyond ``max_bytes``. The order survives restarts,
+    as the modification time of a segment is updated when it is used.
+
+    Concurrent requests for the same segment wait for the first one instead of fetching it again.
+    The segments are read and written outside of the lock, which only guards the index.
+    """
+    def __init__(self, directory: str = os.path.join(get_cache_dir(), 'audio'),
+                 max_bytes: int = 2 * 1024**3, segment_size: int = 1024 * 1024):
+        """
+        :param directory: Directory to store the segments in.
+            Default: ``~/.cache/ytmusicapi/audio``
+        :param max_bytes: Maximum size of all segments together. Default: 2 GiB
+        :param segment_size: Size of the segments. Default: 1 MiB
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_size = segment_size
+        self.size = 0
+        self._segments = None
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._segments = OrderedDict()
+        self.size = 0
+        found = []
+        if os.path.isdir(self.directory):
+            for video_id in os.listdir(self.directory):
+                folder = os.path.join(self.directory, video_id)
+                if not os.path.isdir(folder):
+                    continue
+                for name in os.listdir(folder):
+                    if name.endswith('.tmp'):
+                        continue
+                    stat = os.stat(os.path.join(folder, name))
+                    found.append((stat.st_mtime, video_id + '/' + name, stat.st_size))
+        for _, key, size in sorted(found):
+            self._segments[key] = size
+            self.size += size
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, *key.split('/'))
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._segments:
+            key, size = self._segments.popitem(last=False)
+            self.size -= size
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def _read(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # evicted since it was looked up, or removed from outside
+            with self._lock:
+                if key in self._segments and not os.path.exists(path):
+                    self.size -= self._segments.pop(key)
+            return None
+        return data
+
+    def _store(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._segments[key] = len(data)
+            self.size += len(data)
+            self._evict()
+
+    def get(self, video_id: str, itag: int, index: int,
+            fetch: Callable[[int, int], bytes]) -> bytes:
+        """
+        Get a segment of a stream.
+
+        :param video_id: Video id
+        :param itag: itag of the format of the stream
+        :param index: Number of the segment, which starts at ``index * segment_size``
+        :param fetch: Called with the first byte and the end, exclusive, of the segment to fetch
+            it if it is not cached
+        :return: Content of the segment
+        """
+        key = '{}/{}-{}'.format(video_id, itag, index)
+        with self._lock:
+            if self._segments is None:
+                self._load()
+            cached = key in self._segments
+            if cached:
+                self._segments.move_to_end(key)
+            else:
+                pending = self._pending.get(key)
+                if pending is None:
+                    self._pending[key] = threading.Event()
+        if cached:
+            data = self._read(key)
+            if data is not None:
+                return data
+            return self.get(video_id, itag, index, fetch)
+        if pending is not None:
+            pending.wait()
+            return self.get(video_id, itag, index, fetch)
+        try:
+            start = index * self.segment_size
+            data = fetch(start, start + self.segment_size)
+            self._store(key, data)
+            return data
+        finally:
+            with self._lock:
+                self._pending.pop(key).set()
+
+    def read(self, video_id: str, itag: int, start: int, end: int,
+             fetch: Callable[[int, int], bytes]) -> Iterator[bytes]:
+        """
+        The bytes of a stream from ``start`` up to ``end``, exclusive, segment by segment.
+        ``end`` must not be beyond the end of the stream.
+        """
+        position = start
+        while position < end:
+            index = position // self.segment_size
+            data = self.get(video_id, itag, index, fetch)
+            offset = position - index * self.segment_size
+            part = data[offset:end - index * self.segment_size]
+            if not part:
+                raise RuntimeError('Segment {} of videoId {} is short'.format(index, video_id))
+            position += len(part)
+            yield part
+
+    def clear(self):
+        """Remove all segments"""
+        with self._lock:
+            for key in list(self._segments or []):
+                try:
+                    os.remove(self._path(key))
+                except FileNotFoundError:
+                    pass
+            self._segments = OrderedDict()
+            self.size = 0
+
+
+class AudioProxyHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ytmusicapi-proxy/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        self._serve(True)
+
+    def do_HEAD(self):
+        self._serve(False)
+
+    def _error(self, status, message, headers=None):
+        data = (message + '\n').encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(data)
+
+    def _serve(self, body):
+        match = AUDIO_PATH.fullmatch(urlsplit(self.path).path)
+        if match is None:
+            return self._error(404, 'Not found: ' + self.path)
+        video_id = match.group(1)
+        try:
+            fmt = self.server.ytmusic.get_stream_format(video_id, self.server.format_selector)
+            size = int(fmt['contentLength'])
+        except Exception as e:
+            return self._error(502, 'Could not resolve videoId {}: {}'.format(video_id, e))
+        try:
+            requested = parse_range(self.headers.get('Range'), size)
+        except ValueError as e:
+            return self._error(416, str(e), {'Content-Range': 'bytes */{}'.format(size)})
+        start, end = requested or (0, size)
+
+        self.send_response(206 if requested else 200)
+        self.send_header('Content-Type', fmt['mimeType'].split(';')[0])
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        if requested:
+            self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, end - 1, size))
+        self.end_headers()
+        if not body:
+            return
+        try:
+            for part in self.server.read(video_id, fmt['itag'], start, end):
+                self.wfile.write(part)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except Exception as e:
+            # the headers are sent, all that can be done is to end the response early
+            self.log_error('Stream of videoId %s failed: %s', video_id, e)
+            self.close_connection = True
+
+
+class AudioProxy(ThreadingHTTPServer):
+    """
+    Local HTTP server for the audio of songs, at ``/audio/<videoId>``, with support for
+    ``Range`` requests, so players can seek in it. The stream chosen by
+    :py:func:`YTMusic.get_stream_format` is fetched in segments through a :py:class:`SegmentCache`,
+    so songs which are played again are served from disk, and concurrent requests for the same
+    part of a song fetch it once. The decrypted stream URLs are kept in the
+    :py:class:`StreamCache` of the :class:`ytmusicapi.YTMusic` instance::
+
+        with AudioProxy(YTMusic(), port=8080) as proxy:
+            ...  # play http://127.0.0.1:8080/audio/ZrOKjDZOtkA
+
+    Or from the command line: ``python -m ytmusicapi.downloader serve --port 8080``
+    """
+    daemon_threads = True
+
+    def __init__(self, ytmusic, cache: SegmentCache = None, host: str = '127.0.0.1',
+                 port: int = 8080, verbose: bool = False, format_selector=None):
+        """
+        :param ytmusic: :class:`ytmusicapi.YTMusic` instance to resolve the songs with
+        :param cache: Optional. Cache of the segments. Default: A :py:class:`SegmentCache` in
+            ``~/.cache/ytmusicapi/audio`` of up to 2 GiB
+        :param host: Address to listen on. Default: ``127.0.0.1``
+        :param port: Port to listen on, 0 for any free port. Default: 8080
+        :param verbose: Log every request. Default: False
+        :param format_selector: Optional. :py:class:`FormatSelector` of the format to serve
+        """
+        super().__init__((host, port), AudioProxyHandler)
+        self.ytmusic = ytmusic
+        self.cache = cache if cache is not None else SegmentCache()
+        self.verbose = verbose
+        self.format_selector = format_selector
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return 'http://{}:{}'.format(*self.server_address[:2])
+
+    def read(self, video_id: str, itag: int, start: int, end: int) -> Iterator[bytes]:
+        """The bytes of the stream of a song from ``start`` up to ``end``, exclusive"""
+        def fetch(first, last):
+            return b''.join(self.ytmusic.stream_song(video_id, start=first, end=last,
+                                                     format_selector=self.format_selector))
+
+        # keep the stream URL valid while the response is sent
+        with self.ytmusic.stream_cache.use(video_id):
+            yield from self.cache.read(video_id, itag, start, end, fetch)
+
+    def start(self) -> 'AudioProxy':
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, execType=None, execValue=None, traceback=None):
+        self.stop()
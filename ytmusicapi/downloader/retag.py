@@ -0,0 +1,108 @@
+import os
+import threading
+import traceback
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Union
+
+from ytmusicapi.downloader.tagging import keep_padding
+
+
+def _comparable(value):
+    # covers are bytes with an image format, which equality of bytes ignores
+    return [(getattr(item, 'imageformat', None), item) for item in value]
+
+
+def tag_changes(current: Dict, tags: Dict) -> Dict:
+    """
+    The tags which differ from the current ones.
+
+    :param current: Current tags of a file, i.e. ``MP4(path).tags``
+    :param tags: Desired tags by their MP4 atom name
+    :return: The desired tags whose value is not the current one
+    """
+    current = current or {}
+    return {
+        key: value
+        for key, value in tags.items()
+        if key not in current or _comparable(current[key]) != _comparable(value)
+    }
+
+
+def retag_file(path: str, tags: Dict) -> str:
+    """
+    Write tags to an MP4 file, if they differ from the current ones. The file is updated in
+    place if the tags fit in its padding, else it is rewritten with new padding.
+
+    :param path: Path of the file
+    :param tags: Desired tags by their MP4 atom name
+    :return: ``unchanged``, ``updated`` if the tags were written in place, or ``rewritten``
+    """
+    from mutagen.mp4 import MP4
+    video = MP4(path)
+    changes = tag_changes(video.tags, tags)
+    if not changes:
+        return 'unchanged'
+    size = os.path.getsize(path)
+    for key, value in changes.items():
+        video[key] = value
+    video.save(padding=keep_padding)
+    return 'updated' if os.path.getsize(path) == size else 'rewritten'
+
+
+class Retagger:
+    """
+    Updates the tags of many files on a thread pool, skipping the files whose tags are current
+    already. Tags are updated in place where they fit the padding of the file.
+    """
+    def __init__(self, workers: int = 8):
+        """
+        :param workers: Number of files tagged at the same time. Default: 8
+        """
+        self._executor = ThreadPoolExecutor(max(workers, 1))
+        self._futures = []
+        self._lock = threading.Lock()
+
+    def _run(self, path, tags):
+        result = {'path': path, 'status': None, 'error': None, 'traceback': None}
+        try:
+            result['status'] = retag_file(path, tags() if callable(tags) else tags)
+        except Exception as e:
+            result['status'] = 'failed'
+            result['error'] = e
+            result['traceback'] = traceback.format_exc()
+        return result
+
+    def submit(self, path: str, tags: Union[Dict, Callable[[], Dict]]) -> Future:
+        """
+        Queue a file for tagging.
+
+        :param path: Path of the file
+        :param tags: Desired tags by their MP4 atom name, or a function returning them, which is
+            called on the thread pool, i.e. to fetch the cover art there
+        :return: Future of the result, see :py:func:`wait`
+        """
+        future = self._executor.submit(self._run, path, tags)
+        with self._lock:
+            self._futures.append(future)
+        return future
+
+    def wait(self) -> List[Dict]:
+        """
+        Wait for all queued files.
+
+        :return: List of results in the order the files were submitted, each a dict with the
+            ``path``, the ``status``, one of ``unchanged``, ``updated``, ``rewritten`` or
+            ``failed``, and the ``error`` and ``traceback`` of a failed file
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, execType=None, execValue=None, traceback=None):
+        self.shutdown()
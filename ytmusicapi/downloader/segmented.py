@@ -0,0 +1,261 @@
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ytmusicapi.downloader.transfer import AdaptiveChunkSize, iter_chunks
+
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError)
+
+
+class Segment:
+    """Byte range ``[written, end)`` of the stream still to be fetched by one connection"""
+    __slots__ = ('start', 'written', 'position', 'end', 'started')
+
+    def __init__(self, start: int, end: int):
+        self.start = start
+        self.written = start
+        # bytes up to position are claimed by the worker, but possibly not written yet
+        self.position = start
+        self.end = end
+        self.started = None
+
+    @property
+    def remaining(self):
+        return self.end - self.position
+
+    @property
+    def rate(self):
+        if self.started is None:
+            return 0.0
+        return (self.written - self.start) / max(time.perf_counter() - self.started, 1e-3)
+
+
+class SegmentedDownload:
+    """
+    Fetches a stream over several connections at once, each requesting a byte range with a
+    ``Range`` header and writing it at its offset into a preallocated file.
+
+    The file is split into ``segments`` equal ranges. When a connection finishes its range, it
+    takes over the second half of the range which would take longest to finish at its current
+    rate, so slow connections do not hold up the download.
+
+    The ranges still missing are stored next to the file in ``<path>.ranges`` while the
+    download runs, so an interrupted download is resumed with the missing ranges only.
+    """
+    def __init__(self,
+                 url: Union[str, Callable[[], str]],
+                 path: str,
+                 size: int,
+                 segments: int = 4,
+                 session: requests.Session = None,
+                 headers: Dict = None,
+                 proxies: Dict = None,
+                 chunk_size: Optional[int] = 256 * 1024,
+                 min_split: int = 512 * 1024,
+                 retries: int = 3,
+                 callback: Callable[[int, int], None] = None,
+                 fsync: Union[str, int, None] = None,
+                 limit: threading.Semaphore = None):
+        """
+        :param url: Stream URL, or a function returning it which is called for every request,
+            i.e. to use the URLs kept valid by a :py:class:`StreamCache`
+        :param path: File to write, usually the ``.part`` file of the download
+        :param size: Size of the stream in bytes, i.e. the ``contentLength`` of the format
+        :param segments: Number of concurrent connections. Default: 4
+        :param session: Optional. Session to send the requests with. Default: A new session with
+            a connection pool of ``segments`` connections
+        :param headers: Optional. Headers for every request
+        :param proxies: Optional. Proxies for every request
+        :param chunk_size: Size of the chunks read from each connection, ``None`` to adapt it to
+            the throughput of each connection, up to ``min_split``. Default: 256 KiB
+        :param min_split: Ranges smaller than twice this are not split. Default: 512 KiB
+        :param retries: Number of times a range is requested again after a network error,
+            continuing from where it stopped. Default: 3
+        :param callback: Optional. Called with the number of bytes written and ``size`` after
+            every chunk, from the connection threads
+        :param fsync: Optional. Unless ``None``, the file is synced to disk once all ranges are
+            written, see :py:class:`ytmusicapi.downloader.transfer.PreallocatedWriter`
+        :param limit: Optional. Semaphore held by each connection while it requests a range,
+            i.e. the per host limit of a :py:class:`DownloadManager`, so the connections of all
+            downloads to a host stay within it
+        """
+        self.url = url
+        self.path = path
+        self.ranges_path = path + '.ranges'
+        self.size = size
+        self.segments = max(segments, 1)
+        self.headers = headers or {}
+        self.proxies = proxies
+        self.chunk_size = chunk_size
+        self.min_split = min_split
+        self.retries = retries
+        self.callback = callback
+        self.fsync = fsync
+        self.limit = limit
+
+        self._own_session = session is None or not isinstance(session, requests.Session)
+        if self._own_session:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_maxsize=self.segments)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._error = None
+        self._pending = []
+        self._active = []
+
+    def remaining(self) -> List[List[int]]:
+        """Byte ranges ``[start, end)`` not written yet"""
+        with self._lock:
+            return [[segment.written, segment.end] for segment in self._pending + self._active
+                    if segment.written < segment.end]
+
+    @property
+    def written(self) -> int:
+        return self.size - sum(end - start for start, end in self.remaining())
+
+    def _prepare(self):
+        if os.path.exists(self.ranges_path) and os.path.exists(self.path):
+            with open(self.ranges_path) as f:
+                self._pending = [Segment(start, end) for start, end in json.load(f)]
+            if os.path.getsize(self.path) == self.size:
+                return
+        step = -(-self.size // self.segments)
+        self._pending = [
+            Segment(start, min(start + step, self.size)) for start in range(0, self.size, step)
+        ]
+        self._save()
+        with open(self.path, 'wb') as f:
+            f.truncate(self.size)
+            try:
+                os.posix_fallocate(f.fileno(), 0, self.size)
+            except (AttributeError, OSError):
+                # not available on this platform or file system, the file stays sparse
+                pass
+
+    def _save(self):
+        temp_path = self.ranges_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.remaining(), f)
+        os.replace(temp_path, self.ranges_path)
+
+    def _next_segment(self):
+        with self._lock:
+            if self._pending:
+                segment = self._pending.pop(0)
+                self._active.append(segment)
+                return segment
+            # split the range that would take longest to finish
+            candidates = [
+                segment for segment in self._active if segment.remaining >= 2 * self.min_split
+            ]
+            if not candidates:
+                return None
+            slowest = max(candidates,
+                          key=lambda segment: segment.remaining / max(segment.rate, 1.0))
+            middle = slowest.position + slowest.remaining // 2
+            segment = Segment(middle, slowest.end)
+            slowest.end = middle
+            self._active.append(segment)
+        self._save()
+        return segment
+
+    def _worker(self):
+        try:
+            while not self._stop.is_set():
+                segment = self._next_segment()
+                if segment is None:
+                    return
+                self._fetch(segment)
+        except Exception as e:
+            with self._lock:
+                self._error = self._error or e
+            self._stop.set()
+
+    def _fetch(self, segment):
+        attempt = 0
+        segment.started = time.perf_counter()
+        while segment.written < segment.end and not self._stop.is_set():
+            headers = dict(self.headers)
+            headers['Range'] = 'bytes={}-{}'.format(segment.written, segment.end - 1)
+            try:
+                if self.limit is None:
+                    self._request(segment, headers)
+                else:
+                    with self.limit:
+                        self._request(segment, headers)
+            except RETRY_ERRORS:
+                attempt += 1
+                if attempt > self.retries:
+                    raise
+                with self._lock:
+                    segment.position = segment.written
+
+    def _request(self, segment, headers):
+        url = self.url() if callable(self.url) else self.url
+        with self.session.get(url, stream=True, headers=headers,
+                              proxies=self.proxies) as response:
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise RuntimeError('The server does not support range requests')
+            self._write(segment, response)
+
+    def _write(self, segment, response):
+        with open(self.path, 'r+b') as f:
+            f.seek(segment.written)
+            chunk_size = self.chunk_size
+            if chunk_size is None:
+                chunk_size = AdaptiveChunkSize(maximum=self.min_split)
+            for chunk in iter_chunks(response, chunk_size):
+                if self._stop.is_set():
+                    return
+                with self._lock:
+                    # the end moves closer when another connection takes over part of the range
+                    length = min(len(chunk), segment.end - segment.position)
+                    segment.position += length
+                f.write(chunk[:length])
+                with self._lock:
+                    segment.written += length
+                if self.callback is not None:
+                    self.callback(self.written, self.size)
+                if segment.position >= segment.end:
+                    return
+
+    def run(self):
+        """
+        Download all missing ranges. Raises the first error of any connection after stopping
+        the others. The ``.ranges`` file is removed once the download is complete.
+        """
+        self._prepare()
+        threads = [threading.Thread(target=self._worker) for _ in range(self.segments)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            self._stop.set()
+            for thread in threads:
+                if thread.is_alive():
+                    thread.join()
+            self._save()
+            if self._own_session:
+                self.session.close()
+        if self._error is not None:
+            raise self._error
+        if self.remaining():
+            raise RuntimeError('Ranges missing after the download: ' + str(self.remaining()))
+        if self.fsync is not None:
+            # before the record of the missing ranges is gone
+            with open(self.path, 'r+b') as f:
+                os.fsync(f.fileno())
+        os.remove(self.ranges_path)
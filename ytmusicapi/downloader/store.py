@@ -0,0 +1,133 @@
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # not on Windows, where files are copied instead of cloned
+    fcntl = None
+
+from ytmusicapi.downloader.player import get_cache_dir
+
+# ioctl(2) request of Linux to clone a file into another one, copy-on-write, on btrfs and xfs
+FICLONE = 0x40049409
+LINK_METHODS = {
+    'auto': ('reflink', 'hardlink', 'copy'),
+    'reflink': ('reflink', 'copy'),
+    'hardlink': ('hardlink', 'copy'),
+    'copy': ('copy', ),
+}
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def reflink(source: str, dest: str):
+    """
+    Clone ``source`` to ``dest``, so they share their blocks until either of them is changed
+
+    :raises OSError: If the file system can not clone files
+    """
+    if fcntl is None:
+        raise OSError('Cloning files is not supported on this platform')
+    with open(source, 'rb') as fsource, open(dest, 'wb') as fdest:
+        fcntl.ioctl(fdest.fileno(), FICLONE, fsource.fileno())
+
+
+class DownloadStore:
+    """
+    Pool of downloaded streams, each ``videoId`` and ``itag`` transferred once and stored in
+    ``<directory>/<first two letters of the videoId>/<videoId>-<itag>.<extension>``. The files of
+    the songs in the download directories are links to it, so a song in many playlists and albums
+    costs the bandwidth and the disk space of one copy.
+
+    A reflink is a copy-on-write clone of the file, which gets tags of its own without copying
+    the stream, as they are written into the room reserved in the header. Reflinks need a file
+    system that supports them, i.e. btrfs or xfs. A hard link is the same file under another
+    name, so all its names share the tags it was written with by the first download. The store
+    must be on the same file system as the download directories for either.
+    """
+    def __init__(self, directory: str = os.path.join(get_cache_dir(), 'store'),
+                 link: str = 'auto'):
+        """
+        :param directory: Directory of the pool. Default: ``~/.cache/ytmusicapi/store``
+        :param link: How the files are linked to the pool: ``reflink``, ``hardlink`` or
+            ``copy``, the first two falling back to a copy if they are not possible. ``auto``
+            tries a reflink, then a hard link. Default: ``auto``
+        """
+        if link not in LINK_METHODS:
+            raise Exception('link must be one of ' + ', '.join(LINK_METHODS))
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.link_method = link
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, directory: str, link: str = 'auto') -> 'DownloadStore':
+        """The store in a directory, shared by every caller in this process"""
+        directory = os.path.abspath(os.path.expanduser(directory))
+        with _stores_lock:
+            if directory not in _stores:
+                _stores[directory] = cls(directory, link)
+            return _stores[directory]
+
+    def path(self, video_id: str, itag: int, extension: str) -> str:
+        """Path of the stream of a videoId and itag in the pool, with the file ``extension``"""
+        return os.path.join(self.directory, video_id[:2],
+                            '{}-{}.{}'.format(video_id, itag, extension.lstrip('.')))
+
+    @contextmanager
+    def lock(self, video_id: str, itag: int):
+        """
+        Context manager holding the stream of a videoId and itag, so concurrent downloads of
+        it wait for the one that transfers it into the pool
+        """
+        key = '{}-{}'.format(video_id, itag)
+        with self._lock:
+            # the lock of a stream and the number of downloads holding or waiting for it
+            lock, users = self._locks.get(key, (None, 0))
+            lock = lock or threading.Lock()
+            self._locks[key] = (lock, users + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, users = self._locks[key]
+                if users == 1:
+                    del self._locks[key]
+                else:
+                    self._locks[key] = (lock, users - 1)
+
+    def shares(self, video_id: str, itag: int, path: str) -> bool:
+        """Whether ``path`` is a hard link to the stream of a videoId and itag in the pool"""
+        stored = self.path(video_id, itag, os.path.splitext(path)[1])
+        return os.path.exists(stored) and os.path.samefile(path, stored)
+
+    def link(self, source: str, dest: str) -> str:
+        """
+        Link a file of the pool to ``dest``, replacing the file there
+
+        :return: The method that worked, ``reflink``, ``hardlink`` or ``copy``
+        """
+        temp_path = dest + '.link'
+        for method in LINK_METHODS[self.link_method]:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            try:
+                if method == 'reflink':
+                    reflink(source, temp_path)
+                elif method == 'hardlink':
+                    os.link(source, temp_path)
+                else:
+                    shutil.copyfile(source, temp_path)
+            except OSError:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+                if method == 'copy':
+                    raise
+                continue
+            os.replace(temp_path, dest)
+            return method
@@ -0,0 +1,168 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+Resolver = Callable[[str], Tuple[Dict, List[Dict]]]
+
+
+class StreamEntry:
+    """Song and decrypted formats of one videoId, valid until ``expires``"""
+    __slots__ = ('song', 'formats', 'expires', 'resolve', 'users')
+
+    def __init__(self, song: Dict, formats: List[Dict], expires: float, resolve: Resolver):
+        self.song = song
+        self.formats = formats
+        self.expires = expires
+        self.resolve = resolve
+        self.users = 0
+
+
+class StreamCache:
+    """
+    Caches the song and decrypted formats of each videoId, as returned by
+    :py:func:`YTMusic.get_song_decrypted`, until shortly before the stream URLs expire after the
+    ``expiresInSeconds`` of the ``streamingData``.
+
+    A song is marked as in use with :py:func:`use` while its stream is transferred. A background
+    thread resolves songs in use again before their URLs expire, so a long transfer which is
+    resumed or split into ranges always finds valid URLs in the cache.
+
+    Concurrent requests for the same videoId wait for the first one instead of resolving it again,
+    so a song resolved ahead of time by a :py:class:`Prefetcher` is only fetched once.
+    """
+    def __init__(self, margin: float = 300, refresh_ahead: float = 900, interval: float = 60):
+        """
+        :param margin: Seconds before the URLs expire after which an entry is resolved again.
+            Default: 300
+        :param refresh_ahead: Seconds before the URLs expire after which the entries in use are
+            resolved again by the background thread. Should be larger than ``margin``. Default: 900
+        :param interval: Seconds between the checks of the background thread. Default: 60
+        """
+        self.margin = margin
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self._entries = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._stop = threading.Event()
+
+    def _resolve(self, video_id: str, resolve: Resolver) -> StreamEntry:
+        start = time.time()
+        song, formats = resolve(video_id)
+        expires_in = song.get('streamingData', {}).get('expiresInSeconds')
+        # without an expiry the URLs are not cached
+        expires = start + int(expires_in) if expires_in is not None else start
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is None:
+                entry = StreamEntry(song, formats, expires, resolve)
+                if expires_in is not None:
+                    self._entries[video_id] = entry
+            else:
+                entry.song, entry.formats, entry.expires = song, formats, expires
+        return entry
+
+    def _valid(self, entry: Optional[StreamEntry], margin: float) -> bool:
+        return entry is not None and time.time() < entry.expires - margin
+
+    def get(self, video_id: str, resolve: Resolver) -> Tuple[Dict, List[Dict]]:
+        """
+        Get the song and decrypted formats of a videoId.
+
+        :param video_id: Video id
+        :param resolve: Called with the video id to resolve it if there is no valid entry,
+            i.e. :py:func:`YTMusic.get_song_decrypted`
+        :return: Tuple of the song and the list of formats
+        """
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if self._valid(entry, self.margin):
+                return entry.song, entry.formats
+            pending = self._pending.get(video_id)
+            if pending is None:
+                self._pending[video_id] = threading.Event()
+        if pending is not None:
+            pending.wait()
+            return self.get(video_id, resolve)
+        try:
+            entry = self._resolve(video_id, resolve)
+        finally:
+            with self._lock:
+                self._pending.pop(video_id).set()
+        return entry.song, entry.formats
+
+    def get_url(self, video_id: str, itag: int) -> Optional[str]:
+        """URL of the format with the itag in the cache, ``None`` if the entry is not valid"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if not self._valid(entry, 0):
+                return None
+            for fmt in entry.formats:
+                if fmt['itag'] == itag:
+                    return fmt['url']
+        return None
+
+    def invalidate(self, video_id: str):
+        """Remove the entry of a videoId, i.e. after its URLs were rejected"""
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None and entry.users == 0:
+                del self._entries[video_id]
+            elif entry is not None:
+                entry.expires = 0
+
+    def clear(self):
+        """Remove all entries that are not in use"""
+        with self._lock:
+            self._entries = {
+                video_id: entry
+                for video_id, entry in self._entries.items() if entry.users > 0
+            }
+
+    @contextmanager
+    def use(self, video_id: str):
+        """
+        Context manager marking a videoId as in use, so its entry is kept valid by the background
+        thread until the context is left. Starts the background thread if it is not running.
+        """
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None:
+                entry.users += 1
+            if entry is not None and (self._refresher is None or not self._refresher.is_alive()):
+                self._stop.clear()
+                self._refresher = threading.Thread(target=self._refresh, daemon=True)
+                self._refresher.start()
+        try:
+            yield
+        finally:
+            if entry is not None:
+                with self._lock:
+                    entry.users -= 1
+
+    def _refresh(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                expiring = [(video_id, entry) for video_id, entry in self._entries.items()
+                            if entry.users > 0 and not self._valid(entry, self.refresh_ahead)]
+                # entries which are not in use any more are only kept while they are valid
+                self._entries = {
+                    video_id: entry
+                    for video_id, entry in self._entries.items()
+                    if entry.users > 0 or self._valid(entry, self.margin)
+                }
+                if not expiring and not any(entry.users for entry in self._entries.values()):
+                    self._refresher = None
+                    return
+            for video_id, entry in expiring:
+                try:
+                    self._resolve(video_id, entry.resolve)
+                except Exception:
+                    # tried again on the next check, the transfer uses the old URLs meanwhile
+                    pass
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
@@ -0,0 +1,92 @@
+import struct
+from io import BytesIO
+from typing import Dict, Iterator, Optional, Tuple
+
+# free space reserved after the tags, so they can be changed later without moving the stream
+PADDING = 8192
+# flag of the tfhd box for an absolute base-data-offset, which would move with the header
+BASE_DATA_OFFSET_PRESENT = 0x000001
+
+
+def iter_boxes(data: bytes, start: int = 0, end: int = None) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    Boxes of an MP4 stream between ``start`` and ``end``, as tuples of their type, offset and
+    size. Stops at a box whose header is not in ``data`` yet.
+    """
+    end = len(data) if end is None else end
+    position = start
+    while position + 8 <= end:
+        size, kind = struct.unpack('>I4s', data[position:position + 8])
+        if size == 1:
+            if position + 16 > end:
+                return
+            size = struct.unpack('>Q', data[position + 8:position + 16])[0]
+        elif size == 0:
+            # the box extends to the end of the stream
+            size = None
+        yield kind, position, size
+        if size is None or size < 8:
+            return
+        position += size
+
+
+def find_header(data: bytes) -> Optional[int]:
+    """
+    Length of the header of an MP4 stream, the boxes up to and including ``moov``, if the rest
+    of the stream stays valid when the header changes its size, else 0. That is the case if the
+    media data follows the header, and for fragmented streams, if the movie fragments do not
+    refer to absolute offsets. ``None`` if more of the stream is needed to tell.
+    """
+    header = None
+    for kind, offset, size in iter_boxes(data):
+        if size is None:
+            return 0
+        if kind == b'moov':
+            if offset + size > len(data):
+                return None
+            header = offset + size
+            if not any(child == b'mvex' for child, _, _ in iter_boxes(data, offset + 8, header)):
+                # the chunk offsets of a regular stream are updated along with the tags
+                return header
+        elif kind == b'moof' and header is not None:
+            if offset + size > len(data):
+                return None
+            for child, child_offset, child_size in iter_boxes(data, offset + 8, offset + size):
+                if child != b'traf' or child_size is None:
+                    continue
+                for box, box_offset, _ in iter_boxes(data, child_offset + 8,
+                                                     child_offset + child_size):
+                    flags = int.from_bytes(data[box_offset + 9:box_offset + 12], 'big')
+                    if box == b'tfhd' and flags & BASE_DATA_OFFSET_PRESENT:
+                        return 0
+            return header
+        elif kind in (b'mdat', b'moof'):
+            # media data before the moov box
+            return 0
+    return None
+
+
+def keep_padding(info) -> int:
+    """
+    Padding policy for mutagen's ``save()``: keeps the free space if the tags fit in it, so they
+    are updated in place, otherwise reserves :py:data:`PADDING` bytes
+    """
+    return info.padding if info.padding >= 0 else PADDING
+
+
+def tag_header(header: bytes, tags: Dict, padding: int = PADDING) -> bytes:
+    """
+    Write tags to the header of an MP4 stream.
+
+    :param header: Header of the stream, see :py:func:`find_header`
+    :param tags: Tags by their MP4 atom name, i.e. ``{"\\xa9nam": ["Title"]}``
+    :param padding: Bytes of free space to reserve after the tags. Default: 8192
+    :return: The header with the tags
+    """
+    from mutagen.mp4 import MP4
+    with BytesIO(header) as f:
+        video = MP4(f)
+        for key, value in tags.items():
+            video[key] = value
+        video.save(f, padding=lambda info: padding)
+        return f.getvalue()
@@ -0,0 +1,211 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ytmusicapi.downloader.player import get_cache_dir
+
+INDEX_NAME = 'index.jsonl'
+# the size of googleusercontent thumbnails is part of the URL, i.e. ``...=w544-h544-l90-rj``
+SIZE_PATTERN = re.compile(r'=w(\d+)-h(\d+)')
+
+
+def largest_thumbnail(thumbnails: List[Dict]) -> Optional[Dict]:
+    """
+    The thumbnail with the most pixels according to its ``width`` and ``height``. Thumbnails
+    without them are taken to be listed from small to large, as YouTube Music does.
+    """
+    if not thumbnails:
+        return None
+    return max(enumerate(thumbnails),
+               key=lambda item: (item[1].get('width', 0) * item[1].get('height', 0), item[0]))[1]
+
+
+def thumbnail_url(url: str, width: int, height: int) -> str:
+    """URL of a thumbnail scaled to ``width`` x ``height``, if the URL has a size in it"""
+    return SIZE_PATTERN.sub('=w{}-h{}'.format(width, height), url, count=1)
+
+
+def image_info(data: bytes) -> Tuple[str, int, int]:
+    """
+    Format, i.e. ``JPEG`` or ``PNG``, width and height of an image, read from its header
+    without decoding the pixels.
+    """
+    from PIL import Image
+    with Image.open(BytesIO(data)) as image:
+        return image.format, image.width, image.height
+
+
+class ThumbnailCache:
+    """
+    Content-addressed cache of thumbnails, shared by the songs, albums and artists that use
+    them. Each URL is fetched once, and images with the same content are stored once, in a file
+    named after the SHA-1 of the content, no matter how many URLs point to them. The URLs are
+    recorded in a JSON lines index, which is appended to for every new URL.
+
+    The least recently used images are removed when the cache grows beyond ``max_bytes``, in
+    memory as well as on disk, and fetched again when they are needed.
+
+    Concurrent requests for the same URL wait for the first one instead of fetching it again.
+    """
+    def __init__(self, directory: str = os.path.join(get_cache_dir(), 'thumbnails'),
+                 max_bytes: int = 256 * 1024**2):
+        """
+        :param directory: Directory to store the thumbnails in. Set to ``None`` to only cache in
+            memory. Default: ``~/.cache/ytmusicapi/thumbnails``
+        :param max_bytes: Maximum size of all images together. Default: 256 MiB
+        """
+        self.directory = directory
+        self.index_path = os.path.join(directory, INDEX_NAME) if directory else None
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._urls = None
+        # sizes of the images by their digest, the least recently used first
+        self._sizes = OrderedDict()
+        self._data = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self._urls = {}
+        self._sizes = OrderedDict()
+        self.size = 0
+        if self.directory is None or not os.path.isdir(self.directory):
+            return
+        found = []
+        for prefix in os.listdir(self.directory):
+            folder = os.path.join(self.directory, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                if name.endswith('.tmp'):
+                    continue
+                stat = os.stat(os.path.join(folder, name))
+                found.append((stat.st_mtime, name, stat.st_size))
+        for _, digest, size in sorted(found):
+            self._sizes[digest] = size
+            self.size += size
+        lines = 0
+        if os.path.exists(self.index_path):
+            with open(self.index_path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        self._urls[entry['url']] = entry['sha1']
+                        lines += 1
+                    except (ValueError, KeyError, TypeError):
+                        # i.e. a line cut short when the process was killed
+                        pass
+        # the URLs of removed images are left out when the index is rewritten
+        self._urls = {url: digest for url, digest in self._urls.items() if digest in self._sizes}
+        if lines > 2 * len(self._urls) + 100:
+            self._save()
+
+    def _save(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w') as f:
+            for url, digest in self._urls.items():
+                f.write(json.dumps({'url': url, 'sha1': digest}) + '\n')
+        os.replace(temp_path, self.index_path)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def _read(self, digest: str) -> Optional[bytes]:
+        if digest not in self._sizes:
+            return None
+        if self.directory is None:
+            data = self._data[digest]
+        else:
+            try:
+                with open(self._path(digest), 'rb') as f:
+                    data = f.read()
+                os.utime(self._path(digest))
+            except FileNotFoundError:
+                self.size -= self._sizes.pop(digest)
+                return None
+        self._sizes.move_to_end(digest)
+        return data
+
+    def _evict(self):
+        # the image stored last is kept, even if it is larger than max_bytes on its own
+        while self.size > self.max_bytes and len(self._sizes) > 1:
+            digest, size = self._sizes.popitem(last=False)
+            self.size -= size
+            if self.directory is None:
+                del self._data[digest]
+            else:
+                try:
+                    os.remove(self._path(digest))
+                except FileNotFoundError:
+                    pass
+
+    def _store(self, url: str, data: bytes):
+        digest = hashlib.sha1(data).hexdigest()
+        if self.directory is not None and not os.path.exists(self._path(digest)):
+            os.makedirs(os.path.dirname(self._path(digest)), exist_ok=True)
+            temp_path = self._path(digest) + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+            os.replace(temp_path, self._path(digest))
+        with self._lock:
+            if digest not in self._sizes:
+                self._sizes[digest] = len(data)
+                self.size += len(data)
+                if self.directory is None:
+                    self._data[digest] = data
+            self._sizes.move_to_end(digest)
+            if self._urls.get(url) != digest:
+                self._urls[url] = digest
+                if self.index_path is not None:
+                    with open(self.index_path, 'a') as f:
+                        f.write(json.dumps({'url': url, 'sha1': digest}) + '\n')
+            self._evict()
+
+    def get(self, url: str, fetch: Callable[[str], bytes]) -> bytes:
+        """
+        Get the content of a thumbnail.
+
+        :param url: URL of the thumbnail
+        :param fetch: Returns the content at a URL, called if the URL is not cached
+        :return: Content of the thumbnail
+        """
+        with self._lock:
+            if self._urls is None:
+                self._load()
+            digest = self._urls.get(url)
+            data = self._read(digest) if digest is not None else None
+            if data is not None:
+                return data
+            pending = self._pending.get(url)
+            if pending is None:
+                self._pending[url] = threading.Event()
+        if pending is not None:
+            pending.wait()
+            return self.get(url, fetch)
+        try:
+            data = fetch(url)
+            self._store(url, data)
+            return data
+        finally:
+            with self._lock:
+                self._pending.pop(url).set()
+
+    def clear(self):
+        """Remove all thumbnails from memory and disk"""
+        with self._lock:
+            if self._urls is None:
+                self._load()
+            for digest in self._sizes:
+                if self.directory is not None and os.path.exists(self._path(digest)):
+                    os.remove(self._path(digest))
+            self._urls = {}
+            self._sizes = OrderedDict()
+            self._data = {}
+            self.size = 0
+            if self.index_path is not None and os.path.exists(self.index_path):
+                os.remove(self.index_path)
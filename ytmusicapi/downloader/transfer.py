@@ -0,0 +1,235 @@
+import ctypes
+import ctypes.util
+import os
+import threading
+import time
+from typing import BinaryIO, Iterator, Optional, Union
+
+import requests
+from urllib3.exceptions import IncompleteRead, ProtocolError, ReadTimeoutError
+
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+# flag of fallocate(2) to reserve blocks without changing the size of the file
+FALLOC_FL_KEEP_SIZE = 0x01
+
+_buffers = threading.local()
+_fallocate = None
+
+
+class AdaptiveChunkSize:
+    """
+    Size of the reads of a transfer, tuned to its throughput: each read should take about
+    ``target`` seconds. Large reads cost fewer calls on a fast connection, small reads keep a
+    slow one responsive, since a read blocks until it is complete, and lose less when the
+    connection drops.
+    """
+    def __init__(self, initial: int = 64 * 1024, minimum: int = MIN_CHUNK_SIZE,
+                 maximum: int = MAX_CHUNK_SIZE, target: float = 0.1):
+        """
+        :param initial: Size of the first read. Default: 64 KiB
+        :param minimum: Smallest size. Default: 16 KiB
+        :param maximum: Largest size. Default: 4 MiB
+        :param target: Seconds each read should take. Default: 0.1
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self.size = min(max(initial, minimum), maximum)
+
+    def update(self, length: int, seconds: float):
+        """Adjust the size after a read of ``length`` bytes which took ``seconds``"""
+        if length < self.size:
+            # the end of the stream, which says nothing about the throughput
+            return
+        ideal = length / max(seconds, 1e-6) * self.target
+        if ideal >= self.size * 2:
+            self.size = min(self.size * 2, self.maximum)
+        elif ideal < self.size / 2:
+            self.size = max(self.size // 2, self.minimum)
+
+
+def thread_buffer(size: int) -> bytearray:
+    """A buffer of at least ``size`` bytes, reused by all transfers of the calling thread"""
+    buffer = getattr(_buffers, 'buffer', None)
+    if buffer is None or len(buffer) < size:
+        buffer = _buffers.buffer = bytearray(size)
+    return buffer
+
+
+def _readinto(raw, view: memoryview) -> int:
+    """
+    Read into ``view`` from the http.client response under a urllib3 response, which fills the
+    buffer directly, where the readinto() of urllib3 reads into new bytes and copies them. Only
+    for content which is not decoded. urllib3 still translates the errors, counts the bytes
+    read and releases the connection at the end of the stream.
+    """
+    fp = getattr(raw, '_fp', None)
+    catcher = getattr(raw, '_error_catcher', None)
+    if fp is None or catcher is None or not hasattr(fp, 'readinto') or fp.closed:
+        return raw.readinto(view)
+    with catcher():
+        length = fp.readinto(view)
+        if not length:
+            fp.close()
+            if raw.enforce_content_length and raw.length_remaining:
+                raise IncompleteRead(raw._fp_bytes_read, raw.length_remaining)
+    raw._fp_bytes_read += length
+    if raw.length_remaining is not None:
+        raw.length_remaining -= length
+    return length
+
+
+def iter_chunks(response: requests.Response,
+                chunk_size: Union[int, AdaptiveChunkSize, None] = None,
+                buffer: Optional[bytearray] = None) -> Iterator[memoryview]:
+    """
+    The body of a streamed response, read into a buffer of the calling thread, which is reused
+    for every chunk. Each chunk is only valid until the next one is read.
+
+    :param response: Response of a request with ``stream=True``
+    :param chunk_size: Size of the reads, or an :py:class:`AdaptiveChunkSize`, which is the
+        default
+    :param buffer: Optional. Buffer to read into instead, at least as large as the reads, for
+        iterators which are not consumed on the thread that started them
+    :return: Iterator of memoryviews of the buffer
+    """
+    sizer = AdaptiveChunkSize() if chunk_size is None else chunk_size
+    if response.headers.get('Content-Encoding', 'identity') != 'identity':
+        # only requests decodes the content
+        fixed = sizer.maximum if isinstance(sizer, AdaptiveChunkSize) else sizer
+        for chunk in response.iter_content(fixed):
+            yield memoryview(chunk)
+        return
+    adaptive = isinstance(sizer, AdaptiveChunkSize)
+    if buffer is None:
+        buffer = thread_buffer(sizer.maximum if adaptive else sizer)
+    view = memoryview(buffer)
+    while True:
+        size = sizer.size if adaptive else sizer
+        started = time.perf_counter()
+        try:
+            length = _readinto(response.raw, view[:size])
+        except ProtocolError as e:
+            # the errors requests raises for them in iter_content()
+            raise requests.exceptions.ChunkedEncodingError(e)
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ConnectionError(e)
+        if not length:
+            return
+        if adaptive:
+            sizer.update(length, time.perf_counter() - started)
+        yield view[:length]
+
+
+def preallocate(f: BinaryIO, length: int) -> bool:
+    """
+    Reserve disk space for ``length`` bytes from the current position of a file, so it is not
+    fragmented by the writes, without changing its size. Only on Linux, elsewhere nothing is
+    done.
+
+    :return: True if the space was reserved
+    """
+    global _fallocate
+    if _fallocate is None:
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            _fallocate = libc.fallocate
+            _fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+        except (OSError, AttributeError, TypeError):
+            _fallocate = False
+    if not _fallocate or length <= 0:
+        return False
+    f.flush()
+    return _fallocate(f.fileno(), FALLOC_FL_KEEP_SIZE, f.tell(), length) == 0
+
+
+class PreallocatedWriter:
+    """
+    Writes a transfer to a file, with the space for it reserved up front, see
+    :py:func:`preallocate`, and synced to disk according to ``fsync``.
+    """
+    def __init__(self, f: BinaryIO, length: Optional[int] = None,
+                 fsync: Union[str, int, None] = None):
+        """
+        :param f: File opened for writing, at the position to write to
+        :param length: Optional. Number of bytes that will be written
+        :param fsync: ``None`` to leave syncing to the operating system, ``"end"`` to sync once
+            the transfer is finished, or a number of bytes to also sync after every so many
+            bytes. Default: ``None``
+        """
+        if not (fsync is None or fsync == 'end' or (isinstance(fsync, int) and fsync > 0)):
+            raise Exception('fsync must be None, "end" or a number of bytes')
+        self.f = f
+        self.fsync = fsync
+        self.length = length
+        self.written = 0
+        self._unsynced = 0
+        self._preallocated = length is not None and preallocate(f, length)
+
+    def write(self, data):
+        self.f.write(data)
+        self.written += len(data)
+        self._unsynced += len(data)
+        if isinstance(self.fsync, int) and self._unsynced >= self.fsync:
+            self.sync()
+
+    def sync(self):
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self._unsynced = 0
+
+    def finish(self):
+        """
+        Release the reserved space that was not written, and sync the file if the policy asks
+        for it, after the last write
+        """
+        if self._preallocated and self.written < self.length:
+            self.f.truncate(self.f.tell())
+        if self.fsync is not None and self._unsynced:
+            self.sync()
+
+
+class TeeFile:
+    """
+    Copy of a stream which is read in parts, i.e. by a player seeking in it. The parts are
+    appended to ``<path>.part`` as long as they continue it, and the file is renamed to ``path``
+    once it has the whole stream. A part starting after the end of the file ends the copy.
+    """
+    def __init__(self, path: str, size: Optional[int]):
+        """
+        :param path: Path of the complete file
+        :param size: Size of the stream, the file is only completed if it is known
+        """
+        self.path = path
+        self.part_path = path + '.part'
+        self.size = size
+        self._f = None
+        if not os.path.exists(path):
+            self._f = open(self.part_path, 'ab')
+            self.offset = self._f.tell()
+            if size is not None and self.offset > size:
+                # more bytes than the stream has, this is not a part of it
+                self._f.seek(0)
+                self._f.truncate()
+                self.offset = 0
+
+    def write(self, position: int, data):
+        """Copy ``data``, the bytes of the stream from ``position`` on"""
+        if self._f is None:
+            return
+        skip = self.offset - position
+        if skip < 0:
+            self.close()
+        elif skip < len(data):
+            self._f.write(data[skip:])
+            self.offset += len(data) - skip
+
+    def close(self):
+        """Stop copying, and rename the file if it is complete"""
+        if self._f is None:
+            return
+        self._f.close()
+        self._f = None
+        if self.size is not None and self.offset == self.size:
+            os.replace(self.part_path, self.path)
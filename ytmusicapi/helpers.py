@@ -4,8 +4,6 @@ from http.cookies import SimpleCookie
 from hashlib import sha1
 import time
 from datetime import date
-from functools import wraps
-import locale
 from ytmusicapi.constants import *
 
 
@@ -70,8 +68,8 @@ def initialize_context():
     }
 
 
-def get_visitor_id(request_func):
-    response = request_func(YTM_DOMAIN)
+def get_visitor_id(request_func, domain=YTM_DOMAIN):
+    response = request_func(domain)
     matches = re.findall(r'ytcfg\.set\s*\(\s*({.+?})\s*\)\s*;', response)
     visitor_id = ""
     if len(matches) > 0:
@@ -106,20 +104,13 @@ def get_datestamp():
     return (date.today() - date.fromtimestamp(0)).days
 
 
-def to_int(string):
-    number_string = string.split(' ')[0]
-    try:
-        int_value = locale.atoi(number_string)
-    except ValueError:
-        number_string = number_string.replace(',', '')
-        int_value = int(number_string)
-    return int_value
-
-
-def i18n(method):
-    @wraps(method)
-    def _impl(self, *method_args, **method_kwargs):
-        method.__globals__['_'] = self.lang.gettext
-        return method(self, *method_args, **method_kwargs)
-
-    return _impl
+def to_int(string, thousands_separator=','):
+    """
+    Parse the leading number of a display text, i.e. "1,234 songs", without using the locale.
+    Only ``thousands_separator`` is accepted between the digits, so "1,5" is 1 where the
+    separator is "."
+    """
+    match = re.match(r'\d(?:' + re.escape(thousands_separator) + r'?\d)*', string.strip())
+    if not match:
+        raise ValueError("No number found in " + repr(string))
+    return int(re.sub(r'\D', '', match.group()))
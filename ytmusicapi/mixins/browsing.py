@@ -548,7 +548,7 @@ class BrowsingMixin:
             }
 
         """
-        endpoint = "https://www.youtube.com/get_video_info"
+        endpoint = self.youtube_domain + "/get_video_info"
         params = {"video_id": videoId, "hl": self.language, "el": "detailpage"}
         response = requests.get(endpoint, params, headers=self.headers, proxies=self.proxies)
         text = parse_qs(response.text)
@@ -663,7 +663,7 @@ class BrowsingMixin:
             }
 
         """
-        endpoint = "https://www.youtube.com/get_video_info"
+        endpoint = self.youtube_domain + "/get_video_info"
         params = {
             "video_id": videoId,
             "hl": self.language,
@@ -996,42 +996,11 @@ class BrowsingMixin:
             channelId = channelId[4:]
         body = prepare_browse_endpoint("ARTIST", channelId)
         endpoint = 'browse'
-        response = self._send_request(endpoint, body)
-        results = nav(response, SINGLE_COLUMN_TAB + SECTION_LIST)
-
-        if len(results) == 1:
+        artist = self._parse_response('browsing.Parser.parse_artist_response',
+                                      self._send_raw_request(endpoint, body))
+        if artist is None:
             # not a YouTube Music Channel, a standard YouTube Channel ID with no music content was given
             raise ValueError(f"The YouTube Channel {channelId} has no music content.")
-
-        artist = {'description': None, 'views': None}
-        header = response['header']['musicImmersiveHeaderRenderer']
-        artist['name'] = nav(header, TITLE_TEXT)
-        descriptionShelf = find_object_by_key(results,
-                                              'musicDescriptionShelfRenderer',
-                                              is_key=True)
-        if descriptionShelf:
-            artist['description'] = nav(descriptionShelf, DESCRIPTION)
-            artist['views'] = None if 'subheader' not in descriptionShelf else descriptionShelf[
-                'subheader']['runs'][0]['text']
-        subscription_button = header['subscriptionButton']['subscribeButtonRenderer']
-        artist['channelId'] = subscription_button['channelId']
-        artist['shuffleId'] = nav(header,
-                                  ['playButton', 'buttonRenderer'] + NAVIGATION_WATCH_PLAYLIST_ID,
-                                  True)
-        artist['radioId'] = nav(header, ['startRadioButton', 'buttonRenderer']
-                                + NAVIGATION_WATCH_PLAYLIST_ID, True)
-        artist['subscribers'] = nav(subscription_button,
-                                    ['subscriberCountText', 'runs', 0, 'text'], True)
-        artist['subscribed'] = subscription_button['subscribed']
-        artist['thumbnails'] = nav(header, THUMBNAILS, True)
-        artist['songs'] = {'browseId': None}
-        if 'musicShelfRenderer' in results[0]:  # API sometimes does not return songs
-            musicShelf = nav(results[0], MUSIC_SHELF)
-            if 'navigationEndpoint' in nav(musicShelf, TITLE):
-                artist['songs']['browseId'] = nav(musicShelf, TITLE + NAVIGATION_BROWSE_ID)
-            artist['songs']['results'] = parse_playlist_items(musicShelf['contents'])
-
-        artist.update(self.parser.parse_artist_contents(results))
         return artist
 
     def get_artist_albums(self, channelId: str, params: str) -> List[Dict]:
@@ -1133,7 +1102,7 @@ class BrowsingMixin:
         :return: browseId (starting with `MPREb_`)
         """
         params = {"list": audioPlaylistId}
-        response = self._send_get_request(YTM_DOMAIN + "/playlist", params)
+        response = self._send_get_request(self.domain + "/playlist", params)
         matches = re.findall(r"\"MPRE.+?\"", response)
         browse_id = None
         if len(matches) > 0:
@@ -1182,72 +1151,8 @@ class BrowsingMixin:
         """
         body = prepare_browse_endpoint("ALBUM", browseId)
         endpoint = 'browse'
-        response = self._send_request(endpoint, body)
-        album = {}
-        data = nav(response, FRAMEWORK_MUTATIONS, True)
-        if not data:
-            album = parse_album_header(response)
-            results = nav(response, SINGLE_COLUMN_TAB + SECTION_LIST_ITEM + MUSIC_SHELF)
-            album['tracks'] = parse_playlist_items(results['contents'])
-        else:
-            album_data = find_object_by_key(data, 'musicAlbumRelease', 'payload', True)
-            album['title'] = album_data['title']
-            album['trackCount'] = album_data['trackCount']
-            album['durationMs'] = album_data['durationMs']
-            album['playlistId'] = album_data['audioPlaylistId']
-            album['releaseDate'] = album_data['releaseDate']
-            album['description'] = find_object_by_key(data, 'musicAlbumReleaseDetail', 'payload',
-                                                      True)['description']
-            album['thumbnails'] = album_data['thumbnailDetails']['thumbnails']
-            album['artist'] = []
-            artists_data = find_objects_by_key(data, 'musicArtist', 'payload')
-            for artist in artists_data:
-                album['artist'].append({
-                    'name': artist['musicArtist']['name'],
-                    'id': artist['musicArtist']['externalChannelId']
-                })
-            album['tracks'] = []
-
-            track_library_details = {}
-            for item in data:
-                if 'musicTrackUserDetail' in item['payload']:
-                    like_state = item['payload']['musicTrackUserDetail']['likeState'].split(
-                        '_')[-1]
-                    parent_track = item['payload']['musicTrackUserDetail']['parentTrack']
-                    like_state = 'INDIFFERENT' if like_state in ['NEUTRAL', 'UNKNOWN'
-                                                                 ] else like_state[:-1]
-                    track_library_details[parent_track] = like_state
-
-                if 'musicLibraryEdit' in item['payload']:
-                    entity_key = item['entityKey']
-                    track_library_details[entity_key] = {
-                        'add': item['payload']['musicLibraryEdit']['addToLibraryFeedbackToken'],
-                        'remove':
-                        item['payload']['musicLibraryEdit']['removeFromLibraryFeedbackToken']
-                    }
-
-            for item in data[3:]:
-                if 'musicTrack' in item['payload']:
-                    music_track = item['payload']['musicTrack']
-                    track = {}
-                    track['index'] = music_track['albumTrackIndex']
-                    track['title'] = music_track['title']
-                    track['thumbnails'] = music_track['thumbnailDetails']['thumbnails']
-                    track['artists'] = music_track['artistNames']
-                    # in case the song is unavailable, there is no videoId
-                    track['videoId'] = music_track['videoId'] if 'videoId' in item['payload'][
-                        'musicTrack'] else None
-                    # very occasionally lengthMs is not returned
-                    track['lengthMs'] = music_track[
-                        'lengthMs'] if 'lengthMs' in music_track else None
-                    track['likeStatus'] = track_library_details[item['entityKey']]
-                    track['isExplicit'] = music_track['contentRating'][
-                        'explicitType'] == 'MUSIC_ENTITY_EXPLICIT_TYPE_EXPLICIT'
-                    if 'libraryEdit' in music_track:
-                        track['feedbackTokens'] = track_library_details[music_track['libraryEdit']]
-                    album['tracks'].append(track)
-
-        return album
+        return self._parse_response('albums.parse_album_response',
+                                    self._send_raw_request(endpoint, body), self.language)
 
     def get_song(self, videoId: str, signatureTimestamp: int = None) -> Dict:
         """
@@ -1547,12 +1452,12 @@ class BrowsingMixin:
 
         :return: URL to `base.js`
         """
-        response = self._send_get_request(url=YTM_DOMAIN)
+        response = self._send_get_request(url=self.domain)
         match = re.search(r'jsUrl"\s*:\s*"([^"]+)"', response)
         if match is None:
             raise Exception("Could not identify the URL for base.js player.")
 
-        return YTM_DOMAIN + match.group(1)
+        return self.domain + match.group(1)
 
     def get_signatureTimestamp(self, url: str = None) -> int:
         """
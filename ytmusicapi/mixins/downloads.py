@@ -1,4 +1,4 @@
-import sys, os
+import os
 from PIL import Image
 from io import BytesIO
 
@@ -6,17 +6,25 @@ from io import BytesIO
 
 from ytmusicapi.parsers.utils import *
 #import ytmusicapi
-import pytube
 import re
 import requests
-from urllib.parse import parse_qs, urljoin
+from urllib.parse import parse_qs, quote, unquote
 import json
-
-try:
-	import blessings
-	clear_eol = blessings.Terminal().clear_eol
-except ImportError as err:
-	clear_eol = "\x1b[K"
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import inspect
+import hashlib
+import warnings
+from ytmusicapi.downloader import DownloadManager, SegmentedDownload, DownloadManifest, Retagger
+from ytmusicapi.downloader.retag import retag_file
+from ytmusicapi.downloader.thumbnails import largest_thumbnail, thumbnail_url, image_info
+from ytmusicapi.downloader.tagging import find_header, tag_header
+from ytmusicapi.downloader.transfer import AdaptiveChunkSize, PreallocatedWriter, TeeFile, iter_chunks
+from ytmusicapi.downloader.formats import FormatSelector, parse_mime_type
+from ytmusicapi.downloader.probe import parse_init, parse_sidx, segments_until
+from ytmusicapi.downloader.planner import DiscographyPlan, ESTIMATED_BITRATE, release_order
+from ytmusicapi.downloader.store import DownloadStore
+from ytmusicapi.downloader.progress import ProgressEvent, ProgressAggregator, TransferMeter, print_progress, print_totals
 
 def sanitize(s):
 	return "".join(re.split("[^a-zA-Z 0-9_\\(\\)\\[\\]\\:\\'\\\"\\@\\!\\#\\$\\%\\&\\=\\+\\,\\.\\<\\>\\;\\|\\{\\}-]",s)).strip()
@@ -42,7 +50,7 @@ class DownloadMixin:
 				# ok, we have a videoId, which we need to get a url for the best quality stream for.
 				# start by fetching /get_video_info? which should have a watch URL in there somewhere...
 
-				endpoint = "https://www.youtube.com/get_video_info"
+				endpoint = self.youtube_domain + "/get_video_info"
 				params = {"video_id": videoId, "hl": self.language, "el": "detailpage",
 									"c": "WEB_REMIX", "cver": "0.1"}
 				response = requests.get(endpoint, params, headers=self.headers, proxies=self.proxies)
@@ -55,143 +63,655 @@ class DownloadMixin:
 				if 'streamingData' not in player_response:
 						raise Exception('This video is not playable (no streamingData key in player_response key of /get_video_info? response)')
 
-				watch_url = player_response['microformat']['microformatDataRenderer']['urlCanonical'] # this seems like it will probably break easily... maybe fall back to a recursive search for a watch url anywhere in the JSON? or something?
-
-				# get the watch page's HTML, which we need to get the base.js URL that determines how
-				# pytube unscrambles the signatureCipher
+				# this is where pytube comes in... the base.js of the video player is where the signatureCipher is
+				# descrambled by a variable algorithm coded in minified, obfuscated javascript. thankfully, the task of
+				# extracting from the javascript the steps needed to properly unscramble the signatureCipher is also
+				# handled by pytube. the steps only change with the player version, so they are kept in the player_cache
+				# and base.js is only fetched (and the watch page is not needed at all) when a new player version shows
+				# up in the base.js url on the home page, which is checked at most once an hour.
 
-				watch_response = requests.get(watch_url, #params,
-																			headers=self.headers, proxies=self.proxies)
-				watch_html = watch_response.text
+				player = self.player_cache.get(self.get_basejs_url, self._send_get_request)
+				sdata = player_response['streamingData']
+				return (sdata, self._decrypt_formats(sdata, player, videoId))
 
-				# this is where pytube comes in... given the watch page HTML, it extracts for us the URL of
-				# the base.js for the video player, which is where the signatureCipher is descrambled by a
-				# variable algorithm coded in minified, obfuscated javascript. thankfully, the task of
-				# extracting from the javascript the steps needed to properly unscramble the signatureCipher
-				# is also handled by pytube.
+		def get_song_decrypted(self, videoId: str) -> tuple:
 
-				player_js_url = pytube.extract.get_ytplayer_js(watch_html)
-				player_js_response = requests.get(urljoin(watch_url, player_js_url), params, headers=self.headers, proxies=self.proxies)
-				player_js = player_js_response.text
+				''' Like get_song() followed by get_streaming_data_decrypted(), but in a single round trip: the player
+				response returned by get_song() already has the streamingData, it is only of use if it was requested with
+				the signatureTimestamp of the current player, which is kept in the player_cache along with the cipher.
+				returns the player response from get_song() and the list of formats with decrypted urls. '''
 
-				cipher = pytube.cipher.Cipher(js = player_js)
+				player = self.player_cache.get(self.get_basejs_url, self._send_get_request)
+				song = self.get_song(videoId, player.signature_timestamp)
+				if 'streamingData' not in song:
+						raise Exception('This video is not playable (no streamingData key in player response)')
+				return (song, self._decrypt_formats(song['streamingData'], player, videoId))
 
+		def _decrypt_formats(self, sdata, player, videoId):
+				''' collect the formats of the streamingData and apply the cipher of the player to their urls. a format without
+				a url is left out with a warning. '''
 				# okay, now we collect all the streams available and apply the cipher to any that have signed
 				# URLs. this is where we would also handle DASH manifests... i think? TODO, fo' sho'.
+				# the n parameter of every url has to be descrambled as well, or the stream is throttled to about
+				# the speed it plays at. all formats of a response usually share the same n, so it is only done once.
 
 				allformats = []
+				descrambled = {}
+				def descramble_n(match):
+					n = unquote(match.group(2))
+					if n not in descrambled:
+						try:
+							descrambled[n] = player.get_n(n)
+						except Exception as e:
+							# the stream is still there with the original n, only throttled
+							warnings.warn(f"Unable to descramble n of videoId {repr(videoId)}, the stream may be throttled: {e}")
+							descrambled[n] = n
+					return match.group(1) + quote(descrambled[n], safe='')
 
-				sdata = player_response['streamingData']
 				for formatsKey in ['formats', 'adaptiveFormats']:
 					if formatsKey in sdata.keys():
 						for fmt in sdata[formatsKey]:
 							if 'signatureCipher' in fmt.keys():
 								fmtsigcipherq = parse_qs(fmt['signatureCipher'])
-								sig = cipher.get_signature(fmtsigcipherq['s'][0])
+								sig = player.get_signature(fmtsigcipherq['s'][0])
 								url = fmtsigcipherq['url'][0] + '&' + fmtsigcipherq['sp'][0] + '=' + sig
 								fmt['url'] = url
 							if not 'url' in fmt.keys():
-								print(f"[warn] streamingData contains format with itag {fmt['itag']} without a url key in get_streaming_data_decrypted({repr(videoId)}):\n\n{repr(fmt)}\n")
+								warnings.warn(f"streamingData of videoId {repr(videoId)} contains format with itag {fmt['itag']} without a url key, it is left out")
 								continue
+							fmt['url'] = re.sub(r'([?&]n=)([^&]*)', descramble_n, fmt['url'])
 							allformats.append(fmt)
 
-				return (sdata, allformats)
+				return allformats
 
+		def _download_job(self, video_id, dest_dir, chunk_size = None, skip_existing = True,
+						  skip_metadata_existing = False, keep_incomplete = True, title_only_filename = False,
+						  song_info = None, album_info = None, artist_info = None, playlist = None, retries = 3, segments = 1,
+						  manifest = False, single_pass = True, progress = None, fsync = None, format_selector = None, store = None):
+				''' collects the arguments of download_song() in a dict, which is passed through the download stages below
+				and filled in with the song metadata, the chosen format and the file path on the way. '''
+				if manifest == True:
+					manifest = DownloadManifest.open(dest_dir)
+				if isinstance(store, str):
+					store = DownloadStore.open(store)
+				if progress == True:
+					progress = print_progress
+				return {'videoId': video_id, 'dest_dir': dest_dir, 'chunk_size': chunk_size, 'skip_existing': skip_existing,
+						'skip_metadata_existing': skip_metadata_existing, 'keep_incomplete': keep_incomplete,
+						'title_only_filename': title_only_filename, 'song_info': song_info, 'album_info': album_info,
+						'artist_info': artist_info, 'playlist': playlist, 'retries': retries,
+						'segments': segments, 'formats': None, 'manifest': manifest or None, 'single_pass': single_pass,
+						'header': None, 'progress': progress or None, 'phase': None, 'meter': None, 'fsync': fsync,
+						'format_selector': format_selector, 'store': store, 'shared': False, 'connections': None}
 
-		def download_song(self, video_id: str, dest_dir: str, chunk_size: int = 1024*1024,
-											skip_existing = True, skip_metadata_existing = False, keep_incomplete = False, title_only_filename = False,
-											song_info = None, album_info = None, artist_info = None, playlist = None):
-				''' download song with given video_id to dest_dir, in chunks of chunk_size, naming and tagging the downloaded
-				file with metadata from album_info, artist_info, song_info, playlist, if supplied. the flag keep_incomplete
-				will prevent the removal of partially downloaded files when an exception occurs which interrupts a download.
-				when the title_only_filename flag is false, the downloaded files will be named using the following template:
-				
-				  '<Artist> - <Album> - <Song> [<videoId>].mp4'
+		def _progress(self, job, phase = None, status = None, error = None):
+				''' report a ProgressEvent to the progress callback of the job, if it has one: the start of a phase, or with
+				the status, the end of the download in the phase it reached. the bytes of the transfer are taken from its
+				TransferMeter, if it got that far. '''
+				if phase != None:
+					job['phase'] = phase
+				if job['progress'] == None:
+					return
+				event = ProgressEvent(job['videoId'], job['phase'] or 'resolve', status, path=job.get('path'), error=error)
+				meter = job['meter']
+				if meter != None:
+					event.bytes_done, event.bytes_total, event.average_rate = meter.bytes_done, meter.bytes_total, meter.average_rate
+				job['progress'](event)
 
-				this makes sense if you are downloading a playlist or compilation maybe, or your likes or history and the 
-				files mostly have unique or varying artist and album values. when the title_only_filename flag is true, 
-				however, then the album and artist parts are omitted, so the files will be named like:
-				
-					'<Song> [<videoId>].mp4'
+		def _tag_hash(self, job):
+				''' hash of the tags a song is tagged with, the text tags from mp4_tags() and the url of the cover, which is
+				recorded in the manifest to tell whether the tags of a downloaded file would change. other fields of the
+				metadata, like the likeStatus or the feedbackTokens of a playlist track, do not change it. '''
+				cover = self._cover_thumbnail(job['song_info'], job['album_info'])
+				metadata = [self._text_tags(job['song_info'], job['artist_info'], job['album_info'], job['playlist']),
+							cover['url'] if cover != None else None]
+				return hashlib.sha1(json.dumps(metadata, sort_keys=True, default=str).encode()).hexdigest()
 
-				which is more appropriate when called from i.e. the download_artist_albums() method, which creates subdirs for
-				the artist and each album within that to download the tracks from each album into.'''
-				
-				song = self.get_song(video_id)
-				if song_info == None:
-					song_info = song
+		def _skip_recorded(self, job):
+				''' before any download stage: check the manifest for a finished download of the song, without a single
+				request. the song is skipped if its file is still there and either skip_metadata_existing is set or the file
+				was tagged with the same metadata already, which can only be known if song_info was given. the path of the
+				file is put in the job. '''
+				if job['manifest'] == None or not job['skip_existing']:
+					return False
+				entry = job['manifest'].get(job['videoId'])
+				if entry == None:
+					return False
+				if not job['skip_metadata_existing'] and (job['song_info'] == None or entry['tags'] != self._tag_hash(job)):
+					return False
+				job['path'] = entry['path']
+				return True
+
+		def _record_download(self, job, tagged):
+				''' last download stage: record the file in the manifest, with the hash of its tags if they were written. an
+				existing file that was skipped without tagging keeps the entry it has. a file shared with other downloads is
+				not tagged for this one, so its tags are not known. '''
+				if job['manifest'] != None and (tagged or job['manifest'].get(job['videoId']) == None):
+					tags = self._tag_hash(job) if tagged and not job['shared'] else None
+					job['manifest'].add(job['videoId'], job['path'], job['format']['itag'], tags)
+
+		def _resolve_song(self, job):
+				''' first download stage: fetch the song metadata along with the decrypted formats and choose the file name,
+				without extension. both are kept in the stream_cache until shortly before the stream urls expire, so a retry
+				or another download of the song does not fetch them again. a song_info with the title, artists and album of
+				the song, like the tracks of get_playlist() and get_album(), has all that naming and tagging need, so then
+				the player response is not waited for here, only for the formats in _resolve_stream(). '''
+				self._progress(job, 'resolve')
+				if self._has_song_metadata(job['song_info']):
+					song = job['song_info']
+				else:
+					song, job['formats'] = self.stream_cache.get(job['videoId'], self.get_song_decrypted)
+					# get_song() returns the player response, the metadata we want is in videoDetails
+					song = song.get('videoDetails', song)
+					if job['song_info'] == None:
+						job['song_info'] = song
 
 				artists = None
 				if 'artists' in song.keys():
-						nonemptyuniqueartists = list(set([artist for artist in song['artists'] if len(artist) > 0]))
+						# the artists of playlist and album tracks are dicts with 'name' and 'id' keys
+						artistnames = [artist.get('name') if hasattr(artist, 'keys') else artist for artist in song['artists']]
+						nonemptyuniqueartists = list(dict.fromkeys([artist for artist in artistnames if artist != None and len(artist) > 0]))
 						if len(nonemptyuniqueartists) > 0:
-								artists = ", ".join(list(set(song['artists'])))
+								artists = ", ".join(nonemptyuniqueartists)
+				elif 'author' in song.keys():
+						artists = re.sub(" - Topic$", "", song['author'])
 
 				if 'title' in song.keys():
 						title = song['title']
 				else:
 						title = None
 
-				if title != None and artists != None and not title_only_filename:
-						filename = artists + " - " + title + " [" + song['videoId'] + "]"
+				if title != None and artists != None and not job['title_only_filename']:
+						filename = artists + " - " + title + " [" + job['videoId'] + "]"
 				elif title != None:
-						filename = title + " [" + song['videoId'] + "]"
+						filename = title + " [" + job['videoId'] + "]"
 				else:
-						filename = f"[{song['videoId']}]"
+						filename = f"[{job['videoId']}]"
 
-				# pick from available streams one that is audio-only with the highest average bitrate, hence highest objective quality
-				try:
-					sdata, fmts = self.get_streaming_data_decrypted(song['videoId'])
-					audioonlyformats = [fmt for fmt in fmts if fmt['mimeType'].startswith('audio')]
-					if len(audioonlyformats) > 0:
-						bestfmt = list(sorted([(fmt['averageBitrate'], fmt) for fmt in fmts if fmt['mimeType'].startswith('audio')]))[-1][1]
-					else:
-						bestfmt = list(sorted([(fmt['averageBitrate'], fmt) for fmt in fmts]))[-1][1]
-				except Exception as err:
-					raise RuntimeError("Error selecting suitable streaming format: {err}")
+				job['song'] = song
+				job['filename'] = filename
+
+		def _has_song_metadata(self, song_info):
+				''' whether song_info has the title, artists and album of a song, so it needs no metadata from get_song() '''
+				return song_info != None and all(song_info.get(key) for key in ('title', 'artists', 'album'))
+
+		def _prefetch_song(self, job):
+				''' resolve a queued download ahead of its worker, see Prefetcher: its player response and decrypted formats are
+				put in the stream_cache, where the resolve and decrypt stages find them. a song that will be skipped because
+				it is in the manifest is not resolved. '''
+				# on a copy, the worker may be using the job already
+				if self._skip_recorded(dict(job)):
+					return
+				self.stream_cache.get(job['videoId'], self.get_song_decrypted)
+
+		def _resolve_stream(self, job):
+				''' second download stage: decrypt the stream urls and pick from available streams the one preferred by
+				job['format_selector'], by default one that is audio-only with the highest average bitrate, hence highest
+				objective quality. the file extension is taken from its mime type. the formats are usually decrypted by
+				_resolve_song() already, otherwise they are taken from the stream_cache, where a Prefetcher may have put them,
+				or fetched here. '''
+				if job['formats'] == None:
+					song, job['formats'] = self.stream_cache.get(job['videoId'], self.get_song_decrypted)
+				bestfmt = self._choose_format(job['formats'], job['format_selector'])
 
 				fileext = bestfmt['mimeType'].split("/")[1].split(";")[0] # use sub-type from mimetype as file extension
-				fullfilename = dest_dir + "/" + sanitize(filename) + "." + fileext
+				job['format'] = bestfmt
+				job['path'] = job['dest_dir'] + "/" + sanitize(job['filename']) + "." + fileext
+
+		def _choose_format(self, fmts, format_selector = None):
+				''' the format preferred by format_selector, a FormatSelector, by default the audio-only format with the highest
+				average bitrate, or the format with the highest average bitrate if there is no audio-only one '''
+				if format_selector == None:
+					format_selector = FormatSelector()
+				bestfmt = format_selector.select(fmts)
+				if bestfmt == None:
+					raise RuntimeError(f"Error selecting suitable streaming format: none of the {len(fmts)} formats matches {format_selector}")
+				return bestfmt
+
+		def _transfer_stream(self, job, session = requests):
+				''' third download stage: transfer the chosen stream to the file, using the given requests session. returns
+				False if the file exists and was skipped. the bytes are written to '<file>.part' next to the file, which is
+				renamed once its size matches the contentLength of the format, so an incomplete file is never mistaken for a
+				finished one. an existing .part file is resumed with a range request, and so is a transfer interrupted by a
+				network error, up to job['retries'] times, so a retry only costs the missing bytes. the .part file is kept
+				for the next attempt when the transfer fails, unless keep_incomplete is false, and the exception is passed on
+				to the caller. with job['segments'] > 1 the .part file is fetched by a SegmentedDownload instead, which keeps
+				track of the missing ranges in '<file>.part.ranges'. the progress of the transfer is reported by a
+				TransferMeter in job['meter']. with job['store'], the stream is transferred into the DownloadStore instead, see
+				_transfer_to_store(). '''
+				fullfilename = job['path']
+				if os.path.exists(fullfilename) and job['skip_existing']:
+					# file exists and we shouldn't overwrite it... nor its tags if it is a hard link to the stream in the
+					# DownloadStore, as they are the tags of all its names
+					job['shared'] = job['store'] != None and job['store'].shares(job['videoId'], job['format']['itag'], fullfilename)
+					return False
+				if job['store'] != None:
+					return self._transfer_to_store(job, session)
+				self._transfer_file(job, session)
+				return True
+
+		def _transfer_to_store(self, job, session):
+				''' the transfer stage with a DownloadStore: the stream is only transferred if the store does not have it yet,
+				tagged for this download in a single pass, and the file is linked to it. a hard link to a stream that was in
+				the store already shares its tags, so it is not tagged again, see job['shared']. '''
+				store = job['store']
+				fullfilename = job['path']
+				fileext = os.path.splitext(fullfilename)[1]
+				with store.lock(job['videoId'], job['format']['itag']):
+					storedfilename = store.path(job['videoId'], job['format']['itag'], fileext)
+					fetched = not os.path.exists(storedfilename)
+					if fetched:
+						os.makedirs(os.path.dirname(storedfilename), exist_ok=True)
+						job['path'] = storedfilename
+						try:
+							self._transfer_file(job, session)
+						finally:
+							job['path'] = fullfilename
+					method = store.link(storedfilename, fullfilename)
+				job['shared'] = method == 'hardlink' and not fetched
+				return True
+
+		def _transfer_file(self, job, session):
+				''' transfer the stream to job['path'], see _transfer_stream() '''
+				fullfilename = job['path']
+				partfilename = fullfilename + ".part"
+				totalbytes = int(job['format']['contentLength']) if 'contentLength' in job['format'].keys() else None
+				# a preallocated .part file of a segmented download can only be resumed by another segmented download
+				segmented = totalbytes != None and (job['segments'] > 1 or os.path.exists(partfilename + ".ranges"))
+				if job['progress'] != None:
+					job['meter'] = TransferMeter(job['videoId'], job['progress'], totalbytes, fullfilename)
+				self._progress(job, 'transfer')
+				# while the song is in use, the stream_cache resolves it again before the url expires, and every request
+				# of the transfer takes the url from there, so resuming a long transfer never needs to resolve it itself
+				with self.stream_cache.use(job['videoId']):
+					self._transfer_retries(job, partfilename, totalbytes, segmented, session)
+
+		def _transfer_retries(self, job, partfilename, totalbytes, segmented, session):
+				''' transfer the .part file and rename it, resuming it after a network error '''
+				fullfilename = job['path']
+				complete = False
+				try:
+						attempt = 0
+						while True:
+								try:
+										if segmented:
+												self._transfer_segments(job, partfilename, totalbytes, session)
+										elif job['connections'] != None:
+												with job['connections']:
+														self._transfer_part(job, partfilename, totalbytes, session)
+										else:
+												self._transfer_part(job, partfilename, totalbytes, session)
+										break
+								except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+										attempt = attempt + 1
+										if attempt > job['retries']:
+												raise
+						wrotebytes = os.path.getsize(partfilename)
+						if job['header'] != None:
+								# the tags in the header
+								wrotebytes = wrotebytes - job['header']['file'] + job['header']['stream']
+						if totalbytes != None and wrotebytes != totalbytes:
+								raise RuntimeError(f"Downloaded {wrotebytes} bytes of videoId {repr(job['videoId'])}, expected {totalbytes} bytes")
+						os.replace(partfilename, fullfilename)
+						if os.path.exists(partfilename + ".header"):
+								os.remove(partfilename + ".header")
+						complete = True
+						if job['meter'] != None:
+								job['meter'].update(wrotebytes, force=True)
+				finally:
+						if not complete and not job['keep_incomplete'] and os.path.exists(partfilename):
+								os.remove(partfilename)
+								for sidecarfilename in (partfilename + ".ranges", partfilename + ".header"):
+										if os.path.exists(sidecarfilename):
+												os.remove(sidecarfilename)
+
+		def _stream_url(self, job):
+				''' url of the chosen format, the one in the stream_cache is refreshed before it expires '''
+				url = self.stream_cache.get_url(job['videoId'], job['format']['itag'])
+				return url if url != None else job['format']['url']
 
-				if os.path.exists(fullfilename) and skip_existing:
-					# file exists and we shouldn't overwrite it...
-					print(f"Skipping download, file exists: {repr(fullfilename)}")
-					if skip_metadata_existing:
+		def _transfer_part(self, job, partfilename, totalbytes, session):
+				''' append the bytes missing from partfilename, requesting only those with a range request if it exists. when
+				the file is written from the start and job['single_pass'] is set, the tags are written into the header of the
+				stream on the way, see _tag_stream_header(). the file offset of a resumed transfer is then ahead of the stream
+				offset by the bytes the tags added to the header, which are read from '<file>.part.header'. the space for the
+				missing bytes is reserved before they are written, and they are read into a buffer that is reused for every
+				chunk, in chunks of job['chunk_size'], or of a size adapted to the throughput if it is None. '''
+				offset = os.path.getsize(partfilename) if os.path.exists(partfilename) else 0
+				streamoffset = offset
+				headerfilename = partfilename + ".header"
+				if offset > 0 and os.path.exists(headerfilename):
+						with open(headerfilename) as fheader:
+								job['header'] = json.load(fheader)
+						if offset >= job['header']['file']:
+								streamoffset = offset - job['header']['file'] + job['header']['stream']
+						else:
+								# the tagged header was not written completely
+								offset = streamoffset = 0
+				if totalbytes != None and streamoffset > totalbytes:
+						# more bytes than the stream has, this is not a part of it
+						offset = streamoffset = 0
+				elif totalbytes != None and streamoffset == totalbytes:
+						return
+				headers = dict(self.headers)
+				if streamoffset > 0:
+						headers['Range'] = f"bytes={streamoffset}-"
+				response = session.get(self._stream_url(job), stream=True, headers=headers, proxies=self.proxies)
+				try:
+						response.raise_for_status()
+						if response.status_code != 206:
+								# the server ignored the range and sends the whole stream
+								offset = streamoffset = 0
+						if offset == 0:
+								job['header'] = None
+								if os.path.exists(headerfilename):
+										os.remove(headerfilename)
+						meter = job['meter']
+						if meter != None:
+								meter.update(streamoffset, force=True)
+						with open(partfilename, "r+b" if offset > 0 else "wb") as fout:
+								fout.seek(offset)
+								fout.truncate()
+								wrotebytes = offset
+								writer = PreallocatedWriter(fout, totalbytes - streamoffset if totalbytes != None else None, job['fsync'])
+								chunks = iter_chunks(response, job['chunk_size'])
+								if offset == 0 and job['single_pass'] and job['format']['mimeType'].split(';')[0] in ('audio/mp4', 'video/mp4'):
+										chunks = self._tag_stream_header(job, headerfilename, chunks)
+								for chunk in chunks:
+										writer.write(chunk)
+										wrotebytes = wrotebytes + len(chunk)
+										if meter != None:
+												# the meter counts the bytes of the stream, without those the tags added to its header
+												meter.update(wrotebytes - job['header']['file'] + job['header']['stream'] if job['header'] != None else wrotebytes)
+								writer.finish()
+				finally:
+						response.close()
+
+		def _tag_stream_header(self, job, headerfilename, chunks):
+				''' pass the chunks of an MP4 stream on, with the tags from mp4_tags() written to the header of the stream on the
+				way, so the file does not have to be rewritten to tag it after the download. some room is left after the tags,
+				so changing them later does not move the stream either. the length of the header in the stream and in the
+				file is stored in headerfilename. a stream whose header can not grow without breaking the rest of it is passed
+				on unchanged, and tagged after the download. '''
+				buffered = b''
+				headerlength = None
+				for chunk in chunks:
+						buffered = buffered + chunk
+						headerlength = find_header(buffered)
+						if headerlength != None:
+								break
+				if headerlength:
+						header = tag_header(buffered[:headerlength],
+																self.mp4_tags(job['song_info'], job['artist_info'], job['album_info'], job['playlist']))
+						job['header'] = {'stream': headerlength, 'file': len(header)}
+						with open(headerfilename, "w") as fheader:
+								json.dump(job['header'], fheader)
+						yield header
+						buffered = buffered[headerlength:]
+				yield buffered
+				yield from chunks
+
+		def _transfer_segments(self, job, partfilename, totalbytes, session):
+				''' fetch the missing byte ranges of partfilename over job['segments'] parallel connections, each of them
+				holding job['connections'], the host limit of a DownloadManager, while it is open '''
+				meter = job['meter']
+				download = SegmentedDownload(lambda: self._stream_url(job), partfilename, totalbytes, job['segments'], session=session,
+																		 headers=self.headers, proxies=self.proxies, chunk_size=min(job['chunk_size'], 256*1024) if job['chunk_size'] != None else None,
+																		 retries=job['retries'], fsync=job['fsync'], limit=job['connections'], callback=(lambda wrotebytes, totalbytes: meter.update(wrotebytes)) if meter != None else None)
+				download.run()
+
+		def _tag_download(self, job):
+				''' last download stage: write the tags to the downloaded file, unless they were written during the transfer '''
+				self._progress(job, 'tag')
+				if job['header'] != None or job['shared']:
+						return
+				self.add_tags(job['path'], job['song_info'], job['artist_info'], job['album_info'], job['playlist'])
+
+		def download_song(self, video_id: str, dest_dir: str, chunk_size: int = None,
+											skip_existing = True, skip_metadata_existing = False, keep_incomplete = True, title_only_filename = False,
+											song_info = None, album_info = None, artist_info = None, playlist = None, retries = 3, segments = 1,
+											manifest = False, single_pass = True, progress = None, fsync = None, format_selector = None,
+											store = None):
+				''' download song with given video_id to dest_dir, naming and tagging the downloaded
+				file with metadata from album_info, artist_info, song_info, playlist, if supplied. the song is downloaded to a
+				'<file>.part' file first, which is renamed when it is complete. a download interrupted by a network error is
+				resumed from where it stopped up to retries times. the flag keep_incomplete keeps the .part file when the download
+				fails anyway, so the next call resumes it, otherwise it is removed. with segments greater than 1, the stream is
+				split into that many byte ranges which are fetched over parallel connections into a preallocated file, see
+				SegmentedDownload, which helps when the throughput of a single connection is capped.
+				the stream is read in chunks of chunk_size bytes, or by default in chunks sized to take about 0.1 seconds each at
+				the measured throughput, see AdaptiveChunkSize. fsync is the policy for syncing the file to disk: None leaves it
+				to the operating system, 'end' syncs it before it is renamed, and a number of bytes syncs it every so many bytes.
+				format_selector is an optional FormatSelector with constraints on the codec, container and bitrate of the format
+				to download, by default the audio-only format with the highest bitrate.
+				store is an optional DownloadStore, or the directory of one, to transfer each stream once into, for songs which
+				are downloaded to several directories: the file in dest_dir is a reflink, hard link or copy of the stream in
+				the store, which is tagged for this download unless it is a hard link shared with an earlier one.
+				with manifest, finished downloads are recorded in a DownloadManifest, which is given by manifest, or if it is
+				True the one in the hidden file '.ytmusicapi-downloads.jsonl' in dest_dir. by default nothing is recorded.
+				with skip_existing, a song recorded there is skipped before a single
+				request is made, as long as its file is unchanged and either skip_metadata_existing is set or it was tagged
+				with the same song_info, album_info, artist_info and playlist.
+				with single_pass, an MP4 stream is tagged while it is downloaded, by writing the tags into its header before the
+				rest of the stream, instead of rewriting the whole file afterwards. this does not apply to segmented downloads.
+				nothing is printed, progress is an optional callback which is passed a ProgressEvent at the start of each phase
+				(resolve, transfer and tag), every 0.1 seconds during the transfer, and with the status at the end, or True to
+				print the progress to the terminal. returns False if the song was skipped.
+				when the title_only_filename flag is false, the downloaded files will be named using the following template:
+				
+				  '<Artist> - <Album> - <Song> [<videoId>].mp4'
+
+				this makes sense if you are downloading a playlist or compilation maybe, or your likes or history and the 
+				files mostly have unique or varying artist and album values. when the title_only_filename flag is true, 
+				however, then the album and artist parts are omitted, so the files will be named like:
+				
+					'<Song> [<videoId>].mp4'
+
+				which is more appropriate when called from i.e. the download_artist_albums() method, which creates subdirs for
+				the artist and each album within that to download the tracks from each album into.'''
+
+				job = self._download_job(video_id, dest_dir, chunk_size, skip_existing, skip_metadata_existing,
+										 keep_incomplete, title_only_filename, song_info, album_info, artist_info, playlist, retries,
+										 segments, manifest, single_pass, progress, fsync, format_selector, store)
+				try:
+					if self._skip_recorded(job):
+						self._progress(job, status='skipped')
 						return False
+					self._resolve_song(job)
+					self._resolve_stream(job)
+					transferred = self._transfer_stream(job)
+					if transferred or not skip_metadata_existing:
+						self._tag_download(job)
+					self._record_download(job, transferred or not skip_metadata_existing)
+				except Exception as err:
+					self._progress(job, status='failed', error=err)
+					raise
+				self._progress(job, status='downloaded' if transferred else 'skipped')
+				if not transferred:
+					return False
+
+
+		def get_stream_format(self, videoId: str, format_selector: FormatSelector = None) -> dict:
+				''' the format of the song which download_song() and stream_song() choose with the given FormatSelector, with its
+				decrypted 'url', its 'mimeType' and its size in 'contentLength', see expected_bytes() to budget a download
+				before it starts. it is resolved through the stream_cache, so a song that is being downloaded or streamed is not
+				resolved again. '''
+				song, formats = self.stream_cache.get(videoId, self.get_song_decrypted)
+				return self._choose_format(formats, format_selector)
+
+		def stream_song(self, videoId: str, sink = None, start: int = 0, end: int = None, chunk_size: int = None,
+										tee: str = None, retries = 3, session = requests, format_selector: FormatSelector = None):
+				''' stream the song with the given videoId from byte start up to byte end, exclusive, or the end of the stream,
+				without writing it to disk. returns a generator of bytes objects if sink is None, otherwise writes them to sink,
+				anything with a write() method, and returns the number of bytes written, see stream_song_async() for asyncio.
+				the stream is the format chosen by get_stream_format(), fetched with a range request from start, so a player
+				can seek in it, and resumed where it stopped after a network error or an expired url, up to retries times. it is
+				read in chunks of chunk_size bytes, or of a size adapted to the throughput, up to 1 MiB, if that is None.
+				with tee, the path of a file, the bytes are also appended to '<tee>.part', which is renamed to tee once it has
+				the whole stream, so a song played from the start is cached on the way, see TeeFile. only bytes that continue
+				the .part file are written to it, and the file is not tagged, see add_tags(). format_selector is passed to
+				get_stream_format(). '''
+				if sink == None:
+					# the generator may be resumed on any thread, it reads into a buffer of its own
+					buffer = bytearray(chunk_size or 1024*1024)
+					return (bytes(chunk) for chunk in self._stream_chunks(videoId, start, end, chunk_size, tee, retries, session, format_selector, buffer))
+				written = 0
+				for chunk in self._stream_chunks(videoId, start, end, chunk_size, tee, retries, session, format_selector):
+					sink.write(chunk)
+					written = written + len(chunk)
+				return written
+
+		async def stream_song_async(self, videoId: str, sink, start: int = 0, end: int = None, chunk_size: int = None,
+																tee: str = None, retries = 3, format_selector: FormatSelector = None):
+				''' stream_song() to an asyncio sink: the stream is read on the default executor of the running loop, and each
+				chunk is passed to sink.write(), which is awaited if it returns an awaitable, followed by sink.drain() if the
+				sink has it, like an asyncio.StreamWriter. returns the number of bytes written. '''
+				loop = asyncio.get_running_loop()
+				chunks = self.stream_song(videoId, None, start, end, chunk_size, tee, retries, format_selector=format_selector)
+				written = 0
+				try:
+					while True:
+						chunk = await loop.run_in_executor(None, next, chunks, None)
+						if chunk == None:
+							break
+						result = sink.write(chunk)
+						if inspect.isawaitable(result):
+							await result
+						if hasattr(sink, 'drain'):
+							await sink.drain()
+						written = written + len(chunk)
+				finally:
+					await loop.run_in_executor(None, chunks.close)
+				return written
+
+		def probe_song(self, videoId: str, format_selector: FormatSelector = None, retries = 3, session = requests) -> dict:
+				''' the exact properties of the stream of a song from its header, the init segment and the sidx index at the
+				initRange and indexRange of its format, which are fetched with a single range request of a few KB instead of
+				the whole stream. returns a dict with the 'videoId', 'itag', 'mimeType', 'codec', i.e. 'mp4a.40.2',
+				'sampleRate' and 'channels', the exact 'duration' in seconds, the average 'bitrate' of the media in bits per
+				second and the 'declaredBitrate' of its decoder configuration, the 'contentLength', the 'initRange' and
+				'indexRange' as (start, end) byte offsets with an exclusive end, and the 'segments' of the index, each with
+				its 'start' and exclusive 'end' offsets, its 'time' and its 'duration' in seconds, plus 'bytesFetched'.
+				only MP4 streams have an index that is parsed, so the format is chosen among the mp4 formats unless a
+				format_selector is given, which must select one with an initRange and an indexRange. '''
+				return self._probe(videoId, format_selector, retries, session)[0]
+
+		def _probe(self, videoId, format_selector, retries, session):
+				''' probe_song() and the bytes of the header it fetched '''
+				if format_selector == None:
+					format_selector = FormatSelector(container='mp4')
+				fmt = self.get_stream_format(videoId, format_selector)
+				if not ('initRange' in fmt.keys() and 'indexRange' in fmt.keys()):
+					raise Exception(f"The format {fmt['itag']} of videoId {repr(videoId)} has no index to probe")
+				init_start, init_end = int(fmt['initRange']['start']), int(fmt['initRange']['end']) + 1
+				index_start, index_end = int(fmt['indexRange']['start']), int(fmt['indexRange']['end']) + 1
+				if init_start != 0 or index_start < init_end:
+					raise Exception(f"The header of videoId {repr(videoId)} is not an init segment followed by its index")
+				header = b''.join(self.stream_song(videoId, start=0, end=index_end, retries=retries, session=session,
+																					 format_selector=format_selector))
+				if len(header) < index_end:
+					raise Exception(f"The header of videoId {repr(videoId)} is short, got {len(header)} of {index_end} bytes")
+				init = parse_init(header[:init_end])
+				index = parse_sidx(header[index_start:index_end], index_start)
+				segments = index['segments']
+				if init['duration'] and init['timescale']:
+					duration = init['duration'] / init['timescale']
 				else:
-					# file does not exist... download it
-					print(f"Downloading videoId {repr(song['videoId'])} to file {repr(fullfilename)}...")
-					response = requests.get(bestfmt['url'], stream=True, headers=self.headers, proxies=self.proxies)
-					if 'content-length' in [k.lower() for k in response.headers.keys()]:
-						totalbytes = int([val for key,val in response.headers.items() if key.lower() == 'content-length'][0])
-					started = False
-					wrotebytes = 0
-					complete = False
-					try:
-							with open(fullfilename, "wb") as fout:
-									started = True
-									for chunk in response.iter_content(chunk_size=chunk_size):
-											fout.write(chunk)
-											wrotebytes = wrotebytes + len(chunk)
-											print(f"Downloaded {wrotebytes//1024} kbytes...{clear_eol}\r", end="")
-											sys.stdout.flush()
-									complete = True
-									print(f"Downloaded {wrotebytes//1024} kbytes total.{clear_eol}\n")
-									sys.stdout.flush()
-					finally:
-							if started and not complete:
-									if not keep_incomplete:
-											print(f"Cleaning up partially downloaded file {repr(fullfilename)}...")
-											os.remove(fullfilename)
-									return False
-				#print(f"Adding tags to downloaded file {repr(fullfilename)}...")
-				self.add_tags(fullfilename, song_info, artist_info, album_info, playlist)
+					duration = sum(segment['duration'] for segment in segments)
+				media_bytes = segments[-1]['end'] - segments[0]['start'] if len(segments) > 0 else 0
+				kind, container, codecs = parse_mime_type(fmt['mimeType'])
+				info = {
+					'videoId': videoId,
+					'itag': fmt['itag'],
+					'mimeType': fmt['mimeType'],
+					'codec': codecs[0] if len(codecs) > 0 else init['codec'],
+					'sampleRate': init['sampleRate'],
+					'channels': init['channels'],
+					'duration': duration,
+					'bitrate': round(media_bytes * 8 / duration) if duration > 0 else None,
+					'declaredBitrate': init['avgBitrate'] or init['maxBitrate'],
+					'contentLength': int(fmt['contentLength']) if 'contentLength' in fmt.keys() else None,
+					'initRange': (init_start, init_end),
+					'indexRange': (index_start, index_end),
+					'segments': segments,
+					'bytesFetched': len(header)
+				}
+				return info, header
 
+		def preview_song(self, videoId: str, seconds: float = 30, sink = None, format_selector: FormatSelector = None,
+										 retries = 3, session = requests):
+				''' the start of a song, at least its first seconds, as a playable stream: the header followed by the segments
+				of the index which cover them, found with probe_song(), so no more than one segment beyond them is fetched.
+				returns the bytes if sink is None, otherwise writes them to sink and returns the number of bytes written.
+				format_selector is passed to probe_song(). '''
+				info, header = self._probe(videoId, format_selector, retries, session)
+				segments = segments_until(info['segments'], seconds)
+				end = segments[-1]['end'] if len(segments) > 0 else len(header)
+				if format_selector == None:
+					format_selector = FormatSelector(container='mp4')
+				rest = self.stream_song(videoId, start=len(header), end=end, retries=retries, session=session,
+																format_selector=format_selector) if end > len(header) else []
+				if sink == None:
+					return header + b''.join(rest)
+				sink.write(header)
+				written = len(header)
+				for chunk in rest:
+					sink.write(chunk)
+					written = written + len(chunk)
+				return written
+
+		def _stream_chunks(self, videoId, start, end, chunk_size, tee, retries, session, format_selector, buffer = None):
+				''' the chunks of the stream from start to end for stream_song(), memoryviews which are only valid until the
+				next one is read '''
+				fmt = self.get_stream_format(videoId, format_selector)
+				size = int(fmt['contentLength']) if 'contentLength' in fmt.keys() else None
+				if size != None and (end == None or end > size):
+					end = size
+				position = start
+				teefile = TeeFile(tee, size) if tee != None else None
+				attempt = 0
+				try:
+					with self.stream_cache.use(videoId):
+						while end == None or position < end:
+							headers = dict(self.headers)
+							headers['Range'] = f"bytes={position}-{end - 1 if end != None else ''}"
+							url = self.stream_cache.get_url(videoId, fmt['itag'])
+							try:
+								with session.get(url if url != None else fmt['url'], stream=True, headers=headers, proxies=self.proxies) as response:
+									if response.status_code == 403 and attempt < retries:
+										# the url expired, resolve the song again
+										attempt = attempt + 1
+										self.stream_cache.invalidate(videoId)
+										fmt = self.get_stream_format(videoId, format_selector)
+										continue
+									response.raise_for_status()
+									if response.status_code != 206 and position > 0:
+										raise RuntimeError(f"The server does not support range requests for videoId {repr(videoId)}")
+									for chunk in iter_chunks(response, chunk_size or AdaptiveChunkSize(maximum=1024*1024), buffer):
+										if end != None and position + len(chunk) > end:
+											# a server that ignored the range sends the rest of the stream
+											chunk = chunk[:end - position]
+										if teefile != None:
+											teefile.write(position, chunk)
+										position = position + len(chunk)
+										yield chunk
+										if position == end:
+											break
+								if end == None:
+									break
+							except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+								attempt = attempt + 1
+								if attempt > retries:
+									raise
+				finally:
+					if teefile != None:
+						teefile.close()
 
 		def download_playlist(self, playlist, dest_dir = "~/Music",
 													#limit_duration = 25*60, no_uploaded = True,
 													skip_existing = True, skip_metadata_existing = False, title_only_filename = False,
-													artist_info = None, album_info = None):
+													artist_info = None, album_info = None, concurrency = 1, progress = None, prefetch = 8,
+													store = None, manifest = True):
 				dest_dir = os.path.expanduser(dest_dir)
 
 				''' playlist may be specified in a few ways:
@@ -208,6 +728,22 @@ class DownloadMixin:
 
 					skip_existing and skip_metadata_existing are passed to download_song(), along with artist_info and album_info,
 					which are needed to write tag metadata once the download is complete.
+
+					concurrency is the number of songs resolved and transferred at the same time by a DownloadManager, the
+					other songs are queued. a song that fails to download does not stop the others. returns the list of
+					results from DownloadManager.wait(), items without a videoId, i.e. unavailable tracks, are left out. the
+					player responses of the next prefetch songs are resolved ahead of the transfers, concurrency at a time, see
+					Prefetcher, and the tracks of a playlist or album come with the metadata for naming and tagging them, so no
+					song waits for its metadata once the first one is transferred. store is passed to download_song(), so
+					playlists sharing songs download them once.
+
+					finished downloads are recorded in a DownloadManifest, by default in the hidden file
+					'.ytmusicapi-downloads.jsonl' in dest_dir, so the songs of a playlist downloaded before are skipped without
+					a request. manifest is passed to download_song(), False records nothing.
+
+					progress is passed the ProgressEvents of all songs, as in download_song(), a ProgressAggregator
+					adds them up. with progress True, the totals are printed to the terminal, followed by the items without
+					a videoId, each failed song and a summary. nothing is printed otherwise.
 				'''
 
 				playlist_items = playlist
@@ -221,137 +757,233 @@ class DownloadMixin:
 					# has a key 'tracks', assume it is a playlist data structure as returned by get_playlist()
 					playlist_items = playlist_items['tracks']
 
-				def parseDuration(s):
-						fields = s.split(":")
-						if len(fields) < 2:
-								return int(fields[0])
-						elif len(fields) < 3:
-								return int(fields[0]) + int(fields[1]) * 60
-						else:
-								return int(fields[-3])*60*60 + int(fields[-2])*60 + int(fields[-1])
+				with DownloadManager(self, concurrency, progress=self._batch_progress(progress), prefetch=prefetch) as manager:
+					missing = self._submit_playlist(manager, playlist_items, dest_dir,
+						skip_existing=skip_existing, skip_metadata_existing=skip_metadata_existing, title_only_filename=title_only_filename,
+						album_info = album_info, artist_info = artist_info, store = store, manifest = manifest)
+					results = manager.wait()
+				if progress == True:
+					for listindex in missing:
+						print(f"\x1b[KPlaylist item at index {listindex}/{len(playlist_items)} does not have a videoId!")
+					self._report_downloads(results)
+				return results
+
+		def _batch_progress(self, progress):
+				''' the progress callback for a batch of downloads, which prints their totals if progress is True '''
+				return ProgressAggregator(print_totals) if progress == True else progress
 
+		def _submit_playlist(self, manager, playlist_items, dest_dir, **options):
+				''' queue every item of playlist_items with a videoId for download with the given DownloadManager. returns the
+				indexes of the items without a videoId, which are left out. '''
+				missing = []
 				for listindex, listitem in enumerate(list(playlist_items)):
+						if isinstance(listitem, str):
+								listitem = {'videoId': listitem}
 						if (not 'videoId' in listitem.keys()) or (listitem['videoId'] == None):
-								print(f"!!! Playlist item at index {listindex}/{len(playlist_items)} does not have a videoId!")
 								#raise KeyError("item in playlist_items does not have a videoId!")
+								missing.append(listindex)
 								continue
-						
-						#if not skip_existing or not skip_metadata_existing or (not check_video_id(listitem['videoId'], dest_dir)) and ((not 'duration' in listitem.keys()) or (parseDuration(listitem['duration']) < 25*60)):
-						try:
-								self.download_song(listitem['videoId'], dest_dir,
-									skip_existing=skip_existing, skip_metadata_existing=skip_metadata_existing, title_only_filename=title_only_filename,
-									song_info = listitem, album_info = album_info, artist_info = artist_info, playlist = playlist_items)
-						except Exception as err:
-								print(f"\nException caught while trying to download videoId {listitem['videoId']}:\n\t-> {err}\n")
-								import traceback
-								traceback.print_exc()
-						#else:
-						#		print(f"Skipping videoId {listitem['videoId']} at playlist index {listindex}/{len(playlist_items)} because the file already exists!")
+						manager.submit(listitem['videoId'], dest_dir, song_info = listitem if len(listitem) > 1 else None,
+								playlist = playlist_items, **options)
+				return missing
+
+		def _report_downloads(self, results):
+				''' print a line for each failed download and a summary of the results returned by DownloadManager.wait() '''
+				for result in results:
+						if result['status'] == 'failed':
+								print(f"\x1b[KException caught while trying to {result['stage']} videoId {result['videoId']}:\n\t-> {result['error']}\n")
+				counts = {status: len([result for result in results if result['status'] == status]) for status in ['downloaded', 'skipped', 'failed']}
+				print(f"\x1b[KDownloaded {counts['downloaded']}, skipped {counts['skipped']}, failed {counts['failed']} of {len(results)} songs.")
+
+
+		def _fetch_thumbnail(self, url):
+				thumbresp = requests.get(url, headers=self.headers, proxies=self.proxies)
+				thumbresp.raise_for_status()
+				return thumbresp.content
 
+		def get_thumbnail(self, thumbnail):
+				''' content of a thumbnail, given as a dict with a 'url' key or a url. it is only fetched if it is not in the
+				thumbnail_cache already. '''
+				url = thumbnail['url'] if hasattr(thumbnail, 'keys') else thumbnail
+				return self.thumbnail_cache.get(url, self._fetch_thumbnail)
 
 		def download_thumbnails(self, thumbnails, destdir=None):
+				''' fetch the thumbnails through the thumbnail_cache and write them to files named thumbnail.<type> or
+				thumbnailN.<type> in destdir, if it is given. returns a list of (name, type, content, image) tuples, the image
+				is opened from the header only, its pixels are not decoded. '''
+				results = []
 				for thumbindex, thumbnail in enumerate(thumbnails):
-						print(f"Downloading thumbnail {thumbindex}/{len(thumbnails)}...{clear_eol}\r", end="")
-						sys.stdout.flush()
-						thumbresp = requests.get(thumbnail['url'], headers=self.headers)
-						thumbtype = thumbresp.headers['Content-Type'].split('/')[1].split(';')[0]
+						content = self.get_thumbnail(thumbnail)
+						im = Image.open(BytesIO(content))
+						thumbtype = im.format.lower()
 						if len(thumbnails) == 1:
 								thumbname = f"thumbnail.{thumbtype}"
 						else:
 								thumbname = f"thumbnail{thumbindex+1}.{thumbtype}"
-						if destdir == None:
-							with BytesIO(thumbresp.content) as fin:
-								im = Image.open(fin)
-								im.load()
-								print(f"{clear_eol}\r", end="")
-								sys.stdout.flush()
-								yield (thumbname, thumbtype, thumbresp.content, im)
 						if not (destdir == None):
 							with open(os.path.join(destdir, thumbname), "wb") as fout:
-								print(f"Writing {len(thumbresp.content)/1024:.1f}kB thumbnail to {repr(thumbname)}...{clear_eol}\r", end="")
-								sys.stdout.flush()
-								fout.write(thumbresp.content)
-								print(f"{clear_eol}\r", end="")
-								sys.stdout.flush()
+								fout.write(content)
+						results.append((thumbname, thumbtype, content, im))
+				return results
+
+		def mp4_tags(self, song, artist=None, album=None, playlist=None, cover_size=None):
+				''' the tags for song, artist, album and playlist as a dict from MP4 atom name to value, as written by add_tags().
+				the cover art is the largest thumbnail of the album, or of the song if there is no album, by the width and height
+				given with the thumbnails, so the tracks of an album share one cover which is fetched once through the
+				thumbnail_cache. cover_size is an optional (width, height) to request the cover at instead. '''
+				from mutagen.mp4 import MP4Cover
+				tags = {}
+
+				# download the cover...
+				cover = self._cover_thumbnail(song, album)
+				if cover != None:
+					coverurl = cover['url'] if cover_size == None else thumbnail_url(cover['url'], *cover_size)
+					traw = self.get_thumbnail(coverurl)
+					tformat, twidth, theight = image_info(traw)
+					if tformat in ("JPEG", "PNG"):
+						tags["covr"] = [MP4Cover(traw, imageformat=MP4Cover.FORMAT_JPEG if tformat == "JPEG" else MP4Cover.FORMAT_PNG)]
+
+				tags.update(self._text_tags(song, artist, album, playlist))
+				return tags
+
+		def _cover_thumbnail(self, song, album):
+				''' the thumbnail the cover art of mp4_tags() is fetched from '''
+				thumbs = []
+				if album != None and album.get('thumbnails'):
+					thumbs = album['thumbnails']
+				elif 'thumbnail' in song.keys():
+					thumbs = song['thumbnail']
+				elif 'thumbnails' in song.keys():
+					thumbs = song['thumbnails']
+				if hasattr(thumbs, 'keys') and 'thumbnails' in thumbs.keys():
+					thumbs = thumbs['thumbnails']
+				return largest_thumbnail(thumbs)
+
+		def _text_tags(self, song, artist, album, playlist):
+				''' the tags of mp4_tags() besides the cover art, which need no request '''
+				tags = {}
 
-		def add_tags(self, filename, song=None, artist=None, album=None, playlist=None):
+				# set track info...
+				tagartist = None
+				if not (artist == None):
+					tagartist = artist
+				tagalbum = None
+				tagalbumartist = None
+				tagalbumtotal = None
+				if not (album == None):
+					if 'artists' in album.keys():
+						tagalbumartist = album['artists']
+					tagalbum = album['title']
+					if 'tracks' in album['tracks']:
+						tagalbumtotal = len(album['tracks'])
+				if not (playlist == None) and tagalbumtotal == None:
+					tagalbumtotal = len(playlist['tracks']) if hasattr(playlist, 'keys') and 'tracks' in playlist.keys() else len(playlist)
+				tagsong = song.get('title')
+				tagindex = None
+				if tagartist == None and 'artists' in song.keys():
+					tagartist = song['artists']
+				if tagalbum == None and 'album' in song.keys():
+					tagalbum = song['album']
+				if 'index' in song.keys():
+					tagindex = song['index']
+
+				# fix for uploaded track artist, comes back as a dict with 'privately_owned' key and 'name' key, which is what we want.
+				# the same goes for the artists and album of playlist and album tracks, which are dicts with 'name' and 'id' keys
+				def tagname(val):
+					if val != None and hasattr(val, 'keys'):
+						return val['name'] if 'name' in val.keys() else None
+					if isseq(val):
+						return [name for name in map(tagname, val) if name != None]
+					return val
+				tagartist = tagname(tagartist)
+				tagalbum = tagname(tagalbum)
+				tagalbumartist = tagname(tagalbumartist)
+
+				def maybetag(tag, val):
+					if not(val == None):
+						tags[tag] = [str(val)] if not isseq(val) else val
+
+				maybetag('\xa9nam', tagsong)
+				maybetag('\xa9ART', tagartist)
+				maybetag('\xa9alb', tagalbum)
+				maybetag('aART', tagalbumartist)
+				if tagindex != None or tagalbumtotal != None:
+					tags['trkn'] = [(int(tagindex or 0), int(tagalbumtotal or 0))]
+				return tags
+
+		def add_tags(self, filename, song=None, artist=None, album=None, playlist=None, cover_size=None):
+				''' write the tags from mp4_tags() to the file, if they differ from its current tags. room for them is reserved
+				when a download is tagged in a single pass, then they are updated in place, otherwise mutagen has to move the
+				whole stream to make room. returns 'unchanged', 'updated' or 'rewritten', see retag_file(). '''
 				if song != None:
-						from mutagen.mp4 import MP4, MP4Cover
-						video = MP4(filename)
-
-						print(f"Adding metadata to file {repr(filename)}...{clear_eol}\r", end="")
-						sys.stdout.flush()
-
-						# download thumbnails...
-						thumbs = []
-						if song != None and 'thumbnail' in song.keys():
-							thumbs = song['thumbnail']
-						elif song != None and 'thumbnails' in song.keys():
-							thumbs = song['thumbnails']
-						if hasattr(thumbs, 'keys') and 'thumbnails' in thumbs.keys():
-							thumbs = thumbs['thumbnails']
-						if len(thumbs) > 0:
-							coverart = []
-							for tname, ttype, traw, timage in self.download_thumbnails(thumbs, None):
-									if ttype == "jpeg":
-											coverart.append((timage.width * timage.height, traw))
-							video["covr"] = [MP4Cover(traw, imageformat=MP4Cover.FORMAT_JPEG) for pixels, traw in sorted(coverart, key=lambda elem: -elem[0])]
-
-						# set track info...
-						tagartist = None
-						if not (artist == None):
-							tagartist = artist
-						tagalbum = None
-						tagalbumartist = None
-						tagalbumtotal = None
-						if not (album == None):
-							if 'artists' in album.keys():
-								tagalbumartist = album['artists']
-							tagalbum = album['title']
-							if 'tracks' in album['tracks']:
-								tagalbumtotal = len(album['tracks'])
-						if not (playlist == None) and tagalbumtotal == None:
-							tagalbumtotal = len(playlist['tracks']) if hasattr(playlist, 'keys') and 'tracks' in playlist.keys() else len(playlist)
-						tagsong = None
-						tagindex = None
-						if not (song == None):
-							tagsong = song['title']
-							if tagartist == None and 'artists' in song.keys():
-								tagartist = song['artists']
-							if tagalbum == None and 'album' in song.keys():
-								tagalbum = song['album']
-							if 'index' in song.keys():
-								tagindex = song['index']
-
-						# fix for uploaded track artist, comes back as a dict with 'privately_owned' key and 'name' key, which is what we want
-						if tagartist != None and hasattr(tagartist, 'keys') and 'name' in tagartist.keys():
-							tagartist = tagartist['name']
-
-						wrotetags = []
-
-						def maybetag(tag, val):
-							if not(val == None):
-								video[tag] = [str(val)] if not isseq(val) else val
-								wrotetags.append(tag)
-
-						maybetag('artist', tagartist)
-						maybetag('album', tagalbum)
-						maybetag('albumartist', tagalbumartist)
-						maybetag('tracknumber', tagindex)
-						maybetag('tracktotal', tagalbumtotal)
-
-						video.save()
-						print(f"Wrote metadata to file {repr(filename)}: {'/'.join(wrotetags)} tags and {len(coverart)} thumbnails")
-
-
-		def download_artist_albums(self, artistName, musicDir, artistId=None, skip_existing=True, skip_metadata_existing=False):
+						return retag_file(filename, self.mp4_tags(song, artist, album, playlist, cover_size))
+
+		def retag(self, items, workers = 8):
+				''' update the tags of many downloaded files at once, i.e. after the metadata of a library changed. items is a
+				list of dicts with the 'path' of each file and the 'song', and optionally 'artist', 'album' and 'playlist' to
+				tag it with, as passed to add_tags(). the tags are built and written on a pool of workers threads, files whose
+				tags are current already are not written at all, and the others are updated in place where the tags fit in the
+				padding of the file. returns the list of results from Retagger.wait(). '''
+				with Retagger(workers) as retagger:
+						for item in items:
+								retagger.submit(item['path'], lambda item=item: self.mp4_tags(item['song'], item.get('artist'), item.get('album'), item.get('playlist')))
+						results = retagger.wait()
+				return results
+
+		def plan_artist_discography(self, artist, singles = True, workers = 8, on_release = None, bitrate = ESTIMATED_BITRATE):
+				''' plan the download of the releases of an artist, given as a channelId or the result of get_artist(): the
+				albums, and with singles the singles and EPs too. the release pages are fetched workers at a time, and added to
+				a DiscographyPlan in order, the albums first, which plans every song once, on the first release it is on, with
+				the size estimated from its duration at bitrate. on_release is called with each release and its newly planned
+				tracks as soon as it and the releases before it are fetched, so their downloads can start while the other
+				pages are still being fetched. returns the DiscographyPlan, with the total size in expected_bytes. '''
+				if isinstance(artist, str):
+					artist = self.get_artist(artist)
+				plan = DiscographyPlan(artist, bitrate)
+				releases = {}
+				for section in (['albums', 'singles'] if singles else ['albums']):
+					if not section in artist.keys():
+						continue
+					# sometimes the section has no params, in which case the list in the artist page is all there is
+					if artist[section].get('params') != None:
+						items = self.get_artist_albums(artist['channelId'], params = artist[section]['params'])
+					else:
+						items = artist[section]['results']
+					for item in items:
+						if item.get('browseId') == None:
+							continue
+						if section == 'singles' and item.get('type') == None:
+							item = dict(item, type = 'Single')
+						# the lists may overlap, the entry that tells the type of the release is kept
+						if not item['browseId'] in releases.keys() or releases[item['browseId']].get('type') == None:
+							releases[item['browseId']] = item
+				with ThreadPoolExecutor(max(workers, 1)) as pool:
+					for release in pool.map(lambda item: self.get_album(item['browseId']), sorted(releases.values(), key=release_order)):
+						planned = plan.add(release)
+						if on_release != None:
+							on_release(release, planned)
+				return plan
+
+		def download_artist_albums(self, artistName, musicDir, artistId=None, skip_existing=True, skip_metadata_existing=False,
+								   concurrency=1, progress=None, prefetch=8, singles=False, store=None):
 				''' searches for artist by artistName, using the top result, or using the given artistId (browseId in search
 				result artist data) if it is given. create directory in musicDir for artist artistName, and subdirectories for 
 				each album by that artist, then downloads each track of the albums. skip_existing controls whether existing 
 				files are re-downloaded and overwritten or not, and skip_metadata_existing controls whether tags are written to 
 				files even if they exist and were skipped for download due to skip_existing. the thumbnail artwork for the 
 				artist page and for each album cover are also downloaded to jpeg files named thumbnailN.jpeg under those 
-				directories. '''
+				directories. the albums are planned by plan_artist_discography(), with the singles and EPs if singles is set, so
+				a song on several releases is only downloaded once, with the first album it is on. concurrency is the number of
+				songs downloaded at the same time, the tracks of all albums share one DownloadManager, so the first tracks start
+				downloading while the other albums are fetched.
+				the downloads are recorded in the DownloadManifest of the artist directory, the hidden file
+				'.ytmusicapi-downloads.jsonl'. progress is passed the
+				ProgressEvents of the songs, as in download_playlist(), with progress True the directories are printed too.
+				prefetch is the number of songs resolved ahead of the transfers, and store is passed to download_song(), as in
+				download_playlist(). '''
+				def say(message):
+					if progress == True:
+						print(message)
 				
 				# search artist and get first result
 				if artistId != None:
@@ -359,42 +991,49 @@ class DownloadMixin:
 				else:
 					artistBrowseId = self.search(artistName, 'artists')[0]['browseId']
 				artistInfo = self.get_artist(artistBrowseId)
-				print(f"Found artist {repr(artistInfo['name'])}!")
+				say(f"Found artist {repr(artistInfo['name'])}!")
 				# find and/or create a directory for the artist in our music collection
 				artistDir = os.path.join(os.path.expanduser(musicDir), artistInfo['name'])
 				if not os.path.exists(artistDir):
-						print(f"Creating artist directory {repr(artistDir)}...")
+						say(f"Creating artist directory {repr(artistDir)}...")
 						os.mkdir(artistDir)
 				else:
-						print(f"Directory {repr(artistDir)} already exists!")
+						say(f"Directory {repr(artistDir)} already exists!")
 				# grab thumbnail from artist page
-				print(f"Saving thumbnail of artist to {repr(artistDir)}...")
+				say(f"Saving thumbnail of artist to {repr(artistDir)}...")
 				self.download_thumbnails(artistInfo['thumbnails'], artistDir)
-				# sometimes get_artist_album_info does not have a params, in which case use the albums list in artistInfo['albums']['results'] directly
-				if 'params' in artistInfo['albums'].keys() and artistInfo['albums']['params'] != None:
-					albums = self.get_artist_albums(artistInfo['channelId'], params = artistInfo['albums']['params'])
-				else:
-					albums = artistInfo['albums']['results']
-				# loop through albums
-				for albumItem in albums:
-						# query album details
-						albumInfo = self.get_album(albumItem['browseId'])
-						albumName = albumInfo['title']
-						print(f"Downloading album {repr(albumName)}...")
-						# ensure that album directory exists
-						albumDir = os.path.join(artistDir, sanitize(albumName))
-						if not os.path.exists(albumDir):
-								print(f"Creating album directory {repr(albumDir)}...")
-								os.mkdir(albumDir)
-						else:
-								print(f"Directory {repr(albumDir)} already exists!")
-						# grab thumbnail from artist page
-						print(f"Saving thumbnail of album to {repr(albumDir)}...")
-						self.download_thumbnails(albumInfo['thumbnails'], albumDir)
-						# download the tracks
-						self.download_playlist(albumInfo['tracks'], dest_dir=albumDir,
-																		skip_existing=skip_existing, skip_metadata_existing=skip_metadata_existing,
-																		album_info = albumInfo, artist_info=artistInfo, title_only_filename=True)
+				manifest = DownloadManifest.open(artistDir)
+				# the album pages are fetched concurrently, and the tracks of each album are queued as soon as it arrives
+				with DownloadManager(self, concurrency, progress=self._batch_progress(progress), prefetch=prefetch) as manager:
+						def queue_release(albumInfo, planned):
+								if len(planned) == 0:
+										say(f"Skipping {repr(albumInfo['title'])}, its songs are planned with other releases.")
+										return
+								albumName = albumInfo['title']
+								say(f"Downloading album {repr(albumName)}...")
+								# ensure that album directory exists
+								albumDir = os.path.join(artistDir, sanitize(albumName))
+								if not os.path.exists(albumDir):
+										say(f"Creating album directory {repr(albumDir)}...")
+										os.mkdir(albumDir)
+								else:
+										say(f"Directory {repr(albumDir)} already exists!")
+								# grab thumbnail from artist page
+								say(f"Saving thumbnail of album to {repr(albumDir)}...")
+								self.download_thumbnails(albumInfo['thumbnails'], albumDir)
+								# download the tracks, which are numbered in the whole album
+								for entry in planned:
+										manager.submit(entry['videoId'], albumDir, song_info = entry['track'], playlist = albumInfo['tracks'],
+																	 skip_existing=skip_existing, skip_metadata_existing=skip_metadata_existing,
+																	 album_info = albumInfo, artist_info=artistInfo, title_only_filename=True,
+																	 manifest = manifest, store = store)
+						plan = self.plan_artist_discography(artistInfo, singles = singles, on_release = queue_release)
+						summary = plan.summary()
+						say(f"Planned {summary['tracks']} songs of {summary['releases']} releases, about {summary['expectedBytes'] // 1000000} MB, skipped {summary['duplicates']} duplicates.")
+						results = manager.wait()
+				if progress == True:
+					self._report_downloads(results)
+				return results
 
 
 '''
@@ -1,4 +1,3 @@
-import unicodedata
 from typing import List, Dict, Union, Tuple
 from ytmusicapi.helpers import *
 from ytmusicapi.parsers.utils import *
@@ -6,12 +5,15 @@ from ytmusicapi.parsers.playlists import *
 
 
 class PlaylistsMixin:
-    def get_playlist(self, playlistId: str, limit: int = 100) -> Dict:
+    def get_playlist(self, playlistId: str, limit: int = 100, lazy: bool = False) -> Dict:
         """
         Returns a list of playlist items
 
         :param playlistId: Playlist id
         :param limit: How many songs to return. Default: 100
+        :param lazy: Optional. If True, ``tracks`` is a sequence of read-only dict-like items
+            which are only parsed when their fields are accessed. Useful if only a few tracks
+            of a large playlist are needed. Default: False
         :return: Dictionary with information about the playlist.
             The key ``tracks`` contains a List of playlistItem dictionaries
 
@@ -63,55 +65,25 @@ class PlaylistsMixin:
         browseId = "VL" + playlistId if not playlistId.startswith("VL") else playlistId
         body = prepare_browse_endpoint("PLAYLIST", browseId)
         endpoint = 'browse'
-        response = self._send_request(endpoint, body)
-        results = nav(response,
-                      SINGLE_COLUMN_TAB + SECTION_LIST_ITEM + ['musicPlaylistShelfRenderer'])
-        playlist = {'id': results['playlistId']}
-        own_playlist = 'musicEditablePlaylistDetailHeaderRenderer' in response['header']
-        if not own_playlist:
-            header = response['header']['musicDetailHeaderRenderer']
-            playlist['privacy'] = 'PUBLIC'
-        else:
-            header = response['header']['musicEditablePlaylistDetailHeaderRenderer']
-            playlist['privacy'] = header['editHeader']['musicPlaylistEditHeaderRenderer'][
-                'privacy']
-            header = header['header']['musicDetailHeaderRenderer']
-
-        playlist['title'] = nav(header, TITLE_TEXT)
-        playlist['thumbnails'] = nav(header, THUMBNAIL_CROPPED)
-        playlist["description"] = nav(header, DESCRIPTION, True)
-        run_count = len(header['subtitle']['runs'])
-        if run_count > 1:
-            playlist['author'] = {
-                'name': nav(header, SUBTITLE2),
-                'id': nav(header, ['subtitle', 'runs', 2] + NAVIGATION_BROWSE_ID, True)
-            }
-            if run_count > 3:
-                playlist['year'] = nav(header, SUBTITLE3)
-
-        song_count = to_int(
-            unicodedata.normalize("NFKD", header['secondSubtitle']['runs'][0]['text']))
-        if len(header['secondSubtitle']['runs']) > 1:
-            playlist['duration'] = header['secondSubtitle']['runs'][2]['text']
-
-        playlist['trackCount'] = song_count
-        playlist['suggestions_token'] = nav(
-            response, SINGLE_COLUMN_TAB + ['sectionListRenderer', 'contents', 1] + MUSIC_SHELF
-            + RELOAD_CONTINUATION, True)
-
-        playlist['tracks'] = []
-        if song_count > 0:
-            playlist['tracks'].extend(parse_playlist_items(results['contents']))
-            songs_to_get = min(limit, song_count)
-
-            if 'continuations' in results:
-                request_func = lambda additionalParams: self._send_request(
-                    endpoint, body, additionalParams)
-                parse_func = lambda contents: parse_playlist_items(contents)
-                playlist['tracks'].extend(
-                    get_continuations(results, 'musicPlaylistShelfContinuation',
-                                      songs_to_get - len(playlist['tracks']), request_func,
-                                      parse_func))
+        # when offloaded, the response is only decoded by the worker that parses it, and the
+        # lazy tracks are parsed inline since they refer to the decoded response
+        playlist, shelf = self._parse_response('playlists.parse_playlist_response',
+                                               self._send_raw_request(endpoint, body),
+                                               self.language, lazy, inline=lazy)
+        songs_to_get = min(limit, playlist['trackCount'])
+
+        if 'continuations' in shelf:
+
+            def request_func(additionalParams):
+                return self._parse_response('playlists.parse_playlist_continuation',
+                                            self._send_raw_request(endpoint, body,
+                                                                   additionalParams),
+                                            lazy, inline=lazy)
+
+            playlist['tracks'].extend(
+                get_continuations(shelf, 'musicPlaylistShelfContinuation',
+                                  songs_to_get - len(playlist['tracks']), request_func,
+                                  lambda tracks: tracks))
 
         return playlist
 
@@ -177,7 +177,7 @@ class UploadsMixin:
         body = prepare_browse_endpoint("ALBUM", browseId)
         endpoint = 'browse'
         response = self._send_request(endpoint, body)
-        album = parse_album_header(response)
+        album = parse_album_header(response, self.language)
         results = nav(response, SINGLE_COLUMN_TAB + SECTION_LIST_ITEM + MUSIC_SHELF)
         album['tracks'] = parse_uploaded_items(results['contents'])
         return album
@@ -1,171 +1,54 @@
-from typing import List, Dict
+import gettext
+import threading
+import unicodedata
+import pkg_resources
+from typing import List, Dict, Optional
 from .utils import *
 from .songs import *
-from ytmusicapi.helpers import i18n
+from ytmusicapi.helpers import to_int
 
+# digit grouping separator used in display texts, i.e. "1.234 Titel" (after NFKD normalization),
+# for each language in ytmusicapi/locales. Languages added there without an entry here read
+# numbers with the English separator
+THOUSANDS_SEPARATORS = {'de': '.', 'en': ',', 'es': '.', 'fr': ' ', 'it': '.', 'ja': ','}
+DEFAULT_THOUSANDS_SEPARATOR = ','
 
-class Parser:
-    def __init__(self, language):
-        self.lang = language
-
-    @i18n
-    def parse_search_results(self, results, resultType=None, debug=True):
-        search_results = []
-        default_offset = (not resultType) * 2
-        for result in results:
-            data = result['musicResponsiveListItemRenderer']
-            search_result = {}
-            if not resultType:
-                resultType = get_item_text(data, 1).lower()
-                result_types = ['artist', 'playlist', 'song', 'video']
-                result_types_local = [_('artist'), _('playlist'), _('song'), _('video')]
-                # default to album since it's labeled with multiple values ('Single', 'EP', etc.)
-                if resultType not in result_types_local:
-                    resultType = 'album'
-                else:
-                    resultType = result_types[result_types_local.index(resultType)]
-
-            search_result['resultType'] = resultType
-            last_artist_index = default_offset
-            runs = []
-
-            if resultType in ['song', 'video']:
-                search_result['videoId'] = nav(
-                    data, PLAY_BUTTON + ['playNavigationEndpoint', 'watchEndpoint', 'videoId'],
-                    True)
-                search_result['title'] = get_item_text(data, 0)
-
-                runs = get_flex_column_item(data, 1)['text']['runs']
-                # determine the number of artists
-                try:
-                    last_artist_index = next(
-                        len(runs) - i - 1 for i, run in enumerate(reversed(runs))
-                        if 'navigationEndpoint' in run
-                        and nav(run, NAVIGATION_BROWSE_ID).startswith('UC'))
-                except StopIteration:  # if single artist is missing the browseId
-                    pass
-
-                search_result['artists'] = parse_song_artists_runs(
-                    runs[default_offset:last_artist_index + 1])
-
-            if resultType in ['artist', 'album', 'playlist']:
-                search_result['browseId'] = nav(data, NAVIGATION_BROWSE_ID, True)
-                if not search_result['browseId']:
-                    continue
-
-            if resultType in ['artist']:
-                search_result['artist'] = get_item_text(data, 0)
-
-            elif resultType in ['album']:
-                search_result['title'] = get_item_text(data, 0)
-                search_result['type'] = get_item_text(data, 1)
-                search_result['artist'] = get_item_text(data, 1, 2)
-                search_result['year'] = get_item_text(data, 1, 4, True)
-
-            elif resultType in ['playlist']:
-                search_result['title'] = get_item_text(data, 0)
-                search_result['author'] = get_item_text(data, 1, default_offset)
-                search_result['itemCount'] = get_item_text(data, 1,
-                                                            default_offset + 2).split(' ')[0]
-
-            elif resultType in ['song']:
-                search_result['album'] = None
-                if len(runs) - last_artist_index == 5:  # has album
-                    search_result['album'] = {
-                        'name': runs[last_artist_index + 2]['text'],
-                        'id': nav(runs[last_artist_index + 2], NAVIGATION_BROWSE_ID, True)
-                    }
-
-                search_result['duration'] = runs[-1]['text']
-                if 'menu' in data:
-                    toggle_menu = find_object_by_key(nav(data, MENU_ITEMS),
-                                                      'toggleMenuServiceItemRenderer')
-                    if toggle_menu:
-                        search_result['feedbackTokens'] = parse_song_menu_tokens(toggle_menu)
-
-            elif resultType in ['video']:
-                search_result['views'] = get_item_text(data, 1, -3).split(' ')[0]
-                search_result['duration'] = get_item_text(data, 1, -1)
-
-            elif resultType in ['upload']:
-                search_result['title'] = get_item_text(data, 0)
-
-                browse_id = nav(data, NAVIGATION_BROWSE_ID, True)
-                if not browse_id:  # song result
-                    flex_items = [
-                        nav(get_flex_column_item(data, i), ['text', 'runs'], True)
-                        for i in range(2)
-                    ]
-                    if flex_items[0]:
-                        search_result['videoId'] = nav(flex_items[0][0], NAVIGATION_VIDEO_ID)
-                        search_result['playlistId'] = nav(flex_items[0][0], NAVIGATION_PLAYLIST_ID)
-                    if flex_items[1]:
-                        search_result['artist'] = {
-                            'name': flex_items[1][0]['text'],
-                            'id': nav(flex_items[1][0], NAVIGATION_BROWSE_ID)
-                        }
-                        search_result['album'] = {
-                            'name': flex_items[1][2]['text'],
-                            'id': nav(flex_items[1][2], NAVIGATION_BROWSE_ID)
-                        }
-                        search_result['duration'] = flex_items[1][4]['text']
-                    search_result['resultType'] = 'song'
-
-                else:  # artist or album result
-                    search_result['browseId'] = browse_id
-                    if 'artist' in search_result['browseId']:
-                        search_result['resultType'] = 'artist'
-                    else:
-                        flex_item2 = get_flex_column_item(data, 1)
-                        runs = [
-                            run['text'] for i, run in enumerate(flex_item2['text']['runs'])
-                            if i % 2 == 0
-                        ]
-                        search_result['artist'] = runs[1]
-                        if len(runs) > 2:  # date may be missing
-                            search_result['releaseDate'] = runs[2]
-                        search_result['resultType'] = 'album'
-
-            search_result['thumbnails'] = nav(data, THUMBNAILS)
-            search_results.append(search_result)
+_parsers = {}
+_parsers_lock = threading.Lock()
 
-        return search_results
 
-    @i18n
-    def parse_artist_contents(self, results: List) -> Dict:
-        categories = ['albums', 'singles', 'videos', 'playlists']
-        categories_local = [_('albums'), _('singles'), _('videos'), _('playlists')]
-        categories_parser = [parse_album, parse_single, parse_video, parse_playlist]
-        artist = {}
-        #breakpoint()
-        for i, category in enumerate(categories):
-            data = [
-                r['musicCarouselShelfRenderer'] for r in results
-                if 'musicCarouselShelfRenderer' in r
-                and nav(r['musicCarouselShelfRenderer'],
-                        CAROUSEL_TITLE)['text'].lower() == categories_local[i]
-            ]
-            if len(data) > 0:
-                artist[category] = {'browseId': None, 'results': []}
-                if 'navigationEndpoint' in nav(data[0], CAROUSEL_TITLE):
-                    artist[category]['browseId'] = nav(data[0],
-                                                        CAROUSEL_TITLE + NAVIGATION_BROWSE_ID)
-                    if category in ['albums', 'singles', 'playlists']:
-                        print(nav(
-                            data[0],
-                            CAROUSEL_TITLE)['navigationEndpoint']['browseEndpoint'])
-                        artist[category]['params'] = nav(
-                            data[0],
-                            CAROUSEL_TITLE)['navigationEndpoint']['browseEndpoint']['params']
-                    else:
-                      print("no params, category is " + str(category))
-
-                artist[category]['results'] = parse_content_list(data[0]['contents'],
-                                                                  categories_parser[i])
-
-        return artist
+class Parser:
+    """
+    Parses language dependent results. The localized display texts are looked up once
+    on initialization, so parsers for different languages can be used side by side.
+    """
+    def __init__(self, language: str = 'en'):
+        self.language = language
+        self.lang = gettext.translation('base',
+                                        localedir=pkg_resources.resource_filename(
+                                            'ytmusicapi', 'locales'),
+                                        languages=[language])
+        _ = self.lang.gettext
+        self.result_types = {
+            _('artist'): 'artist',
+            _('playlist'): 'playlist',
+            _('song'): 'song',
+            _('video'): 'video',
+            _('station'): 'station'
+        }
+        self.artist_categories = {
+            'albums': _('albums'),
+            'singles': _('singles'),
+            'videos': _('videos'),
+            'playlists': _('playlists'),
+            'related': _('related')
+        }
+        self.thousands_separator = THOUSANDS_SEPARATORS.get(language, DEFAULT_THOUSANDS_SEPARATOR)
+
+    def to_int(self, string):
+        # NFKD maps the (narrow) non-breaking spaces used for grouping to plain spaces
+        return to_int(unicodedata.normalize("NFKD", string), self.thousands_separator)
 
-    @i18n
     def parse_search_results(self, results, resultType=None):
         search_results = []
         default_offset = (not resultType) * 2
@@ -173,18 +56,8 @@ class Parser:
             data = result['musicResponsiveListItemRenderer']
             search_result = {}
             if not resultType:
-                resultType = get_item_text(data, 1).lower()
-                result_types = ['artist', 'playlist', 'song', 'video', 'station']
-                result_types_local = [
-                    _('artist'), _('playlist'),
-                    _('song'), _('video'),
-                    _('station')
-                ]
                 # default to album since it's labeled with multiple values ('Single', 'EP', etc.)
-                if resultType not in result_types_local:
-                    resultType = 'album'
-                else:
-                    resultType = result_types[result_types_local.index(resultType)]
+                resultType = self.result_types.get(get_item_text(data, 1).lower(), 'album')
 
             search_result['resultType'] = resultType
 
@@ -229,7 +102,8 @@ class Parser:
                     ]
                     if flex_items[0]:
                         search_result['videoId'] = nav(flex_items[0][0], NAVIGATION_VIDEO_ID, True)
-                        search_result['playlistId'] = nav(flex_items[0][0], NAVIGATION_PLAYLIST_ID, True)
+                        search_result['playlistId'] = nav(flex_items[0][0], NAVIGATION_PLAYLIST_ID,
+                                                          True)
                     if flex_items[1]:
                         search_result.update(parse_song_runs(flex_items[1]))
                     search_result['resultType'] = 'song'
@@ -278,20 +152,17 @@ class Parser:
 
         return search_results
 
-    @i18n
     def parse_artist_contents(self, results: List) -> Dict:
-        categories = ['albums', 'singles', 'videos', 'playlists', 'related']
-        categories_local = [_('albums'), _('singles'), _('videos'), _('playlists'), _('related')]
         categories_parser = [
             parse_album, parse_single, parse_video, parse_playlist, parse_related_artist
         ]
         artist = {}
-        for i, category in enumerate(categories):
+        for i, (category, category_local) in enumerate(self.artist_categories.items()):
             data = [
                 r['musicCarouselShelfRenderer'] for r in results
                 if 'musicCarouselShelfRenderer' in r
                 and nav(r['musicCarouselShelfRenderer'],
-                        CAROUSEL_TITLE)['text'].lower() == categories_local[i]
+                        CAROUSEL_TITLE)['text'].lower() == category_local
             ]
             if len(data) > 0:
                 artist[category] = {'browseId': None, 'results': []}
@@ -308,6 +179,58 @@ class Parser:
 
         return artist
 
+    def parse_artist_response(self, response) -> Optional[Dict]:
+        """
+        Parse a whole artist ``browse`` response, so that a worker of the :class:`ParseExecutor`
+        can decode and parse it on its own. ``None`` if the channel has no music content.
+        """
+        # the playlist parsers use get_parser of this module
+        from .playlists import parse_playlist_items
+
+        results = nav(response, SINGLE_COLUMN_TAB + SECTION_LIST)
+        if len(results) == 1:
+            # a standard YouTube Channel with no music content
+            return None
+
+        artist = {'description': None, 'views': None}
+        header = response['header']['musicImmersiveHeaderRenderer']
+        artist['name'] = nav(header, TITLE_TEXT)
+        descriptionShelf = find_object_by_key(results,
+                                              'musicDescriptionShelfRenderer',
+                                              is_key=True)
+        if descriptionShelf:
+            artist['description'] = nav(descriptionShelf, DESCRIPTION)
+            artist['views'] = None if 'subheader' not in descriptionShelf else descriptionShelf[
+                'subheader']['runs'][0]['text']
+        subscription_button = header['subscriptionButton']['subscribeButtonRenderer']
+        artist['channelId'] = subscription_button['channelId']
+        artist['shuffleId'] = nav(header,
+                                  ['playButton', 'buttonRenderer'] + NAVIGATION_WATCH_PLAYLIST_ID,
+                                  True)
+        artist['radioId'] = nav(header, ['startRadioButton', 'buttonRenderer']
+                                + NAVIGATION_WATCH_PLAYLIST_ID, True)
+        artist['subscribers'] = nav(subscription_button,
+                                    ['subscriberCountText', 'runs', 0, 'text'], True)
+        artist['subscribed'] = subscription_button['subscribed']
+        artist['thumbnails'] = nav(header, THUMBNAILS, True)
+        artist['songs'] = {'browseId': None}
+        if 'musicShelfRenderer' in results[0]:  # API sometimes does not return songs
+            musicShelf = nav(results[0], MUSIC_SHELF)
+            if 'navigationEndpoint' in nav(musicShelf, TITLE):
+                artist['songs']['browseId'] = nav(musicShelf, TITLE + NAVIGATION_BROWSE_ID)
+            artist['songs']['results'] = parse_playlist_items(musicShelf['contents'])
+
+        artist.update(self.parse_artist_contents(results))
+        return artist
+
+
+def get_parser(language: str = 'en') -> Parser:
+    """Parsers hold no mutable state, so a single instance per language is shared"""
+    with _parsers_lock:
+        if language not in _parsers:
+            _parsers[language] = Parser(language)
+        return _parsers[language]
+
 
 def parse_content_list(results, parse_func):
     contents = []
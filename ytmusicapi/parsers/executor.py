@@ -0,0 +1,159 @@
+import json
+import time
+import threading
+import importlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from .utils import nav
+
+
+def get_parser_function(parser: str, language: str = None):
+    """
+    Resolve a parser name relative to :mod:`ytmusicapi.parsers`, i.e. ``playlists.parse_playlist_items``.
+    Methods of :class:`ytmusicapi.parsers.browsing.Parser` are given as ``browsing.Parser.<method>``
+    and are bound to the shared parser for ``language``.
+    """
+    module_name, *attributes = parser.split('.')
+    module = importlib.import_module('ytmusicapi.parsers.' + module_name)
+    if len(attributes) == 1:
+        return getattr(module, attributes[0])
+
+    return getattr(module.get_parser(language or 'en'), attributes[-1])
+
+
+def run_parser(parser: str, data, path: List = None, args=(), language: str = None):
+    """
+    Decode ``data`` if it is a raw response, navigate to ``path`` and run ``parser`` on the result.
+    Runs in the worker process when offloaded.
+
+    :return: Tuple of the parsed result, the decoding time and the parsing time in seconds
+    """
+    start = time.perf_counter()
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data)
+    if path:
+        data = nav(data, path)
+    decoded = time.perf_counter()
+    result = get_parser_function(parser, language)(data, *args)
+    return result, decoded - start, time.perf_counter() - decoded
+
+
+class ParseExecutor:
+    """
+    Runs the response parsers in a pool of worker processes, so that parsing large responses
+    does not hold the GIL of the calling process. Raw response bytes are handed to the workers,
+    which decode them on their side, so only bytes and the parsed result need to be pickled.
+    Parsers of whole responses, i.e. ``playlists.parse_playlist_response``, are only given the
+    raw bytes, so the calling process decodes the response only if the call is run inline.
+
+    Timings are recorded for every parser call, whether offloaded or not. Use ``max_workers=0``
+    to only measure the parsers inline and decide which ones are worth offloading.
+    """
+    def __init__(self, max_workers: int = None, offload: List[str] = None, min_bytes: int = 0):
+        """
+        :param max_workers: Number of worker processes. Default: number of processors.
+            Set to 0 to parse inline and only record timings.
+        :param offload: Optional. Names of the parsers to offload, i.e. ``playlists.parse_playlist_response``.
+            Default: all parsers are offloaded.
+        :param min_bytes: Responses smaller than this are parsed inline. Default: 0
+        """
+        self.offload = set(offload) if offload is not None else None
+        self.min_bytes = min_bytes
+        self._pool = ProcessPoolExecutor(max_workers) if max_workers != 0 else None
+        self._timings = {}
+        self._lock = threading.Lock()
+
+    def _should_offload(self, parser, raw):
+        return (self._pool is not None and raw is not None and len(raw) >= self.min_bytes
+                and (self.offload is None or parser in self.offload))
+
+    def parse(self,
+              parser: str,
+              contents,
+              raw: bytes = None,
+              path: List = None,
+              args=(),
+              language: str = None,
+              inline: bool = False):
+        """
+        Parse the ``contents`` of a response with ``parser``.
+
+        :param parser: Parser name, see :py:func:`get_parser_function`
+        :param contents: Decoded contents to parse if the call is run inline. If ``None``,
+            ``raw`` is decoded in the calling process instead
+        :param raw: Optional. Raw response bytes which are sent to the worker instead
+        :param path: Path to ``contents`` within the raw response
+        :param args: Additional positional arguments for the parser
+        :param language: Language of the :class:`Parser` for methods of that class
+        :param inline: Run the parser in the calling process even if it is offloaded, i.e. if
+            its result refers to the decoded response. Default: False
+        :return: Parsed result
+        """
+        start = time.perf_counter()
+        offloaded = not inline and self._should_offload(parser, raw)
+        if offloaded:
+            result, decode_time, parse_time = self._pool.submit(run_parser, parser, raw, path,
+                                                                args, language).result()
+        elif contents is None:
+            result, decode_time, parse_time = run_parser(parser, raw, path, args, language)
+        else:
+            result, decode_time, parse_time = run_parser(parser, contents, None, args, language)
+        self._record(parser, offloaded,
+                     len(raw) if raw is not None else 0, decode_time, parse_time,
+                     time.perf_counter() - start)
+        return result
+
+    def _record(self, parser, offloaded, size, decode_time, parse_time, total_time):
+        with self._lock:
+            timing = self._timings.setdefault(parser, {
+                'calls': 0,
+                'offloaded': 0,
+                'bytes': 0,
+                'decode': 0.0,
+                'parse': 0.0,
+                'total': 0.0
+            })
+            timing['calls'] += 1
+            timing['offloaded'] += offloaded
+            timing['bytes'] += size
+            timing['decode'] += decode_time
+            timing['parse'] += parse_time
+            timing['total'] += total_time
+
+    @property
+    def timings(self) -> Dict[str, Dict]:
+        """
+        Accumulated timings per parser. ``parse`` is the time spent in the parser itself,
+        ``decode`` the time spent decoding raw responses, in the workers or in the calling process
+        for the calls run inline, and ``total`` the wall-clock time the caller waited, including
+        the transfer to and from the workers.
+
+        Example::
+
+            {
+                "playlists.parse_playlist_continuation": {
+                    "calls": 3,
+                    "offloaded": 3,
+                    "bytes": 2315788,
+                    "decode": 0.0412,
+                    "parse": 0.0597,
+                    "total": 0.1213
+                }
+            }
+        """
+        with self._lock:
+            return {parser: dict(timing) for parser, timing in self._timings.items()}
+
+    def reset_timings(self):
+        with self._lock:
+            self._timings = {}
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, execType=None, execValue=None, traceback=None):
+        self.shutdown()
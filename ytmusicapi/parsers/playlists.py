@@ -1,9 +1,14 @@
 from .utils import *
 from .songs import *
+from .browsing import get_parser
 from typing import List
+from collections.abc import Mapping, Sequence
 
 
-def parse_playlist_items(results, menu_entries: List[List] = None):
+def parse_playlist_items(results, menu_entries: List[List] = None, lazy: bool = False):
+    if lazy:
+        return LazyPlaylistItems(results, menu_entries)
+
     songs = []
     count = 1
     for result in results:
@@ -13,74 +18,28 @@ def parse_playlist_items(results, menu_entries: List[List] = None):
         data = result['musicResponsiveListItemRenderer']
 
         try:
-            videoId = setVideoId = None
-            like = None
-            feedback_tokens = None
-
-            # if the item has a menu, find its setVideoId
-            if 'menu' in data:
-                for item in nav(data, MENU_ITEMS):
-                    if 'menuServiceItemRenderer' in item:
-                        menu_service = nav(item, MENU_SERVICE)
-                        if 'playlistEditEndpoint' in menu_service:
-                            setVideoId = menu_service['playlistEditEndpoint']['actions'][0][
-                                'setVideoId']
-                            videoId = menu_service['playlistEditEndpoint']['actions'][0][
-                                'removedVideoId']
-
-                    if TOGGLE_MENU in item:
-                        feedback_tokens = parse_song_menu_tokens(item)
-
-            # if item is not playable, the videoId was retrieved above
-            if 'playNavigationEndpoint' in nav(data, PLAY_BUTTON):
-                videoId = nav(data,
-                              PLAY_BUTTON)['playNavigationEndpoint']['watchEndpoint']['videoId']
-
-                if 'menu' in data:
-                    like = nav(data, MENU_LIKE_STATUS, True)
-
             title = get_item_text(data, 0)
             if title == 'Song deleted':
                 continue
 
-            artists = parse_song_artists(data, 1)
-
-            album = parse_song_album(data, 2)
-
-            duration = None
-            if 'fixedColumns' in data:
-                if 'simpleText' in get_fixed_column_item(data, 0)['text']:
-                    duration = get_fixed_column_item(data, 0)['text']['simpleText']
-                else:
-                    duration = get_fixed_column_item(data, 0)['text']['runs'][0]['text']
-
-            thumbnails = None
-            if 'thumbnail' in data:
-                thumbnails = nav(data, THUMBNAILS)
-
-            isAvailable = True
-            if 'musicItemRendererDisplayPolicy' in data:
-                isAvailable = data[
-                    'musicItemRendererDisplayPolicy'] != 'MUSIC_ITEM_RENDERER_DISPLAY_POLICY_GREY_OUT'
-
-            isExplicit = nav(data, BADGE_LABEL, True) == 'Explicit'
-
+            menu = parse_playlist_item_menu(data)
             song = {
-                'videoId': videoId,
+                'videoId': menu['videoId'],
                 'title': title,
-                'artists': artists,
-                'album': album,
-                'likeStatus': like,
-                'thumbnails': thumbnails,
-                'isAvailable': isAvailable,
-                'isExplicit': isExplicit
+                'artists': parse_song_artists(data, 1),
+                'album': parse_song_album(data, 2),
+                'likeStatus': menu['likeStatus'],
+                'thumbnails': parse_playlist_item_thumbnails(data),
+                'isAvailable': parse_playlist_item_available(data),
+                'isExplicit': parse_playlist_item_explicit(data)
             }
+            duration = parse_playlist_item_duration(data)
             if duration:
                 song['duration'] = duration
-            if setVideoId:
-                song['setVideoId'] = setVideoId
-            if feedback_tokens:
-                song['feedbackTokens'] = feedback_tokens
+            if menu['setVideoId']:
+                song['setVideoId'] = menu['setVideoId']
+            if menu['feedbackTokens']:
+                song['feedbackTokens'] = menu['feedbackTokens']
 
             if menu_entries:
                 for menu_entry in menu_entries:
@@ -92,3 +51,263 @@ def parse_playlist_items(results, menu_entries: List[List] = None):
             print("Item " + str(count) + ": " + str(e))
 
     return songs
+
+
+def parse_playlist_response(response, language: str = 'en', lazy: bool = False):
+    """
+    Parse a whole playlist ``browse`` response, so that a worker of the :class:`ParseExecutor`
+    can decode and parse it on its own.
+
+    :return: Tuple of the playlist, with its header fields and the tracks of the first page, and
+        the shelf of the tracks reduced to its ``continuations``, for :py:func:`get_continuations`
+    """
+    results = nav(response, SINGLE_COLUMN_TAB + SECTION_LIST_ITEM + ['musicPlaylistShelfRenderer'])
+    playlist = {'id': results['playlistId']}
+    own_playlist = 'musicEditablePlaylistDetailHeaderRenderer' in response['header']
+    if not own_playlist:
+        header = response['header']['musicDetailHeaderRenderer']
+        playlist['privacy'] = 'PUBLIC'
+    else:
+        header = response['header']['musicEditablePlaylistDetailHeaderRenderer']
+        playlist['privacy'] = header['editHeader']['musicPlaylistEditHeaderRenderer']['privacy']
+        header = header['header']['musicDetailHeaderRenderer']
+
+    playlist['title'] = nav(header, TITLE_TEXT)
+    playlist['thumbnails'] = nav(header, THUMBNAIL_CROPPED)
+    playlist["description"] = nav(header, DESCRIPTION, True)
+    run_count = len(header['subtitle']['runs'])
+    if run_count > 1:
+        playlist['author'] = {
+            'name': nav(header, SUBTITLE2),
+            'id': nav(header, ['subtitle', 'runs', 2] + NAVIGATION_BROWSE_ID, True)
+        }
+        if run_count > 3:
+            playlist['year'] = nav(header, SUBTITLE3)
+
+    song_count = get_parser(language).to_int(header['secondSubtitle']['runs'][0]['text'])
+    if len(header['secondSubtitle']['runs']) > 1:
+        playlist['duration'] = header['secondSubtitle']['runs'][2]['text']
+
+    playlist['trackCount'] = song_count
+    playlist['suggestions_token'] = nav(
+        response, SINGLE_COLUMN_TAB + ['sectionListRenderer', 'contents', 1] + MUSIC_SHELF
+        + RELOAD_CONTINUATION, True)
+
+    playlist['tracks'] = parse_playlist_items([], lazy=lazy)
+    shelf = {}
+    if song_count > 0:
+        playlist['tracks'].extend(parse_playlist_items(results['contents'], lazy=lazy))
+        if 'continuations' in results:
+            shelf['continuations'] = results['continuations']
+
+    return playlist, shelf
+
+
+def parse_playlist_continuation(response, lazy: bool = False):
+    """
+    Parse a whole ``musicPlaylistShelfContinuation`` response, keeping its shape for
+    :py:func:`get_continuations` with the ``contents`` replaced by the parsed tracks
+    """
+    if 'continuationContents' not in response:
+        return {}
+    results = response['continuationContents']['musicPlaylistShelfContinuation']
+    shelf = {'contents': parse_playlist_items(results.get('contents', []), lazy=lazy)}
+    if 'continuations' in results:
+        shelf['continuations'] = results['continuations']
+    return {'continuationContents': {'musicPlaylistShelfContinuation': shelf}}
+
+
+def parse_playlist_item_menu(data):
+    videoId = setVideoId = None
+    like = None
+    feedback_tokens = None
+
+    # if the item has a menu, find its setVideoId
+    if 'menu' in data:
+        for item in nav(data, MENU_ITEMS):
+            if 'menuServiceItemRenderer' in item:
+                menu_service = nav(item, MENU_SERVICE)
+                if 'playlistEditEndpoint' in menu_service:
+                    setVideoId = menu_service['playlistEditEndpoint']['actions'][0]['setVideoId']
+                    videoId = menu_service['playlistEditEndpoint']['actions'][0]['removedVideoId']
+
+            if TOGGLE_MENU in item:
+                feedback_tokens = parse_song_menu_tokens(item)
+
+    # if item is not playable, the videoId was retrieved above
+    if 'playNavigationEndpoint' in nav(data, PLAY_BUTTON):
+        videoId = nav(data, PLAY_BUTTON)['playNavigationEndpoint']['watchEndpoint']['videoId']
+
+        if 'menu' in data:
+            like = nav(data, MENU_LIKE_STATUS, True)
+
+    return {
+        'videoId': videoId,
+        'setVideoId': setVideoId,
+        'likeStatus': like,
+        'feedbackTokens': feedback_tokens
+    }
+
+
+def parse_playlist_item_duration(data):
+    if 'fixedColumns' not in data:
+        return None
+    if 'simpleText' in get_fixed_column_item(data, 0)['text']:
+        return get_fixed_column_item(data, 0)['text']['simpleText']
+    return get_fixed_column_item(data, 0)['text']['runs'][0]['text']
+
+
+def parse_playlist_item_thumbnails(data):
+    return nav(data, THUMBNAILS) if 'thumbnail' in data else None
+
+
+def parse_playlist_item_available(data):
+    if 'musicItemRendererDisplayPolicy' in data:
+        return data[
+            'musicItemRendererDisplayPolicy'] != 'MUSIC_ITEM_RENDERER_DISPLAY_POLICY_GREY_OUT'
+    return True
+
+
+def parse_playlist_item_explicit(data):
+    return nav(data, BADGE_LABEL, True) == 'Explicit'
+
+
+class LazyPlaylistItem(Mapping):
+    """
+    Read-only dict-like view of a single playlist item. Holds a reference to the raw
+    ``musicResponsiveListItemRenderer`` and parses each field on first access.
+    Use ``dict(item)`` to obtain a plain dictionary. Fields which fail to parse are ``None``.
+    """
+    _menu_fields = ('videoId', 'setVideoId', 'likeStatus', 'feedbackTokens')
+    # same key order as the eagerly parsed items
+    _order = ('videoId', 'title', 'artists', 'album', 'likeStatus', 'thumbnails', 'isAvailable',
+              'isExplicit', 'duration', 'setVideoId', 'feedbackTokens')
+    _fields = {
+        'title': lambda data: get_item_text(data, 0),
+        'artists': lambda data: parse_song_artists(data, 1),
+        'album': lambda data: parse_song_album(data, 2),
+        'duration': parse_playlist_item_duration,
+        'thumbnails': parse_playlist_item_thumbnails,
+        'isAvailable': parse_playlist_item_available,
+        'isExplicit': parse_playlist_item_explicit
+    }
+    # keys which are omitted from the eagerly parsed item if their value is falsy
+    _optional = ('duration', 'setVideoId', 'feedbackTokens')
+
+    __slots__ = ('_data', '_menu_entries', '_cache', '_keys')
+
+    def __init__(self, data, menu_entries: List[List] = None):
+        self._data = data
+        self._menu_entries = menu_entries
+        self._cache = {}
+        self._keys = None
+
+    def _parser(self, key):
+        if key in self._menu_fields:
+            return parse_playlist_item_menu
+        if key in self._fields:
+            return self._fields[key]
+        for entry in self._menu_entries or []:
+            if entry[-1] == key:
+                return lambda data: nav(data, MENU_ITEMS + entry)
+        return None
+
+    def _get(self, key):
+        if key not in self._cache:
+            parser = self._parser(key)
+            if parser is None:
+                raise KeyError(key)
+            try:
+                value = parser(self._data)
+            except Exception:
+                # a broken item does not fail the playlist, as with the eagerly parsed items
+                value = dict.fromkeys(self._menu_fields) if key in self._menu_fields else None
+            if key in self._menu_fields:
+                self._cache.update(value)
+            else:
+                self._cache[key] = value
+        return self._cache[key]
+
+    def __getitem__(self, key):
+        value = self._get(key)
+        if key in self._optional and not value:
+            raise KeyError(key)
+        return value
+
+    def _get_keys(self):
+        if self._keys is None:
+            keys = list(self._order)
+            if self._menu_entries:
+                keys += [entry[-1] for entry in self._menu_entries]
+            self._keys = [k for k in keys if k not in self._optional or self._get(k)]
+        return self._keys
+
+    def __iter__(self):
+        return iter(self._get_keys())
+
+    def __len__(self):
+        return len(self._get_keys())
+
+    def __repr__(self):
+        return 'LazyPlaylistItem(' + repr(dict(self)) + ')'
+
+
+class LazyPlaylistItems(Sequence):
+    """
+    Sequence of :class:`LazyPlaylistItem` built from the raw ``contents`` of a playlist shelf.
+    Only the renderer references are collected up front, so ``len`` is O(1) and slicing does
+    not parse any items. Items are created on first access and reused afterwards. Like the
+    eagerly parsed items, deleted songs and items without a readable title are left out.
+    """
+    def __init__(self, results=(), menu_entries: List[List] = None):
+        self._menu_entries = menu_entries
+        self._data = [
+            result['musicResponsiveListItemRenderer'] for result in results
+            if 'musicResponsiveListItemRenderer' in result
+            and self._has_song(result['musicResponsiveListItemRenderer'])
+        ]
+        self._items = [None] * len(self._data)
+
+    @staticmethod
+    def _has_song(data):
+        try:
+            return get_item_text(data, 0) != 'Song deleted'
+        except Exception:
+            return False
+
+    def __len__(self):
+        return len(self._data)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            items = LazyPlaylistItems(menu_entries=self._menu_entries)
+            items._data = self._data[index]
+            items._items = self._items[index]
+            return items
+        item = self._items[index]
+        if item is None:
+            item = LazyPlaylistItem(self._data[index], self._menu_entries)
+            self._items[index] = item
+        return item
+
+    def extend(self, items):
+        """
+        Append items of another :class:`LazyPlaylistItems` or an iterable of parsed items, which
+        are kept as plain dicts unless they are a :class:`LazyPlaylistItem`.
+        """
+        if isinstance(items, LazyPlaylistItems):
+            self._data.extend(items._data)
+            self._items.extend(items._items)
+            return
+        for item in items:
+            if isinstance(item, LazyPlaylistItem):
+                self._data.append(item._data)
+            elif isinstance(item, Mapping):
+                item = dict(item)
+                self._data.append(item)
+            else:
+                raise TypeError('Playlist items must be mappings, not ' + type(item).__name__)
+            self._items.append(item)
+
+    def __repr__(self):
+        return 'LazyPlaylistItems(' + str(len(self)) + ' items)'
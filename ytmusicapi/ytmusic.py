@@ -1,11 +1,13 @@
 import requests
-import gettext
 import pkg_resources
 import os
-from contextlib import suppress
 from typing import Dict
 from ytmusicapi.helpers import *
 from ytmusicapi.parsers import browsing
+from ytmusicapi.parsers.executor import ParseExecutor, get_parser_function
+from ytmusicapi.downloader.player import PlayerCache
+from ytmusicapi.downloader.streams import StreamCache
+from ytmusicapi.downloader.thumbnails import ThumbnailCache
 from ytmusicapi.setup import setup
 from ytmusicapi.mixins.browsing import BrowsingMixin
 from ytmusicapi.mixins.watch import WatchMixin
@@ -26,7 +28,12 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
                  user: str = None,
                  requests_session=True,
                  proxies: dict = None,
-                 language: str = 'en'):
+                 language: str = 'en',
+                 parse_executor: ParseExecutor = None,
+                 base_url: str = None,
+                 player_cache: PlayerCache = None,
+                 stream_cache: StreamCache = None,
+                 thumbnail_cache: ThumbnailCache = None):
         """
         Create a new instance to interact with YouTube Music.
 
@@ -52,6 +59,17 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
         :param language: Optional. Can be used to change the language of returned data.
             English will be used by default. Available languages can be checked in
             the ytmusicapi/locales directory.
+        :param parse_executor: Optional. A :py:class:`ParseExecutor` used to parse large
+            responses in worker processes and to record per-parser timings.
+            Default: Responses are parsed in the calling thread.
+        :param base_url: Optional. Send all requests for YouTube Music and YouTube to this
+            server instead, i.e. a local stand-in server for load testing like ``http://localhost:8080``.
+        :param player_cache: Optional. A :py:class:`PlayerCache` for the player data needed to
+            decrypt stream URLs. Default: A cache in ``~/.cache/ytmusicapi/player.json``
+        :param stream_cache: Optional. A :py:class:`StreamCache` for the decrypted stream URLs of
+            the songs being downloaded. Default: A new cache in memory
+        :param thumbnail_cache: Optional. A :py:class:`ThumbnailCache` for the cover art and
+            thumbnails of downloads. Default: A cache in ``~/.cache/ytmusicapi/thumbnails``
         """
         self.auth = auth
 
@@ -64,6 +82,12 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
                 self._session = requests.api
 
         self.proxies = proxies
+        self.parse_executor = parse_executor
+        self.domain = base_url.rstrip('/') if base_url else YTM_DOMAIN
+        self.youtube_domain = base_url.rstrip('/') if base_url else YT_DOMAIN
+        self.player_cache = player_cache if player_cache is not None else PlayerCache()
+        self.stream_cache = stream_cache if stream_cache is not None else StreamCache()
+        self.thumbnail_cache = thumbnail_cache if thumbnail_cache is not None else ThumbnailCache()
 
         # prepare headers
         self.headers = {}
@@ -85,7 +109,7 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
             self.headers = initialize_headers()
 
         if 'x-goog-visitor-id' not in self.headers:
-            self.headers.update(get_visitor_id(self._send_get_request))
+            self.headers.update(get_visitor_id(self._send_get_request, self.domain))
 
         # prepare context
         self.context = initialize_context()
@@ -95,16 +119,8 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
             raise Exception("Language not supported. Supported languages are "
                             ', '.join(supported_languages))
         self.language = language
-        try:
-            locale.setlocale(locale.LC_ALL, self.language)
-        except locale.Error:
-            with suppress(locale.Error):
-                locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-        self.lang = gettext.translation('base',
-                                        localedir=pkg_resources.resource_filename(
-                                            'ytmusicapi', 'locales'),
-                                        languages=[language])
-        self.parser = browsing.Parser(self.lang)
+        self.parser = browsing.get_parser(language)
+        self.lang = self.parser.lang
 
         if user:
             self.context['context']['user']['onBehalfOfUser'] = user
@@ -118,21 +134,34 @@ class YTMusic(BrowsingMixin, WatchMixin, LibraryMixin, PlaylistsMixin, UploadsMi
                 raise Exception("Your cookie is missing the required value __Secure-3PAPISID")
 
     def _send_request(self, endpoint: str, body: Dict, additionalParams: str = "") -> Dict:
+        return json.loads(self._send_raw_request(endpoint, body, additionalParams))
+
+    def _send_raw_request(self, endpoint: str, body: Dict, additionalParams: str = "") -> bytes:
         body.update(self.context)
         if self.auth:
             origin = self.headers.get('origin', self.headers.get('x-origin'))
             self.headers["Authorization"] = get_authorization(self.sapisid + ' ' + origin)
-        response = self._session.post(YTM_BASE_API + endpoint + YTM_PARAMS + additionalParams,
+        response = self._session.post(self.domain + '/youtubei/v1/' + endpoint + YTM_PARAMS
+                                      + additionalParams,
                                       json=body,
                                       headers=self.headers,
                                       proxies=self.proxies)
-        response_text = json.loads(response.text)
         if response.status_code >= 400:
+            response_text = json.loads(response.text)
             message = "Server returned HTTP " + str(
                 response.status_code) + ": " + response.reason + ".\n"
             error = response_text.get('error', {}).get('message')
             raise Exception(message + error)
-        return response_text
+        return response.content
+
+    def _parse_response(self, parser: str, raw: bytes, *args, inline: bool = False):
+        """
+        Run a parser of a whole response on the raw bytes, offloading it to the parse executor
+        if one is configured, so that the response is only decoded by the worker
+        """
+        if self.parse_executor is None:
+            return get_parser_function(parser, self.language)(json.loads(raw), *args)
+        return self.parse_executor.parse(parser, None, raw, None, args, self.language, inline)
 
     def _send_get_request(self, url: str, params: Dict = None):
         response = requests.get(url, params, headers=self.headers, proxies=self.proxies)